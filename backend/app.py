@@ -12,7 +12,7 @@ from fastapi import FastAPI, HTTPException, Response, Request, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.exception_handlers import request_validation_exception_handler
 from contextlib import asynccontextmanager
@@ -20,6 +20,7 @@ from collections import defaultdict
 from typing import Optional
 import os
 import json
+import asyncio
 import time  # For performance timing
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -54,6 +55,7 @@ from utils.tokenizer import tokenize_vi
 from utils.tokenizer import tokenize_vi
 from utils.embedding import load_embedding_model
 from config import EMBEDDING_MODEL, GEMINI_FLASH_MODEL, GEMINI_PRO_MODEL, GEMINI_LITE_MODEL  # Import model names
+from config import PREWARM_DOMAINS, PREWARM_WORKERS
 
 
 # ============================================================================
@@ -151,13 +153,22 @@ async def lifespan(app: FastAPI):
     for domain_id, domain in domain_manager.domains.items():
         print(f'  ✓ {domain_id}: {domain.domain_name} ({domain.chunk_count} chunks)', flush=True)
     
-    print('[SUCCESS] ✅ Server ready! (Indices will load on first query)', flush=True)
+    # 5. Prewarm indices in the background (server accepts requests meanwhile, see /ready)
+    prewarm_targets = domain_manager.resolve_prewarm_targets(PREWARM_DOMAINS)
+    prewarm_task = None
+    if prewarm_targets:
+        prewarm_task = asyncio.create_task(domain_manager.prewarm(prewarm_targets, PREWARM_WORKERS))
+        print(f'[SUCCESS] ✅ Server ready! (Prewarming {len(prewarm_targets)} domains in background)', flush=True)
+    else:
+        print('[SUCCESS] ✅ Server ready! (Indices will load on first query)', flush=True)
     
     # Application is running
     yield
     
     # Cleanup on shutdown
     print('[SHUTDOWN] Cleaning up resources...', flush=True)
+    if prewarm_task and not prewarm_task.done():
+        prewarm_task.cancel()
     if domain_manager:
         domain_manager.unload_all()
 
@@ -201,7 +212,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.get("/", response_model=HealthResponse)
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness only: never touches indices, stays cheap during prewarm)"""
     total_chunks = sum(d.metadata.get('chunk_count', 0) for d in domain_manager.domains.values()) if domain_manager else 0
     
     return {
@@ -211,6 +222,16 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until background prewarm has finished"""
+    if not domain_manager:
+        return JSONResponse(status_code=503, content={"ready": False, "reason": "starting"})
+    
+    readiness = domain_manager.readiness()
+    return JSONResponse(status_code=200 if readiness['ready'] else 503, content=readiness)
+
+
 @app.post("/ask", response_model=AnswerResponse)
 async def ask_question(request: QuestionRequest):
     """Main Q&A endpoint with domain-based search"""
@@ -277,7 +298,9 @@ async def ask_question(request: QuestionRequest):
     if len(sub_questions) > 1:
         # Multi-query search across domains
         print(f'[SEARCH] Multi-query mode: {len(sub_questions)} sub-questions', flush=True)
-        relevant_chunks = search_multi_query_with_domains(
+        # Worker thread: the event loop keeps serving, concurrent query encodes get micro-batched
+        relevant_chunks = await asyncio.to_thread(
+            search_multi_query_with_domains,
             sub_questions=sub_questions,
             domain_manager=domain_manager,
             tokenize_fn=tokenize_vi,
@@ -289,7 +312,8 @@ async def ask_question(request: QuestionRequest):
         # Single query search with domain hint
         query = intent_result.get('refined_query', request.question)
         print(f'[SEARCH] Single-query mode: "{query}"', flush=True)
-        relevant_chunks = search_with_domains(
+        relevant_chunks = await asyncio.to_thread(
+            search_with_domains,
             query=query,
             domain_manager=domain_manager,
             tokenize_fn=tokenize_vi,
@@ -373,20 +397,20 @@ async def get_stats():
     """Get system statistics"""
     domains_info = {}
     total_chunks = 0
+    memory_report = domain_manager.memory_report()
     
-    for domain_id in domain_manager.list_domains():
-        domain = domain_manager.get_domain(domain_id)
-        # Count chunks from JSONL without loading all into memory
-        chunk_count = 0
-        chunks_path = os.path.join(domain.domain_dir, 'chunks.jsonl')
-        if os.path.exists(chunks_path):
-            with open(chunks_path, 'r', encoding='utf-8') as f:
-                chunk_count = sum(1 for _ in f)
+    for domain_id, domain in domain_manager.domains.items():
+        # Count chunks from the offset table without reading chunk data
+        try:
+            chunk_count = len(domain.chunk_store)
+        except FileNotFoundError:
+            chunk_count = 0
         
         domains_info[domain_id] = {
             "name": domain.domain_name,
             "chunks": chunk_count,
-            "loaded": domain._bm25_index is not None  # Check if indices are loaded
+            "loaded": domain.is_loaded,
+            "memory": memory_report.get(domain_id, {})
         }
         total_chunks += chunk_count
     
@@ -398,7 +422,11 @@ async def get_stats():
             "llm_flash": f"{GEMINI_FLASH_MODEL} (answer generation only)",
             "llm_lite": f"{GEMINI_LITE_MODEL} (intent detection + search rerank)"
         },
-        "intent_cache_size": get_cache_size()
+        "intent_cache_size": get_cache_size(),
+        "embedding_cache": domain_manager.embedding_cache_stats(),
+        "embedding_batches": domain_manager.embedding_batch_stats(),
+        "residency": domain_manager.residency_stats(),
+        "search_fanout": domain_manager.fanout_stats()
     }
 
 
@@ -511,28 +539,33 @@ async def get_pdf_info(domain_id: str, article_num: str):
 
 
 @app.get("/api/pdf/find-page/{domain_id}/{article_num}")
-async def find_pdf_page(domain_id: str, article_num: str):
+async def find_pdf_page(domain_id: str, article_num: str, pdf_file: Optional[str] = None):
     """
     Find the page number for a specific article in the PDF
+    (page_index.json lookup built with the domain; pypdf scan only if the index is missing)
+
+    pdf_file: which of the domain's PDFs (chunk 'pdf_file'); default: the first one
     """
     try:
-        from core.pdf_utils import find_article_page
+        from core.pdf_utils import find_article_location
         
         domain_dir = Path(f"data/domains/{domain_id}")
         pdfs_dir = domain_dir / "pdfs"
         pdf_files = list(pdfs_dir.glob("*.pdf")) if pdfs_dir.exists() else []
+        if pdf_file:
+            pdf_files = [f for f in pdf_files if f.name == pdf_file]
         
         if not pdf_files:
             raise HTTPException(status_code=404, detail="PDF not found")
         
         pdf_file = pdf_files[0]
         
-        # Find page number
-        page_num = find_article_page(str(pdf_file), article_num)
+        # Find page number (offset: position of the match in the page text)
+        location = find_article_location(str(pdf_file), article_num)
         
-        if page_num:
-            print(f"[PDF] Found Article {article_num} on page {page_num}")
-            return {"page": page_num, "found": True}
+        if location:
+            page_num, offset = location
+            return {"page": page_num, "found": True, "offset": offset, "pdf_file": pdf_file.name}
         else:
             print(f"[PDF] Article {article_num} not found in PDF")
             return {"page": None, "found": False}
@@ -544,30 +577,79 @@ async def find_pdf_page(domain_id: str, article_num: str):
 
 
 @app.get("/api/pdf-file/{domain_id}/{filename}")
-async def serve_pdf(domain_id: str, filename: str):
-    """Serve PDF file with CORS headers and allow iframe embedding"""
-    pdf_path = Path(f"data/domains/{domain_id}/pdfs/{filename}")
-    
-    if not pdf_path.exists():
+async def serve_pdf(domain_id: str, filename: str, request: Request):
+    """
+    Serve the raw PDF bytes (viewer / iframe)
+
+    Range requests (206, the viewer fetches pages progressively), content ETag with
+    If-None-Match → 304, and Cache-Control for PDF_CACHE_MAX_AGE. The file is sent by the
+    server without copying it through Python where possible (ASGI pathsend, or nginx
+    X-Accel-Redirect when PDF_ACCEL_REDIRECT_PREFIX is set).
+    """
+    pdf_path = _domain_pdf_path(domain_id, filename)
+    if pdf_path is None:
         raise HTTPException(status_code=404, detail="PDF file not found")
-    
-    return FileResponse(
-        path=str(pdf_path),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": "inline",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, OPTIONS",
-            "Access-Control-Allow-Headers": "*",
-            "X-Frame-Options": "ALLOWALL",  # Allow iframe embedding
-            "Content-Security-Policy": "frame-ancestors *"  # Modern alternative
-        }
-    )
+    return _pdf_file_response(request, pdf_path, domain_id)
 
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
+PDF_RESPONSE_HEADERS = {
+    "Content-Disposition": "inline",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, OPTIONS",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Expose-Headers": "Accept-Ranges, Content-Range, Content-Length, ETag",
+    "X-Frame-Options": "ALLOWALL",  # Allow iframe embedding
+    "Content-Security-Policy": "frame-ancestors *"  # Modern alternative
+}
+
+
+def _domain_pdf_path(domain_id: str, filename: str) -> Optional[Path]:
+    """data/domains/{domain_id}/pdfs/{filename} if it is a PDF inside the domains directory"""
+    domains_dir = Path("data/domains").resolve()
+    pdf_path = Path("data/domains") / domain_id / "pdfs" / filename
+    if pdf_path.suffix.lower() != '.pdf' or not pdf_path.is_file():
+        return None
+    if not pdf_path.resolve().is_relative_to(domains_dir):
+        return None
+    return pdf_path
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET)"""
+    if if_none_match.strip() == '*':
+        return True
+    return etag.removeprefix('W/') in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+
+
+def _pdf_file_response(request: Request, pdf_path: Path, domain_id: str) -> Response:
+    """304 / X-Accel-Redirect / FileResponse (Range, If-Range) for a domain PDF"""
+    from core.pdf_utils import pdf_etag
+    from config import PDF_CACHE_MAX_AGE, PDF_ACCEL_REDIRECT_PREFIX
+
+    stat = pdf_path.stat()
+    etag = pdf_etag(pdf_path, stat)
+    headers = {
+        **PDF_RESPONSE_HEADERS,
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PDF_CACHE_MAX_AGE}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if PDF_ACCEL_REDIRECT_PREFIX:
+        # nginx serves (and range-slices) the file from its internal location
+        from urllib.parse import quote
+        location = f"{PDF_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(domain_id)}/pdfs/{quote(pdf_path.name)}"
+        return Response(media_type="application/pdf", headers={**headers, "X-Accel-Redirect": location})
+
+    return FileResponse(path=str(pdf_path), media_type="application/pdf", headers=headers, stat_result=stat)
+
+
 def map_json_to_pdf(json_filename: str) -> str:
     """Map JSON filename to corresponding PDF filename"""
     json_to_pdf_map = {
@@ -623,9 +705,12 @@ def extract_pdf_metadata(chunk: dict) -> PDFSource:
 @app.get("/api/get-document")
 async def get_document_endpoint(filename: str):
     """
-    Get PDF document by filename
+    Get PDF document by filename (base64 inside JSON)
     
     Example: /api/get-document?filename=luat_hon_nhan.pdf
+    
+    Compatibility path only: the payload is a third larger than the file and is neither
+    cacheable nor range-readable. Viewers should load "url" (/api/pdf-file, raw bytes).
     """
     try:
         print(f"[PDF] 📄 Fetching PDF: {filename}", flush=True)
@@ -676,7 +761,8 @@ async def get_document_endpoint(filename: str):
         return {
             "filename": filename,
             "data": pdf_base64,
-            "size": len(pdf_data)
+            "size": len(pdf_data),
+            "url": f"/api/pdf-file/{domain_id}/{filename}"
         }
         
     except HTTPException:
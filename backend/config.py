@@ -20,11 +20,59 @@ GEMINI_LITE_MODEL = 'gemini-2.5-flash-lite'  # Intent detection, decomposition
 # EMBEDDING_MODEL = 'vinai/phobert-base'  # PhoBERT (not compatible with SentenceTransformers directly)
 EMBEDDING_MODEL = 'VoVanPhuc/sup-SimCSE-VietNamese-phobert-base'  # PhoBERT-based SimCSE
 
+# Embedding backend (CPU inference; accuracy vs fp32 + latency: scripts/bench_embedding_backends.py)
+# 'torch' = fp32 SentenceTransformer, 'torch_int8' = dynamic int8 Linear layers,
+# 'onnx' = ONNX Runtime graph (exported on first start), 'onnx_int8' = ONNX with int8 weights
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+# Backend encoding the documents at index build time (part of the build fingerprint): fp32 by default,
+# so switching the query-side EMBEDDING_BACKEND neither marks domains stale nor re-encodes them
+BUILD_EMBEDDING_BACKEND = os.getenv('BUILD_EMBEDDING_BACKEND', 'torch')
+EMBEDDING_ONNX_DIR = os.getenv('EMBEDDING_ONNX_DIR', 'data/models/onnx')
+
+# Query embedding micro-batching (concurrent single-query encodes share one model call)
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '32'))  # <= 1 = disabled
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5'))  # Max extra latency per query
+
+# Query embedding cache (LRU keyed by model id + normalized text; 0 = disabled)
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '2048'))  # ~3 KB per 768-d entry
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv('EMBEDDING_CACHE_TTL_SECONDS', '0'))  # 0 = no expiry
+
+# Index build encoding (scripts/build_domains_simple.py): length-bucketed batches over CPU worker processes
+# Each worker process loads its own copy of the model (~0.5 GB for PhoBERT): raise only with RAM to spare
+BUILD_ENCODE_WORKERS = int(os.getenv('BUILD_ENCODE_WORKERS', '1'))  # 1 = in-process, 0 = one per CPU
+BUILD_ENCODE_BATCH_SIZE = int(os.getenv('BUILD_ENCODE_BATCH_SIZE', '32'))
+# Content-addressed tokens/embeddings of built chunks (rebuilds only process new or changed chunks)
+BUILD_CACHE_DIR = os.getenv('BUILD_CACHE_DIR', 'data/build_cache')
+# Chunks per batch streamed through the chunk → tokens/embeddings stages (bounds build memory)
+BUILD_STREAM_BATCH_SIZE = int(os.getenv('BUILD_STREAM_BATCH_SIZE', '2048'))
+# Domains with stale stages are built in parallel processes (each with an in-process encoder and
+# in-process PDF extraction: inner pools don't nest), each holding its own model copy
+BUILD_DOMAIN_WORKERS = int(os.getenv('BUILD_DOMAIN_WORKERS', '1'))  # 1 = serial, 0 = one per CPU
+# PDF → JSON page extraction (scripts/pdf_to_json.py); pages are cached under BUILD_CACHE_DIR/pdf_pages
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', '1'))  # 1 = in-process, 0 = one per CPU
+
+# Query Tokenizer
+# 'underthesea' = CRF word segmentation (also always used to build tokens.pkl)
+# 'fast' = dictionary segmentation over the corpus vocabulary, memoized (scripts/tokenizer_parity.py)
+TOKENIZER_MODE = os.getenv('TOKENIZER_MODE', 'underthesea')
+TOKENIZER_DICT_PATH = os.getenv('TOKENIZER_DICT_PATH', 'data/tokenizer_dict.tsv')
+TOKENIZER_CACHE_SIZE = int(os.getenv('TOKENIZER_CACHE_SIZE', '4096'))
+
 # Search Parameters
 DEFAULT_TOP_K = 8
 BM25_WEIGHT = 0.7
 FAISS_WEIGHT = 0.3
 
+# BM25 low-impact term dropping (query side, top-k path only)
+# Vietnamese function words carry almost no idf but have the longest postings lists
+BM25_STOPWORDS = frozenset([
+    'và', 'của', 'là', 'các', 'có', 'được', 'trong', 'cho', 'theo', 'với',
+    'này', 'những', 'một', 'thì', 'mà', 'đã', 'để', 'khi', 'về', 'từ',
+    'tại', 'hoặc', 'bị', 'do', 'nếu', 'như', 'đó', 'sẽ', 'đến', 'vào',
+    'cũng', 'nhưng', 'rằng', 'bởi', 'vì', 'nên', 'gì', 'nào', 'thế_nào', 'ạ',
+])
+BM25_MAX_DF_RATIO = 0.5  # Also drop terms present in more than half of a domain's chunks
+
 # Cache Paths
 CACHE_DIR = 'cache'
 BM25_CACHE = f'{CACHE_DIR}/bm25_index.pkl'
@@ -33,6 +81,45 @@ FAISS_CACHE = f'{CACHE_DIR}/embeddings.pkl'
 # Data Path
 DATA_DIR = 'data'
 
+# Index Loading
+# mmap FAISS indices read-only: uvicorn workers share one page-cache copy
+FAISS_MMAP = os.getenv('FAISS_MMAP', 'true').lower() == 'true'
+# Read index files + fault pages in at load time (trades load time for first-query latency)
+FAISS_PREFAULT = os.getenv('FAISS_PREFAULT', 'false').lower() == 'true'
+
+# Vector Index Build (per domain: "vector_index" in metadata.json, else domain_registry.json)
+# e.g. {"type": "hnsw", "M": 32, "encoding": "sq8"} / {"type": "ivf_pq", "nlist": 0, "pq_m": 64}
+# fp32 = exact IndexFlatL2, fp16 = 2× smaller, sq8 = 4× smaller (see scripts/quantize_faiss.py for recall)
+FAISS_VECTOR_ENCODING = os.getenv('FAISS_VECTOR_ENCODING', 'fp32')
+
+# Vector Search Knobs (0 = use the domain's metadata.json value; see scripts/sweep_vector_index.py)
+FAISS_HNSW_EF_SEARCH = int(os.getenv('FAISS_HNSW_EF_SEARCH', '0'))
+FAISS_IVF_NPROBE = int(os.getenv('FAISS_IVF_NPROBE', '0'))
+
+# Global Cross-Domain Index (scripts/build_global_index.py; used for multi/all-domain search when built)
+# Opt-in: its BM25 is fit over every domain, so idf and min-max candidates differ from the per-domain merge
+GLOBAL_INDEX_ENABLED = os.getenv('GLOBAL_INDEX_ENABLED', 'false').lower() == 'true'
+GLOBAL_INDEX_DIR = f'{DATA_DIR}/global'
+
+# Multi-Domain Fan-out (per-domain searches overlap on a thread pool; FAISS/numpy release the GIL)
+SEARCH_FANOUT_WORKERS = int(os.getenv('SEARCH_FANOUT_WORKERS', '4'))  # 1 = serial
+SEARCH_DOMAIN_TIMEOUT_SECONDS = float(os.getenv('SEARCH_DOMAIN_TIMEOUT_SECONDS', '10'))  # Slow domains dropped (partial results)
+
+# Domain Residency
+DOMAIN_MEMORY_BUDGET_MB = int(os.getenv('DOMAIN_MEMORY_BUDGET_MB', '0'))  # 0 = unlimited (never evict)
+DOMAIN_PINNED = [d.strip() for d in os.getenv('DOMAIN_PINNED', '').split(',') if d.strip()]
+DOMAIN_HOT_PIN_COUNT = int(os.getenv('DOMAIN_HOT_PIN_COUNT', '1'))  # Most-used domains never evicted
+
+# Startup Prewarm (background, after the server starts accepting requests)
+# '' = lazy (load on first query), 'all' = every domain, or comma list: 'lao_dong,dat_dai'
+PREWARM_DOMAINS = os.getenv('PREWARM_DOMAINS', '').strip()
+PREWARM_WORKERS = int(os.getenv('PREWARM_WORKERS', '4'))
+
+# Raw PDF delivery (/api/pdf-file): content ETag + Range; reused without a request for max-age
+PDF_CACHE_MAX_AGE = int(os.getenv('PDF_CACHE_MAX_AGE', '604800'))  # 7 days, then revalidated (304)
+# Behind nginx: '/_pdfs/' = nginx sends the file itself (sendfile) via X-Accel-Redirect, see nginx.conf
+PDF_ACCEL_REDIRECT_PREFIX = os.getenv('PDF_ACCEL_REDIRECT_PREFIX', '')
+
 # ============================================================================
 # ⚠️ LEGACY: Intent Detection Keywords (KHÔNG DÙNG NỮA - Đã chuyển sang LLM)
 # ============================================================================
@@ -6,7 +6,7 @@ from .intent_detection import detect_intent_and_refine, enhanced_decompose_query
 from .query_expansion import expand_legal_query, decompose_query_smart
 from .search import advanced_hybrid_search, simple_search
 from .generation import generate_answer
-from .document_processor import xu_ly_van_ban_phap_luat_json
+from .document_processor import xu_ly_van_ban_phap_luat_json, iter_van_ban_phap_luat_json
 
 __all__ = [
     'detect_intent_and_refine',
@@ -19,4 +19,5 @@ __all__ = [
     'simple_search',
     'generate_answer',
     'xu_ly_van_ban_phap_luat_json',
+    'iter_van_ban_phap_luat_json',
 ]
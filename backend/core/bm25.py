@@ -0,0 +1,448 @@
+"""
+Sparse BM25 - CSR inverted index with precomputed per-posting impacts
+Drop-in replacement for pickled rank_bm25.BM25Okapi (same scores, no Python loop per document)
+"""
+import json
+import math
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FORMAT_VERSION = 1
+BM25_DIRNAME = 'bm25'
+
+# Below this corpus size one dense bincount + argpartition beats MaxScore's bookkeeping
+DENSE_TOP_K_MAX_DOCS = 20000
+
+
+class SparseBM25:
+    """
+    Inverted index stored as CSR arrays:
+    - indptr[t]:indptr[t + 1] → postings slice of term id t
+    - doc_ids: document id per posting (sorted within each term)
+    - impacts: idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) per posting
+
+    Scoring a query is one gather over the query terms' slices plus a bincount.
+    top_k() uses MaxScore pruning over per-term upper bounds (term_max) instead.
+    """
+
+    def __init__(self, vocab: List[str], indptr: np.ndarray, doc_ids: np.ndarray,
+                 impacts: np.ndarray, meta: Dict, term_max: Optional[np.ndarray] = None):
+        self.vocab = vocab
+        self.term_to_id = {term: i for i, term in enumerate(vocab)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.meta = meta
+        self.corpus_size = int(meta['corpus_size'])
+        self.term_max = term_max if term_max is not None else self._compute_term_max()
+
+    def _compute_term_max(self) -> np.ndarray:
+        """Max impact per term (MaxScore upper bound)"""
+        term_max = np.zeros(len(self.vocab), dtype=np.float32)
+        starts = np.asarray(self.indptr[:-1])
+        non_empty = np.diff(self.indptr) > 0
+        if non_empty.any():
+            term_max[non_empty] = np.maximum.reduceat(np.asarray(self.impacts), starts[non_empty])
+        return term_max
+
+    # ===== Construction =====
+
+    @classmethod
+    def from_okapi(cls, bm25) -> 'SparseBM25':
+        """Convert a fitted rank_bm25.BM25Okapi (reuses its idf, doc_len and doc_freqs)"""
+        vocab = sorted(bm25.idf.keys())
+        term_to_id = {term: i for i, term in enumerate(vocab)}
+
+        # Collect (term id, doc id, tf) triples
+        term_col, doc_col, tf_col = [], [], []
+        for doc_id, frequencies in enumerate(bm25.doc_freqs):
+            for term, tf in frequencies.items():
+                term_col.append(term_to_id[term])
+                doc_col.append(doc_id)
+                tf_col.append(tf)
+
+        idf = np.array([bm25.idf[term] for term in vocab], dtype=np.float64)
+        return cls._from_postings(
+            vocab, np.asarray(term_col, dtype=np.int64), np.asarray(doc_col, dtype=np.int32),
+            np.asarray(tf_col, dtype=np.float64), idf, np.asarray(bm25.doc_len, dtype=np.float64),
+            bm25.k1, bm25.b, bm25.avgdl, getattr(bm25, 'epsilon', None), bm25.corpus_size,
+        )
+
+    @classmethod
+    def from_token_stream(cls, documents: Iterable[List[str]], k1: float = 1.5, b: float = 0.75,
+                          epsilon: float = 0.25) -> 'SparseBM25':
+        """
+        Fit on tokenized documents read one at a time (same index as from_corpus)
+
+        Only the postings are kept, never the corpus or per-document dicts, so documents can
+        come straight from disk (utils.stream_io.iter_pickled_list). idf follows BM25Okapi
+        exactly: computed in first-seen term order, negative values floored to
+        epsilon * average idf.
+        """
+        from array import array
+
+        first_seen: Dict[str, int] = {}
+        doc_freq: List[int] = []
+        term_col, doc_col, tf_col = array('q'), array('i'), array('d')
+        doc_len = array('d')
+        total_len = 0
+        for doc_id, document in enumerate(documents):
+            frequencies = Counter(document)
+            for term, tf in frequencies.items():
+                term_id = first_seen.get(term)
+                if term_id is None:
+                    term_id = first_seen[term] = len(first_seen)
+                    doc_freq.append(0)
+                doc_freq[term_id] += 1
+                term_col.append(term_id)
+                doc_col.append(doc_id)
+                tf_col.append(tf)
+            doc_len.append(len(document))
+            total_len += len(document)
+
+        corpus_size = len(doc_len)
+        idf_first_seen = [math.log(corpus_size - df + 0.5) - math.log(df + 0.5) for df in doc_freq]
+        average_idf = sum(idf_first_seen) / len(idf_first_seen)
+        idf_first_seen = [value if value >= 0 else epsilon * average_idf for value in idf_first_seen]
+
+        # Term ids in sorted vocabulary order (as from_okapi)
+        vocab = sorted(first_seen)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        remap[[first_seen[term] for term in vocab]] = np.arange(len(vocab))
+        idf = np.empty(len(vocab), dtype=np.float64)
+        idf[remap] = idf_first_seen
+        return cls._from_postings(
+            vocab, remap[np.frombuffer(term_col, dtype=np.int64)], np.frombuffer(doc_col, dtype=np.int32),
+            np.frombuffer(tf_col, dtype=np.float64), idf, np.frombuffer(doc_len, dtype=np.float64),
+            k1, b, total_len / corpus_size, epsilon, corpus_size,
+        )
+
+    @classmethod
+    def _from_postings(cls, vocab: List[str], term_col: np.ndarray, doc_col: np.ndarray, tf_col: np.ndarray,
+                       idf: np.ndarray, doc_len: np.ndarray, k1: float, b: float, avgdl: float,
+                       epsilon: Optional[float], corpus_size: int) -> 'SparseBM25':
+        # Group postings by term, doc ids ascending within a term
+        order = np.lexsort((doc_col, term_col))
+        term_col, doc_col, tf_col = term_col[order], doc_col[order], tf_col[order]
+
+        norm = k1 * (1 - b + b * doc_len[doc_col] / avgdl)
+        impacts = idf[term_col] * (tf_col * (k1 + 1) / (tf_col + norm))
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_col, minlength=len(vocab)), out=indptr[1:])
+
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'k1': k1,
+            'b': b,
+            'epsilon': epsilon,
+            'avgdl': avgdl,
+            'corpus_size': corpus_size,
+            'vocab_size': len(vocab),
+            'postings': int(len(doc_col)),
+        }
+        return cls(vocab, indptr, doc_col, impacts.astype(np.float32), meta)
+
+    @classmethod
+    def from_corpus(cls, tokenized_corpus: List[List[str]], **bm25_kwargs) -> 'SparseBM25':
+        """Fit on a tokenized corpus (BM25Okapi parameters and idf floor)"""
+        from rank_bm25 import BM25Okapi
+        return cls.from_okapi(BM25Okapi(tokenized_corpus, **bm25_kwargs))
+
+    # ===== Persistence =====
+
+    def save(self, index_dir: Path):
+        """Write arrays as .npy (mmap-able) plus vocab/meta JSON"""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        np.save(index_dir / 'indptr.npy', np.asarray(self.indptr, dtype=np.int64))
+        np.save(index_dir / 'doc_ids.npy', np.asarray(self.doc_ids, dtype=np.int32))
+        np.save(index_dir / 'impacts.npy', np.asarray(self.impacts, dtype=np.float32))
+        np.save(index_dir / 'term_max.npy', np.asarray(self.term_max, dtype=np.float32))
+        with open(index_dir / 'vocab.json', 'w', encoding='utf-8') as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+        # meta.json last: its presence marks a complete index
+        with open(index_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> 'SparseBM25':
+        """Load from .npy arrays (memory-mapped read-only by default)"""
+        index_dir = Path(index_dir)
+        mmap_mode = 'r' if mmap else None
+        with open(index_dir / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format in {index_dir}: {meta.get('format_version')}")
+        with open(index_dir / 'vocab.json', 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+        # Older indices have no term_max.npy; it is recomputed on load
+        term_max_path = index_dir / 'term_max.npy'
+        return cls(
+            vocab,
+            np.load(index_dir / 'indptr.npy', mmap_mode=mmap_mode),
+            np.load(index_dir / 'doc_ids.npy', mmap_mode=mmap_mode),
+            np.load(index_dir / 'impacts.npy', mmap_mode=mmap_mode),
+            meta,
+            term_max=np.load(term_max_path) if term_max_path.exists() else None,
+        )
+
+    @staticmethod
+    def exists(index_dir: Path) -> bool:
+        return (Path(index_dir) / 'meta.json').exists()
+
+    # ===== Scoring =====
+
+    def _query_postings(self, query: List[str]):
+        """Postings positions and per-posting weights for the (repeated) query terms"""
+        counts = Counter(query)
+        slices, weights = [], []
+        for term, count in counts.items():
+            term_id = self.term_to_id.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            if end > start:
+                slices.append(np.arange(start, end))
+                weights.append(np.full(end - start, count, dtype=np.float32))
+
+        if not slices:
+            return None, None
+        return np.concatenate(slices), np.concatenate(weights)
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        """BM25 score of every document (same contract as BM25Okapi.get_scores)"""
+        positions, weights = self._query_postings(query)
+        if positions is None:
+            return np.zeros(self.corpus_size)
+
+        return np.bincount(
+            self.doc_ids[positions],
+            weights=self.impacts[positions] * weights,
+            minlength=self.corpus_size,
+        )
+
+    def select_terms(self, query: List[str], stopwords: Optional[Iterable[str]] = None,
+                     max_df_ratio: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        Map query tokens to (term id, count), dropping low-impact terms:
+        - stopwords: function words ('của', 'và', 'là', ...)
+        - max_df_ratio: terms present in more than this fraction of documents
+
+        Dropping only happens if at least one term survives it.
+        """
+        counts = Counter(query)
+        terms = [(self.term_to_id[term], count, term) for term, count in counts.items() if term in self.term_to_id]
+
+        if stopwords or max_df_ratio:
+            stopwords = stopwords or ()
+            max_df = max_df_ratio * self.corpus_size if max_df_ratio else None
+            kept = [
+                (term_id, count, term) for term_id, count, term in terms
+                if term not in stopwords
+                and (max_df is None or self.indptr[term_id + 1] - self.indptr[term_id] <= max_df)
+            ]
+            if kept:
+                terms = kept
+
+        return [(term_id, count) for term_id, count, _ in terms]
+
+    def top_k(self, query: List[str], k: int, stopwords: Optional[Iterable[str]] = None,
+              max_df_ratio: Optional[float] = None, method: str = 'auto',
+              doc_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents by BM25
+
+        Args:
+            query: Query tokens
+            k: Number of documents
+            stopwords / max_df_ratio: Low-impact term dropping (see select_terms)
+            method: 'dense' (bincount + argpartition), 'maxscore', or 'auto' (by corpus size)
+            doc_mask: Optional bool array (corpus_size,): only these documents are eligible
+                      (filtered queries always take the dense path)
+
+        Returns:
+            (doc_ids, scores) sorted by descending score; only documents matching a term
+        """
+        return self.top_k_terms(self.select_terms(query, stopwords, max_df_ratio), k, method, doc_mask)
+
+    def top_k_terms(self, terms: List[Tuple[int, int]], k: int, method: str = 'auto',
+                    doc_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """top_k for already selected (term id, count) pairs (see select_terms)"""
+        if not terms or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        if doc_mask is not None or method == 'dense' or (method == 'auto' and self.corpus_size <= DENSE_TOP_K_MAX_DOCS):
+            return self._top_k_dense(terms, k, doc_mask)
+        return self._top_k_maxscore(terms, k)
+
+    def top_k_batch(self, terms_list: List[List[Tuple[int, int]]], k: int,
+                    doc_mask: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        top_k_terms for several queries in one pass
+
+        Small batches on small corpora share a single bincount over (query row, doc) slots;
+        otherwise each query goes through top_k_terms (MaxScore pruning on large corpora).
+        """
+        if len(terms_list) <= 1 or len(terms_list) * self.corpus_size > DENSE_TOP_K_MAX_DOCS:
+            return [self.top_k_terms(terms, k, doc_mask=doc_mask) for terms in terms_list]
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        slot_parts, score_parts = [], []
+        for row, terms in enumerate(terms_list):
+            for term_id, count in terms:
+                start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+                slot_parts.append(self.doc_ids[start:end].astype(np.int64) + row * self.corpus_size)
+                score_parts.append(np.asarray(self.impacts[start:end], dtype=np.float64) * count)
+        if not slot_parts or k <= 0:
+            return [empty for _ in terms_list]
+
+        scores = np.bincount(np.concatenate(slot_parts), weights=np.concatenate(score_parts),
+                             minlength=len(terms_list) * self.corpus_size).reshape(len(terms_list), self.corpus_size)
+        if doc_mask is not None:
+            scores[:, ~doc_mask] = 0.0
+
+        results = []
+        for row_scores in scores:
+            matched = np.flatnonzero(row_scores)
+            cand_ids, cand_scores = matched, row_scores[matched]
+            if len(cand_ids) > k:
+                top = np.argpartition(-cand_scores, k - 1)[:k]
+                cand_ids, cand_scores = cand_ids[top], cand_scores[top]
+            ranked = np.argsort(-cand_scores, kind='stable')
+            results.append((cand_ids[ranked], cand_scores[ranked]))
+        return results
+
+    def _top_k_dense(self, terms: List[Tuple[int, int]], k: int,
+                     doc_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every document, then argpartition (no full sort)"""
+        doc_parts, score_parts = [], []
+        for term_id, count in terms:
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            doc_parts.append(self.doc_ids[start:end])
+            score_parts.append(np.asarray(self.impacts[start:end], dtype=np.float64) * count)
+
+        scores = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(score_parts),
+                             minlength=self.corpus_size)
+        if doc_mask is not None:
+            scores[~doc_mask] = 0.0
+        matched = np.flatnonzero(scores)
+        cand_ids, cand_scores = matched, scores[matched]
+        if len(cand_ids) > k:
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            cand_ids, cand_scores = cand_ids[top], cand_scores[top]
+        ranked = np.argsort(-cand_scores, kind='stable')
+        return cand_ids[ranked], cand_scores[ranked]
+
+    def _top_k_maxscore(self, terms: List[Tuple[int, int]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents by BM25 with MaxScore dynamic pruning
+
+        Terms are processed by descending upper bound. Once the summed upper bounds of the
+        remaining terms cannot lift an unseen document past the current k-th score, the rest
+        are "non-essential": they are only probed (binary search) for documents already in
+        the candidate set, and candidates that can no longer reach the top-k are dropped.
+        Cost grows with the postings of the essential terms, not with corpus size.
+
+        Pruning needs non-negative contributions: a term whose impacts can be ≤ 0 (negative
+        idf floor when the corpus' average idf is negative) sends the query to _top_k_dense.
+        """
+        upper_bounds = np.array([self.term_max[term_id] * count for term_id, count in terms], dtype=np.float64)
+        if upper_bounds.min() <= 0:
+            return self._top_k_dense(terms, k)
+        order = np.argsort(-upper_bounds)
+        terms = [terms[i] for i in order]
+        # remaining[i] = max score contribution of terms i..end
+        remaining = np.append(np.cumsum(upper_bounds[order][::-1])[::-1], 0.0)
+
+        # np.zeros is calloc-backed: only pages touched by postings get materialized.
+        # accumulator always holds the exact partial score of every candidate.
+        accumulator = np.zeros(self.corpus_size, dtype=np.float64)
+        seen = np.zeros(self.corpus_size, dtype=bool)
+        cand_parts = []
+        n_cands = 0
+        threshold = -np.inf
+
+        # ===== Essential terms: full postings traversal =====
+        n_essential = len(terms)
+        for i, (term_id, count) in enumerate(terms):
+            if n_cands >= k and remaining[i] <= threshold:
+                n_essential = i
+                break
+
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            term_docs = self.doc_ids[start:end]
+            # Doc ids are unique within a term, so fancy-index add is safe
+            accumulator[term_docs] += np.asarray(self.impacts[start:end], dtype=np.float64) * count
+
+            new_docs = term_docs[~seen[term_docs]]
+            seen[new_docs] = True
+            cand_parts.append(new_docs)
+            n_cands += len(new_docs)
+
+            # k-th best partial score among this term's docs: a cheap lower bound of the final k-th score
+            if len(term_docs) >= k:
+                term_partials = accumulator[term_docs]
+                threshold = max(threshold, np.partition(term_partials, len(term_docs) - k)[len(term_docs) - k])
+
+        cand_ids = np.concatenate(cand_parts).astype(np.int64)
+        cand_scores = accumulator[cand_ids]
+        if n_essential < len(terms):
+            threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+
+        # ===== Non-essential terms: only candidates can still enter the top-k =====
+        for i in range(n_essential, len(terms)):
+            # Drop candidates that cannot reach the k-th score even with every remaining term
+            alive = cand_scores + remaining[i] >= threshold
+            if not alive.all():
+                cand_ids = cand_ids[alive]
+
+            term_id, count = terms[i]
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            term_docs = self.doc_ids[start:end]
+
+            if len(cand_ids) * max(1, int(np.log2(len(term_docs) + 1))) < len(term_docs):
+                # Few candidates: binary-search them in the postings list
+                positions = np.searchsorted(term_docs, cand_ids)
+                positions[positions == len(term_docs)] = 0
+                hits = term_docs[positions] == cand_ids
+                accumulator[cand_ids[hits]] += np.asarray(self.impacts[start:end])[positions[hits]] * count
+            else:
+                # Candidates cover most of the list: a straight scan is cheaper
+                accumulator[term_docs] += np.asarray(self.impacts[start:end], dtype=np.float64) * count
+
+            cand_scores = accumulator[cand_ids]
+            threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+
+        # ===== Select top-k =====
+        if len(cand_ids) > k:
+            top = np.argpartition(-cand_scores, k - 1)[:k]
+            cand_ids, cand_scores = cand_ids[top], cand_scores[top]
+        ranked = np.argsort(-cand_scores, kind='stable')
+        return cand_ids[ranked], cand_scores[ranked]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the CSR arrays"""
+        return int(self.indptr.nbytes + self.doc_ids.nbytes + self.impacts.nbytes + self.term_max.nbytes)
+
+
+def load_bm25_index(domain_dir: Path, mmap: bool = True):
+    """
+    Load a domain's BM25 index: native bm25/ directory if present,
+    otherwise the legacy bm25.pkl (BM25Okapi)
+    """
+    domain_dir = Path(domain_dir)
+    native_dir = domain_dir / BM25_DIRNAME
+    if SparseBM25.exists(native_dir):
+        return SparseBM25.load(native_dir, mmap=mmap)
+
+    pickle_path = domain_dir / 'bm25.pkl'
+    if pickle_path.exists():
+        import pickle
+        with open(pickle_path, 'rb') as f:
+            return pickle.load(f)
+
+    return None
@@ -0,0 +1,128 @@
+"""
+Chunk Store - O(1) random access to chunks.jsonl via a byte-offset sidecar
+"""
+import json
+import mmap
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+OFFSETS_SUFFIX = '.offsets.npy'
+
+
+def offsets_path_for(chunks_path: Path) -> Path:
+    """chunks.jsonl -> chunks.offsets.npy"""
+    chunks_path = Path(chunks_path)
+    return chunks_path.with_name(chunks_path.stem + OFFSETS_SUFFIX)
+
+
+def build_chunk_offsets(chunks_path: Path) -> np.ndarray:
+    """
+    Scan a JSONL file once and return line start offsets
+
+    Returns:
+        uint64 array with n_lines + 1 entries; the last entry is the file size,
+        so line i spans bytes [offsets[i], offsets[i + 1]).
+    """
+    offsets = [0]
+    position = 0
+    with open(chunks_path, 'rb') as f:
+        for line in f:
+            position += len(line)
+            offsets.append(position)
+    return np.asarray(offsets, dtype=np.uint64)
+
+
+def write_chunk_offsets(chunks_path: Path, offsets_path: Optional[Path] = None) -> np.ndarray:
+    """Build the offset table for chunks.jsonl and save it next to it (build time)"""
+    chunks_path = Path(chunks_path)
+    offsets_path = Path(offsets_path) if offsets_path else offsets_path_for(chunks_path)
+    offsets = build_chunk_offsets(chunks_path)
+    np.save(offsets_path, offsets)
+    return offsets
+
+
+class ChunkStore:
+    """
+    Read-only chunk access backed by mmap:
+    - Offsets: chunks.offsets.npy (written at build time, rebuilt on first load if missing/stale)
+    - Data: chunks.jsonl mapped into memory, one slice + json.loads per chunk
+    """
+
+    def __init__(self, chunks_path: Path, offsets_path: Optional[Path] = None):
+        self.chunks_path = Path(chunks_path)
+        self.offsets_path = Path(offsets_path) if offsets_path else offsets_path_for(self.chunks_path)
+        self._offsets: Optional[np.ndarray] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Load offsets and map the JSONL file (once)"""
+        if self._offsets is not None:
+            return
+
+        with self._lock:
+            if self._offsets is not None:
+                return
+
+            if not self.chunks_path.exists():
+                raise FileNotFoundError(f"Chunks file not found: {self.chunks_path}")
+
+            file_size = self.chunks_path.stat().st_size
+            offsets = None
+
+            if self.offsets_path.exists():
+                offsets = np.load(self.offsets_path, mmap_mode='r')
+                # Stale sidecar (chunks.jsonl rewritten without rebuilding offsets)
+                if len(offsets) == 0 or int(offsets[-1]) != file_size:
+                    print(f"⚠️ Stale chunk offsets: {self.offsets_path}, rebuilding", flush=True)
+                    offsets = None
+
+            if offsets is None:
+                # Fallback for domains built before offsets existed
+                offsets = build_chunk_offsets(self.chunks_path)
+                try:
+                    np.save(self.offsets_path, offsets)
+                    print(f"📝 Built chunk offsets: {self.offsets_path} ({len(offsets) - 1} chunks)", flush=True)
+                except OSError as e:
+                    print(f"⚠️ Could not save chunk offsets ({e}), keeping in memory", flush=True)
+
+            if file_size > 0:
+                self._file = open(self.chunks_path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._offsets = offsets
+
+    def __len__(self) -> int:
+        self._open()
+        return len(self._offsets) - 1
+
+    def get(self, idx: int) -> Dict:
+        """Read a single chunk by line index"""
+        self._open()
+        if idx < 0 or idx >= len(self._offsets) - 1:
+            raise IndexError(f"Chunk {idx} out of range ({len(self._offsets) - 1} chunks)")
+
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return json.loads(self._mmap[start:end])
+
+    def get_many(self, indices: Iterable[int]) -> Dict[int, Dict]:
+        """Read several chunks, skipping out-of-range indices"""
+        self._open()
+        n_chunks = len(self._offsets) - 1
+        # Sorted reads keep page access sequential
+        return {idx: self.get(idx) for idx in sorted(set(indices)) if 0 <= idx < n_chunks}
+
+    def close(self):
+        """Release mmap and file handle"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._offsets = None
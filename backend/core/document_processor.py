@@ -5,7 +5,137 @@ Document Processor - Load and process legal JSON documents
 import json
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+# Bump when chunk boundaries or chunk text change (recorded in each domain's metadata.json)
+CHUNKER_VERSION = 1
+
+# Characters read per refill of the streaming parser
+STREAM_READ_SIZE = 1 << 16
+
+
+def _domain_id_from_filename(json_filename: str) -> str:
+    # ✅ Extract domain_id from filename
+    # Example: "luat_hinh_su_hopnhat.json" → "hinh_su"
+    domain_id = json_filename.lower()
+    domain_id = re.sub(r'^luat_', '', domain_id)  # Remove "luat_" prefix
+    domain_id = re.sub(r'_hopnhat\.json$|\.json$', '', domain_id)  # Remove suffixes
+    domain_id = re.sub(r'[^a-z0-9_]', '_', domain_id)  # Clean special chars
+    return domain_id
+
+
+def _article_chunks(dieu: Dict, nguon_luat: str, domain_id: str, json_filename: str) -> Iterator[Dict]:
+    """Chunks of one article (Dieu): the article itself, or one per clause (Khoan) / point (Diem)"""
+    dieu_so = dieu.get('dieu_so')
+    
+    # ✅ FIX: Accept both numeric and alphanumeric article numbers (1, 2a, 13b, etc.)
+    if not dieu_so:
+        return
+    
+    dieu_so_str = str(dieu_so).strip()
+    if not dieu_so_str:
+        return
+
+    base_source = f'{nguon_luat}, Dieu {dieu_so}'
+    
+    # ✅ Support BOTH old and new format
+    # Old format: 'noi_dung_hien_hanh'
+    # New format: 'tieu_de' + 'mo_ta'
+    if 'noi_dung_hien_hanh' in dieu:
+        base_content = dieu['noi_dung_hien_hanh']
+    else:
+        # New format
+        content_parts = []
+        if dieu.get('tieu_de'):
+            content_parts.append(dieu['tieu_de'])
+        if dieu.get('mo_ta'):
+            content_parts.append(dieu['mo_ta'])
+        base_content = ' '.join(content_parts).strip()
+    
+    base_metadata = {
+        'law_id': domain_id,  # ✅ Use domain_id instead of filename
+        'law_name': nguon_luat,
+        'article_num': dieu_so_str,
+        'level': 'article',
+        'json_file': json_filename,
+        'chapter': dieu.get('chuong', '')  # ✅ Add chapter info
+    }
+    
+    if 'nguon_sua_doi' in dieu:
+        base_source += f' (sua doi boi {dieu["nguon_sua_doi"]})'
+        base_metadata['modified_by'] = dieu['nguon_sua_doi']
+
+    # Process article without clauses
+    if not dieu.get('khoan'):
+        yield {
+            'source': base_source,
+            'content': base_content,
+            'metadata': base_metadata
+        }
+        return
+
+    # Process clauses
+    for khoan in dieu['khoan']:
+        khoan_source = f'{base_source}, Khoan {khoan.get("khoan_so", "")}'
+        
+        # ✅ Support both 'noi_dung_hien_hanh' and 'noi_dung'
+        khoan_content = khoan.get('noi_dung_hien_hanh', khoan.get('noi_dung', ''))
+        
+        khoan_metadata = base_metadata.copy()
+        khoan_metadata.update({
+            'clause_num': khoan.get('khoan_so', ''),
+            'level': 'clause'
+        })
+        
+        if 'nguon_sua_doi' in khoan:
+            khoan_source += f' (sua doi boi {khoan["nguon_sua_doi"]})'
+            khoan_metadata['modified_by'] = khoan['nguon_sua_doi']
+
+        # Process clause without points
+        if not khoan.get('diem'):
+            # ✅ Contextual Chunking: Prepend Article content
+            # FIX: Put specific content FIRST to avoid truncation
+            full_content = f"{khoan_content}\n\n--- Context ---\n{base_content}" if base_content else khoan_content
+            
+            yield {
+                'source': khoan_source,
+                'content': full_content,
+                'metadata': khoan_metadata
+            }
+            continue
+        
+        # Process points (only in old format)
+        for diem in khoan.get('diem', []):
+            diem_source = f'{khoan_source}, Diem {diem.get("diem_so", "")}'
+            diem_content = diem.get('noi_dung_hien_hanh', diem.get('noi_dung', ''))
+            
+            diem_metadata = khoan_metadata.copy()
+            diem_metadata.update({
+                'point_num': diem.get('diem_so', ''),
+                'level': 'point'
+            })
+            
+            if 'nguon_sua_doi' in diem:
+                diem_source += f' (sua doi boi {diem["nguon_sua_doi"]})'
+                diem_metadata['modified_by'] = diem['nguon_sua_doi']
+            
+            # ✅ Contextual Chunking: Prepend Article + Clause content
+            # This ensures the point has full context
+            # FIX: Put specific content FIRST
+            context_parts = []
+            if base_content:
+                context_parts.append(base_content)
+            if khoan_content:
+                context_parts.append(khoan_content)
+            
+            full_context = "\n".join(context_parts)
+            full_point_content = f"{diem_content}\n\n--- Context ---\n{full_context}" if full_context else diem_content
+            
+            yield {
+                'source': diem_source,
+                'content': full_point_content,
+                'metadata': diem_metadata
+            }
 
 
 def xu_ly_van_ban_phap_luat_json(file_path: str) -> Tuple[List[Dict], str]:
@@ -19,7 +149,6 @@ def xu_ly_van_ban_phap_luat_json(file_path: str) -> Tuple[List[Dict], str]:
     Returns:
         Tuple of (chunks list, law source name)
     """
-    chunks = []
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -34,124 +163,143 @@ def xu_ly_van_ban_phap_luat_json(file_path: str) -> Tuple[List[Dict], str]:
     
     # Extract filename and domain_id for tracking
     json_filename = os.path.basename(file_path)
-    
-    # ✅ Extract domain_id from filename
-    # Example: "luat_hinh_su_hopnhat.json" → "hinh_su"
-    domain_id = json_filename.lower()
-    domain_id = re.sub(r'^luat_', '', domain_id)  # Remove "luat_" prefix
-    domain_id = re.sub(r'_hopnhat\.json$|\.json$', '', domain_id)  # Remove suffixes
-    domain_id = re.sub(r'[^a-z0-9_]', '_', domain_id)  # Clean special chars
+    domain_id = _domain_id_from_filename(json_filename)
 
+    chunks = []
     for dieu in data.get('du_lieu', []):
-        dieu_so = dieu.get('dieu_so')
-        
-        # ✅ FIX: Accept both numeric and alphanumeric article numbers (1, 2a, 13b, etc.)
-        if not dieu_so:
-            continue
-        
-        dieu_so_str = str(dieu_so).strip()
-        if not dieu_so_str:
-            continue
+        chunks.extend(_article_chunks(dieu, nguon_luat, domain_id, json_filename))
+    return chunks, nguon_luat
 
-        base_source = f'{nguon_luat}, Dieu {dieu_so}'
-        
-        # ✅ Support BOTH old and new format
-        # Old format: 'noi_dung_hien_hanh'
-        # New format: 'tieu_de' + 'mo_ta'
-        if 'noi_dung_hien_hanh' in dieu:
-            base_content = dieu['noi_dung_hien_hanh']
+
+# ===== Streaming =====
+
+class _JsonStream:
+    """
+    Incremental reader of one JSON document: values are decoded with raw_decode from a buffer
+    refilled from the file, so only the value being decoded is held in memory
+    """
+
+    _WHITESPACE = ' \t\n\r'
+    _DELIMITERS = _WHITESPACE + ',]}'
+
+    def __init__(self, f):
+        self._file = f
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._file.read(STREAM_READ_SIZE)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self._WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Strings and containers end on their closing character. A number or literal is only
+            # complete when a delimiter follows: '12.' decodes as 12 while '12.5' is still being read
+            complete = isinstance(value, (str, list, dict)) or (
+                end < len(self._buffer) and self._buffer[end] in self._DELIMITERS
+            )
+            if complete or not self._fill():
+                self._pos = end
+                return value
+
+
+def _iter_members(f, stream_key: str) -> Iterator[Tuple[str, object]]:
+    """
+    (key, value) per top-level member of a JSON object; the items of the array under stream_key
+    are yielded one by one as (stream_key, item) instead of as one list
+    """
+    stream = _JsonStream(f)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        key = stream.value()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", repr(key), 0)
+        stream.expect(':')
+        if key == stream_key and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() == ']':
+                stream.expect(']')
+            else:
+                while True:
+                    yield key, stream.value()
+                    if stream.expect(',]') == ']':
+                        break
         else:
-            # New format
-            content_parts = []
-            if dieu.get('tieu_de'):
-                content_parts.append(dieu['tieu_de'])
-            if dieu.get('mo_ta'):
-                content_parts.append(dieu['mo_ta'])
-            base_content = ' '.join(content_parts).strip()
-        
-        base_metadata = {
-            'law_id': domain_id,  # ✅ Use domain_id instead of filename
-            'law_name': nguon_luat,
-            'article_num': dieu_so_str,
-            'level': 'article',
-            'json_file': json_filename,
-            'chapter': dieu.get('chuong', '')  # ✅ Add chapter info
-        }
-        
-        if 'nguon_sua_doi' in dieu:
-            base_source += f' (sua doi boi {dieu["nguon_sua_doi"]})'
-            base_metadata['modified_by'] = dieu['nguon_sua_doi']
-
-        # Process article without clauses
-        if not dieu.get('khoan'):
-            chunks.append({
-                'source': base_source,
-                'content': base_content,
-                'metadata': base_metadata
-            })
-            continue
+            yield key, stream.value()
+        if stream.expect(',}') == '}':
+            return
 
-        # Process clauses
-        for khoan in dieu['khoan']:
-            khoan_source = f'{base_source}, Khoan {khoan.get("khoan_so", "")}'
-            
-            # ✅ Support both 'noi_dung_hien_hanh' and 'noi_dung'
-            khoan_content = khoan.get('noi_dung_hien_hanh', khoan.get('noi_dung', ''))
-            
-            khoan_metadata = base_metadata.copy()
-            khoan_metadata.update({
-                'clause_num': khoan.get('khoan_so', ''),
-                'level': 'clause'
-            })
-            
-            if 'nguon_sua_doi' in khoan:
-                khoan_source += f' (sua doi boi {khoan["nguon_sua_doi"]})'
-                khoan_metadata['modified_by'] = khoan['nguon_sua_doi']
-
-            # Process clause without points
-            if not khoan.get('diem'):
-                # ✅ Contextual Chunking: Prepend Article content
-                # FIX: Put specific content FIRST to avoid truncation
-                full_content = f"{khoan_content}\n\n--- Context ---\n{base_content}" if base_content else khoan_content
-                
-                chunks.append({
-                    'source': khoan_source,
-                    'content': full_content,
-                    'metadata': khoan_metadata
-                })
-                continue
-            
-            # Process points (only in old format)
-            for diem in khoan.get('diem', []):
-                diem_source = f'{khoan_source}, Diem {diem.get("diem_so", "")}'
-                diem_content = diem.get('noi_dung_hien_hanh', diem.get('noi_dung', ''))
-                
-                diem_metadata = khoan_metadata.copy()
-                diem_metadata.update({
-                    'point_num': diem.get('diem_so', ''),
-                    'level': 'point'
-                })
-                
-                if 'nguon_sua_doi' in diem:
-                    diem_source += f' (sua doi boi {diem["nguon_sua_doi"]})'
-                    diem_metadata['modified_by'] = diem['nguon_sua_doi']
-                
-                # ✅ Contextual Chunking: Prepend Article + Clause content
-                # This ensures the point has full context
-                # FIX: Put specific content FIRST
-                context_parts = []
-                if base_content:
-                    context_parts.append(base_content)
-                if khoan_content:
-                    context_parts.append(khoan_content)
-                
-                full_context = "\n".join(context_parts)
-                full_point_content = f"{diem_content}\n\n--- Context ---\n{full_context}" if full_context else diem_content
-                
-                chunks.append({
-                    'source': diem_source,
-                    'content': full_point_content,
-                    'metadata': diem_metadata
-                })
-                        
-    return chunks, nguon_luat
\ No newline at end of file
+
+def _scan_nguon(file_path: str) -> str:
+    """'nguon' of a file that lists it after 'du_lieu' (articles are decoded and dropped)"""
+    nguon_luat = 'Khong ro nguon'
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for key, value in _iter_members(f, 'du_lieu'):
+            if key == 'nguon':
+                nguon_luat = value
+    return nguon_luat
+
+
+def iter_van_ban_phap_luat_json(file_path: str) -> Iterator[Dict]:
+    """
+    Streaming version of xu_ly_van_ban_phap_luat_json for very large consolidated laws
+
+    Yields the same chunks in the same order, decoding 'du_lieu' one article at a time, so
+    memory stays flat whatever the document size. Errors are reported the same way but
+    re-raised: on a missing, malformed or truncated file the chunks of the articles before
+    the error have already been yielded, so callers must not take the output as complete.
+    """
+    json_filename = os.path.basename(file_path)
+    domain_id = _domain_id_from_filename(json_filename)
+    nguon_luat = None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for key, value in _iter_members(f, 'du_lieu'):
+                if key == 'nguon':
+                    nguon_luat = value
+                elif key == 'du_lieu':
+                    if nguon_luat is None:
+                        nguon_luat = _scan_nguon(file_path)
+                    yield from _article_chunks(value, nguon_luat, domain_id, json_filename)
+    except FileNotFoundError:
+        print(f'[ERROR] Khong tim thay file: {file_path}')
+        raise
+    except json.JSONDecodeError:
+        print(f'[ERROR] File khong hop le: {file_path}')
+        raise
@@ -1,13 +1,23 @@
 """
 Domain class - Lazy loading legal domain with separate indices
 """
+import asyncio
 import json
 import pickle
+import sys
+import threading
 import faiss
 import numpy as np
+from concurrent.futures import Future
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from sentence_transformers import SentenceTransformer
+from .bm25 import BM25_DIRNAME, load_bm25_index
+from .chunk_store import ChunkStore
+from .vector_index import read_vector_index, vector_search_params
+from .query_context import QueryContext
+from .fusion import hybrid_fuse
+from utils.memory import mapped_file_memory
 
 
 class Domain:
@@ -15,7 +25,8 @@ class Domain:
     Lazy-loading domain:
     - Metadata: Always in memory (tiny)
     - Indices: Load on first query (lazy)
-    - Chunks: Load on-demand from JSONL
+    - Chunks: Load on-demand from JSONL (byte-offset seeks via ChunkStore)
+    - Loading is single-flight: concurrent callers (threads or coroutines) share one load
     """
     
     def __init__(self, domain_id: str, embedder: SentenceTransformer):
@@ -40,7 +51,11 @@ class Domain:
         self._faiss_index = None
         self._tokenized_chunks = None
         self._chunks_cache = {}  # Cache loaded chunks
+        self._chunk_store = None
+        self._index_footprint = None  # Measured once per load
         self._loaded = False
+        self._load_lock = threading.Lock()
+        self._load_future: Optional[Future] = None  # In-flight load shared by all waiters
     
     @property
     def domain_name(self) -> str:
@@ -52,38 +67,107 @@ class Domain:
         """Get total number of chunks (from metadata)"""
         return self.metadata.get('total_chunks', self.metadata.get('chunk_count', 0))
     
+    @property
+    def vector_index_spec(self) -> Dict:
+        """Spec faiss.index was built with (resolved at build time; declared spec for older builds)"""
+        return self.metadata.get('vector_index_resolved') or self.metadata.get('vector_index') or {'type': 'flat', 'encoding': 'fp32'}
+    
     @property
     def is_loaded(self) -> bool:
         """Check if indices are loaded"""
         return self._loaded
     
-    def load_indices(self):
-        """Load BM25 and FAISS indices into memory"""
-        if self._loaded:
-            return
-        
-        print(f"📂 Loading indices for domain: {self.domain_id}", flush=True)
-        
-        # Load BM25
-        bm25_path = self.domain_dir / "bm25.pkl"
-        if bm25_path.exists():
-            with open(bm25_path, 'rb') as f:
-                self._bm25_index = pickle.load(f)
+    def _read_indices(self) -> Tuple[object, Optional[faiss.Index]]:
+        """Read BM25 and FAISS indices from disk (no shared state touched)"""
+        # Load BM25 (native CSR arrays via mmap, legacy bm25.pkl as fallback)
+        bm25_index = load_bm25_index(self.domain_dir)
         
         # Load FAISS
+        faiss_index = None
         faiss_path = self.domain_dir / "faiss.index"
         if faiss_path.exists():
-            self._faiss_index = faiss.read_index(str(faiss_path))
+            from config import FAISS_MMAP, FAISS_PREFAULT
+            faiss_index = read_vector_index(faiss_path, mmap=FAISS_MMAP, prefault=FAISS_PREFAULT)
+        
+        # Tokenized chunks are not needed for search → loaded only on access (tokenized_chunks)
+        return bm25_index, faiss_index
+    
+    def _claim_load(self) -> Tuple[Optional[Future], bool]:
+        """
+        Join or start the in-flight load
         
-        # Load tokenized chunks
-        tokens_path = self.domain_dir / "tokens.pkl"
-        if tokens_path.exists():
-            with open(tokens_path, 'rb') as f:
-                self._tokenized_chunks = pickle.load(f)
+        Returns:
+            (future, is_leader); future is None if already loaded
+        """
+        with self._load_lock:
+            if self._loaded:
+                return None, False
+            if self._load_future is not None:
+                return self._load_future, False
+            self._load_future = Future()
+            return self._load_future, True
+    
+    def _run_load(self, future: Future):
+        """Leader: read indices, publish them, resolve the shared future"""
+        try:
+            print(f"📂 Loading indices for domain: {self.domain_id}", flush=True)
+            bm25_index, faiss_index = self._read_indices()
+            
+            with self._load_lock:
+                self._bm25_index = bm25_index
+                self._faiss_index = faiss_index
+                self._index_footprint = None
+                self._loaded = True
+                self._load_future = None
+            
+            print(f"✅ Domain '{self.domain_id}' loaded: {self.metadata.get('total_chunks', 0)} chunks", flush=True)
+            future.set_result(None)
+        except BaseException as e:
+            with self._load_lock:
+                self._load_future = None
+            future.set_exception(e)
+            raise
+    
+    def load_indices(self):
+        """Load BM25 and FAISS indices into memory (blocking, thread-safe, single-flight)"""
+        if self._loaded:
+            return
         
-        self._loaded = True
-        self._loaded = True
-        print(f"✅ Domain '{self.domain_id}' loaded: {self.metadata.get('total_chunks', 0)} chunks", flush=True)
+        future, is_leader = self._claim_load()
+        if future is None:
+            return
+        if is_leader:
+            self._run_load(future)
+        else:
+            future.result()  # Wait for the leader (re-raises its error)
+    
+    async def load_indices_async(self):
+        """Await loading from the event loop; the disk read runs in the default executor"""
+        if self._loaded:
+            return
+        
+        future, is_leader = self._claim_load()
+        if future is None:
+            return
+        if is_leader:
+            await asyncio.get_running_loop().run_in_executor(None, self._run_load, future)
+        else:
+            await asyncio.wrap_future(future)
+    
+    def _acquire_indices(self) -> Tuple[object, Optional[faiss.Index], ChunkStore, Dict[int, Dict]]:
+        """
+        (bm25, faiss, chunk store, chunk cache) references that stay valid even if the domain is evicted meanwhile
+        
+        Captured together under the load lock: after an unload, in-flight searches read
+        through their own store and fill the discarded cache, not the evicted domain
+        """
+        for _ in range(2):
+            self.load_indices()
+            with self._load_lock:
+                if self._loaded:
+                    return (self._bm25_index, self._faiss_index) + self._chunk_handles_locked()
+        with self._load_lock:
+            return (self._bm25_index, self._faiss_index) + self._chunk_handles_locked()
     
     @property
     def bm25_index(self):
@@ -104,111 +188,243 @@ class Domain:
         """Lazy load tokenized chunks"""
         if self._tokenized_chunks is None:
             self.load_indices()
+            tokens_path = self.domain_dir / "tokens.pkl"
+            if tokens_path.exists():
+                with open(tokens_path, 'rb') as f:
+                    self._tokenized_chunks = pickle.load(f)
+                self._index_footprint = None  # Re-measure with token lists
         return self._tokenized_chunks
     
+    def _chunk_handles_locked(self) -> Tuple[ChunkStore, Dict[int, Dict]]:
+        """(chunk store, chunk cache), opening the store if needed; caller holds _load_lock"""
+        store = self._chunk_store
+        if store is None:
+            store = self._chunk_store = ChunkStore(self.domain_dir / "chunks.jsonl")
+        return store, self._chunks_cache
+    
+    def _chunk_handles(self) -> Tuple[ChunkStore, Dict[int, Dict]]:
+        with self._load_lock:
+            return self._chunk_handles_locked()
+    
+    @property
+    def chunk_store(self) -> ChunkStore:
+        """Lazy open chunk store (offset table + mmap of chunks.jsonl)"""
+        return self._chunk_handles()[0]
+    
     def get_chunk(self, idx: int) -> Dict:
         """Load chunk from JSONL (with caching)"""
-        if idx in self._chunks_cache:
-            return self._chunks_cache[idx]
+        store, cache = self._chunk_handles()
+        if idx in cache:
+            return cache[idx]
         
-        # Read specific line from JSONL
-        chunks_path = self.domain_dir / "chunks.jsonl"
-        if not chunks_path.exists():
-            raise FileNotFoundError(f"Chunks file not found: {chunks_path}")
+        try:
+            chunk = store.get(idx)
+        except IndexError:
+            raise IndexError(f"Chunk {idx} not found in domain {self.domain_id}")
         
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f):
-                if i == idx:
-                    chunk = json.loads(line)
-                    self._chunks_cache[idx] = chunk
-                    return chunk
+        cache[idx] = chunk
+        return chunk
+    
+    def get_chunk_map(self, indices: List[int],
+                      handles: Optional[Tuple[ChunkStore, Dict[int, Dict]]] = None) -> Dict[int, Dict]:
+        """
+        Batch load chunks as {index: chunk} (missing indices left out)
+        
+        handles: (store, cache) captured by _acquire_indices; looked up now if omitted
+        """
+        store, cache = handles if handles is not None else self._chunk_handles()
+        chunks = {}
+        for i in set(indices):
+            chunk = cache.get(i)
+            if chunk is not None:
+                chunks[i] = chunk
+        
+        needed_indices = set(indices) - chunks.keys()
+        if needed_indices:
+            # Seek directly to each needed line
+            fetched = store.get_many(needed_indices)
+            cache.update(fetched)
+            chunks.update(fetched)
         
-        raise IndexError(f"Chunk {idx} not found in domain {self.domain_id}")
+        return chunks
     
     def get_chunks(self, indices: List[int]) -> List[Dict]:
         """Batch load chunks (optimized)"""
-        needed_indices = set(indices) - set(self._chunks_cache.keys())
+        chunks = self.get_chunk_map(indices)
+        return [chunks[i] for i in indices if i in chunks]
+    
+    def search(self, query: str, tokenize_fn, top_k: int = 8,
+               context: Optional[QueryContext] = None) -> List[Dict]:
+        """
+        Hybrid search within this domain
         
-        if needed_indices:
-            # Read JSONL and cache needed chunks
-            chunks_path = self.domain_dir / "chunks.jsonl"
-            found_count = 0
-            with open(chunks_path, 'r', encoding='utf-8') as f:
-                for i, line in enumerate(f):
-                    if i in needed_indices:
-                        chunk = json.loads(line)
-                        self._chunks_cache[i] = chunk
-                        found_count += 1
-                        if found_count == len(needed_indices):
-                            break
-        
-        return [self._chunks_cache[i] for i in indices if i in self._chunks_cache]
-    
-    def search(self, query: str, tokenize_fn, top_k: int = 8) -> List[Dict]:
-        """Hybrid search within this domain"""
-        
-        # Ensure indices are loaded
-        self.load_indices()
-        
-        if self._bm25_index is None or self._faiss_index is None:
-            print(f"⚠️ Domain '{self.domain_id}' has no indices", flush=True)
+        context: pre-analyzed query (tokens, embedding) shared across domains; built here if omitted
+        """
+        if context is None:
+            context = QueryContext.build(query, tokenize_fn, self.embedder)
+        return self.search_batch([context], top_k)[0]
+    
+    def search_batch(self, contexts: List[QueryContext], top_k: int = 8) -> List[List[Dict]]:
+        """
+        Hybrid search for several pre-analyzed queries at once:
+        one FAISS call with a query matrix, one BM25 pass for all queries
+        
+        Returns:
+            One result list per context (same order)
+        """
+        if not contexts:
             return []
         
-        # Tokenize query
-        tokenized_query = tokenize_fn(query)
+        # Ensure indices are loaded (local refs: a concurrent unload can't pull them away)
+        bm25_index, faiss_index, chunk_store, chunks_cache = self._acquire_indices()
+        
+        if bm25_index is None or faiss_index is None:
+            print(f"⚠️ Domain '{self.domain_id}' has no indices", flush=True)
+            return [[] for _ in contexts]
+        
+        n_candidates = top_k * 2
         
         # ===== BM25 Search =====
-        bm25_scores = self._bm25_index.get_scores(tokenized_query)
-        bm25_top_indices = np.argsort(bm25_scores)[::-1][:top_k*2]
+        bm25_window = {}
+        if hasattr(bm25_index, 'top_k_batch'):
+            # Native index: top-k over each context's term ids, no full score arrays kept
+            # (matched documents only: fusion counts the rest as 0 scores, like the argsort below)
+            bm25_hits = bm25_index.top_k_batch([context.bm25_terms(bm25_index) for context in contexts], n_candidates)
+            bm25_window = {'bm25_k': n_candidates, 'bm25_docs': bm25_index.corpus_size}
+        else:
+            bm25_hits = []
+            for context in contexts:
+                bm25_scores = bm25_index.get_scores(context.tokens)
+                bm25_top_indices = np.argsort(bm25_scores)[::-1][:n_candidates]
+                bm25_hits.append((bm25_top_indices, bm25_scores[bm25_top_indices]))
         
         # ===== FAISS Search =====
-        query_embedding = self.embedder.encode([query], convert_to_numpy=True)
-        faiss_distances, faiss_indices = self._faiss_index.search(
-            query_embedding.astype('float32'), top_k*2
+        from config import FAISS_HNSW_EF_SEARCH, FAISS_IVF_NPROBE
+        search_params = vector_search_params(
+            faiss_index, self.vector_index_spec, ef_search=FAISS_HNSW_EF_SEARCH, nprobe=FAISS_IVF_NPROBE
         )
+        query_matrix = np.vstack([context.query_matrix for context in contexts])
+        faiss_distances, faiss_indices = faiss_index.search(query_matrix, n_candidates, params=search_params)
         
-        # ===== Normalize and Merge Scores =====
-        from config import BM25_WEIGHT, FAISS_WEIGHT
-        combined_scores = {}
+        # ===== Normalize and Merge Scores (per query, vectorized) =====
+        ranked_per_query = [
+            hybrid_fuse(bm25_ids, bm25_scores, faiss_distances[q], faiss_indices[q], top_k=top_k, **bm25_window)
+            for q, (bm25_ids, bm25_scores) in enumerate(bm25_hits)
+        ]
         
-        # BM25 normalization
-        if len(bm25_top_indices) > 0:
-            bm25_subset = bm25_scores[bm25_top_indices]
-            bm25_min, bm25_max = bm25_subset.min(), bm25_subset.max()
-            bm25_range = bm25_max - bm25_min
-            
-            if bm25_range > 0:
-                for idx in bm25_top_indices:
-                    normalized = (bm25_scores[idx] - bm25_min) / bm25_range
-                    combined_scores[int(idx)] = normalized * BM25_WEIGHT
-        
-        # FAISS contribution
-        for rank, idx in enumerate(faiss_indices[0]):
-            distance = faiss_distances[0][rank]
-            similarity = 1 / (1 + distance)
-            combined_scores[int(idx)] = combined_scores.get(int(idx), 0) + similarity * FAISS_WEIGHT
-        
-        # ===== Sort and Load Top Chunks =====
-        sorted_indices = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        top_indices = [idx for idx, score in sorted_indices[:top_k]]
-        
-        # ✅ Only load top chunks from disk
-        results = self.get_chunks(top_indices)
-        
-        # Add scores and domain info
-        for i, (idx, score) in enumerate(sorted_indices[:len(results)]):
-            if i < len(results):
-                results[i]['score'] = float(score)
-                results[i]['domain_name'] = self.metadata.get('name', self.domain_id)
-                results[i]['domain_id'] = self.domain_id
+        # ✅ Only load top chunks from disk, once for all queries
+        chunks = self.get_chunk_map([int(idx) for ids, _ in ranked_per_query for idx in ids],
+                                    handles=(chunk_store, chunks_cache))
+        
+        results = []
+        for ids, scores in ranked_per_query:
+            query_results = []
+            for idx, score in zip(ids.tolist(), scores.tolist()):
+                if idx not in chunks:
+                    continue
+                # Copies: cached dicts are shared between requests
+                result = dict(chunks[idx])
+                result['score'] = float(score)
+                result['domain_name'] = self.metadata.get('name', self.domain_id)
+                result['domain_id'] = self.domain_id
+                query_results.append(result)
+            results.append(query_results)
         
         return results
     
+    def memory_usage(self) -> Dict:
+        """
+        Memory report for this domain's FAISS index
+        
+        - mmap'd: resident (rss) vs shared (page cache, counted once across workers)
+          vs private bytes, read from /proc/self/smaps
+        - heap-loaded: private copy, estimated from the index file size
+        """
+        usage = {'loaded': self._loaded}
+        faiss_path = self.domain_dir / "faiss.index"
+        
+        if self._faiss_index is None or not faiss_path.exists():
+            return usage
+        
+        mapped = mapped_file_memory(faiss_path)
+        if mapped is not None:
+            usage['faiss'] = {'mode': 'mmap', **mapped}
+        else:
+            file_size = faiss_path.stat().st_size
+            usage['faiss'] = {'mode': 'heap', 'rss': file_size, 'pss': file_size, 'shared': 0, 'private': file_size}
+        usage['faiss']['index_type'] = type(self._faiss_index).__name__
+        usage['faiss']['vector_index'] = self.vector_index_spec
+        
+        return usage
+    
+    def _measure_index_footprint(self) -> Dict[str, int]:
+        """Bytes held by the loaded indices (heap vs file-backed mmap)"""
+        footprint = {'bm25_heap': 0, 'bm25_mapped': 0, 'faiss_heap': 0, 'faiss_mapped': 0, 'tokens_heap': 0}
+        
+        bm25 = self._bm25_index
+        if bm25 is not None:
+            if hasattr(bm25, 'nbytes'):
+                arrays = bm25.nbytes
+                mapped = isinstance(bm25.impacts, np.memmap)
+                footprint['bm25_mapped' if mapped else 'bm25_heap'] = arrays
+                # Vocabulary dict + strings stay on the heap
+                footprint['bm25_heap'] += sys.getsizeof(bm25.term_to_id) + sum(sys.getsizeof(t) for t in bm25.vocab)
+            else:
+                # Legacy BM25Okapi pickle: approximate by its file size
+                bm25_path = self.domain_dir / "bm25.pkl"
+                footprint['bm25_heap'] = bm25_path.stat().st_size if bm25_path.exists() else 0
+        
+        faiss_path = self.domain_dir / "faiss.index"
+        if self._faiss_index is not None and faiss_path.exists():
+            mapped = mapped_file_memory(faiss_path) is not None
+            footprint['faiss_mapped' if mapped else 'faiss_heap'] = faiss_path.stat().st_size
+        
+        if self._tokenized_chunks is not None:
+            footprint['tokens_heap'] = sys.getsizeof(self._tokenized_chunks) + sum(
+                sys.getsizeof(tokens) + sum(sys.getsizeof(t) for t in tokens)
+                for tokens in self._tokenized_chunks
+            )
+        
+        return footprint
+    
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Approximate memory held by this domain (0 when not loaded)
+        
+        Returns:
+            Per-component bytes plus 'heap', 'mapped' and 'total'
+        """
+        if not self._loaded:
+            return {'heap': 0, 'mapped': 0, 'total': 0}
+        
+        if self._index_footprint is None:
+            self._index_footprint = self._measure_index_footprint()
+        
+        footprint = dict(self._index_footprint)
+        footprint['chunks_cache_heap'] = sum(
+            sys.getsizeof(chunk.get('content', '')) for chunk in list(self._chunks_cache.values())
+        )
+        footprint['heap'] = sum(v for k, v in footprint.items() if k.endswith('_heap'))
+        footprint['mapped'] = sum(v for k, v in footprint.items() if k.endswith('_mapped'))
+        footprint['total'] = footprint['heap'] + footprint['mapped']
+        return footprint
+    
+    def estimated_footprint(self) -> int:
+        """Bytes a load is expected to add (index files on disk), for budgeting before loading"""
+        paths = [self.domain_dir / "faiss.index"]
+        bm25_dir = self.domain_dir / BM25_DIRNAME
+        paths += list(bm25_dir.iterdir()) if bm25_dir.is_dir() else [self.domain_dir / "bm25.pkl"]
+        return sum(path.stat().st_size for path in paths if path.is_file())
+    
     def unload(self):
         """Free memory (call when domain not needed)"""
-        self._bm25_index = None
-        self._faiss_index = None
-        self._tokenized_chunks = None
-        self._chunks_cache.clear()
-        self._loaded = False
+        with self._load_lock:
+            # In-flight searches keep their own references; memory is freed when they finish
+            self._bm25_index = None
+            self._faiss_index = None
+            self._tokenized_chunks = None
+            self._chunks_cache = {}
+            self._chunk_store = None
+            self._index_footprint = None
+            self._loaded = False
         print(f"💨 Domain '{self.domain_id}' unloaded from memory", flush=True)
@@ -1,13 +1,22 @@
 """
 Domain Manager - Quản lý multiple domains với lazy loading và domain detection
 """
+import asyncio
 import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 from utils.embedding import load_embedding_model
+from utils.embedding_cache import with_embedding_cache
+from utils.embedding_batcher import MicroBatchEmbedder, with_micro_batching
 from .domain import Domain
-from config import EMBEDDING_MODEL
+from .residency import DomainResidencyManager
+from .global_index import GlobalIndex
+from .query_context import QueryContext
+from config import EMBEDDING_MODEL, DOMAIN_MEMORY_BUDGET_MB, DOMAIN_PINNED, DOMAIN_HOT_PIN_COUNT
 
 
 class DomainManager:
@@ -16,12 +25,12 @@ class DomainManager:
     def __init__(self, embedder: Optional[SentenceTransformer] = None):
         self.registry_path = Path("data/domain_registry.json")
         
-        # Load embedder
+        # Load embedder (cache misses go through the micro-batcher, shared by all domains)
         if embedder is None:
             print("🧠 Loading embedder model...", flush=True)
-            self.embedder = load_embedding_model()
-        else:
-            self.embedder = embedder
+            embedder = load_embedding_model()
+        self.embedding_batcher = with_micro_batching(embedder)
+        self.embedder = with_embedding_cache(self.embedding_batcher)
         
         # ✅ Load registry (tiny, always in memory)
         if not self.registry_path.exists():
@@ -36,6 +45,30 @@ class DomainManager:
         for domain_id in self.registry.keys():
             self.domains[domain_id] = Domain(domain_id, self.embedder)
         
+        # ✅ Memory budget for loaded indices (LRU eviction)
+        self.residency = DomainResidencyManager(
+            budget_bytes=DOMAIN_MEMORY_BUDGET_MB * 1024 * 1024,
+            pinned=DOMAIN_PINNED,
+            hot_pin_count=DOMAIN_HOT_PIN_COUNT
+        )
+        
+        # ✅ Optional global cross-domain index (loaded on first multi-domain search)
+        self._global_index: Optional[GlobalIndex] = None
+        self._global_checked = False
+        self._global_lock = threading.Lock()
+        
+        # ✅ Multi-domain fan-out pool (created on first parallel search)
+        self._fanout_pool: Optional[ThreadPoolExecutor] = None
+        self._fanout_lock = threading.Lock()
+        self.fanout_timeouts: Dict[str, int] = {}
+        self.fanout_failures: Dict[str, int] = {}
+        
+        # ✅ Startup prewarm state (domain_id -> pending | loading | warm | failed | skipped)
+        self.prewarm_status: Dict[str, str] = {}
+        self.prewarm_errors: Dict[str, str] = {}
+        self.prewarm_started: Optional[float] = None
+        self.prewarm_finished: Optional[float] = None
+        
         print(f"✅ Loaded {len(self.domains)} domains (lazy mode): {list(self.domains.keys())}", flush=True)
     
     def detect_domain_from_keywords(self, query: str) -> Optional[str]:
@@ -103,44 +136,195 @@ class DomainManager:
         
         return unique_domains
     
-    def search_in_domain(self, query: str, domain_id: str, tokenize_fn, top_k: int = 8) -> List[Dict]:
+    def search_in_domain(self, query: str, domain_id: str, tokenize_fn, top_k: int = 8,
+                         context: Optional[QueryContext] = None) -> List[Dict]:
         """Search in a specific domain"""
         if domain_id not in self.domains:
             print(f"⚠️ Domain '{domain_id}' not found", flush=True)
             return []
         
         print(f"🔍 Searching in domain: {domain_id} ({self.registry[domain_id]['name']})", flush=True)
-        return self.domains[domain_id].search(query, tokenize_fn, top_k)
+        domain = self.domains[domain_id]
+        self.residency.record_access(domain_id, was_loaded=domain.is_loaded)
+        results = domain.search(query, tokenize_fn, top_k, context=context or self.analyze_query(query, tokenize_fn))
+        self.residency.enforce(self.domains, keep=[domain_id])
+        return results
     
-    def search_multi_domain(self, query: str, domain_ids: List[str], tokenize_fn, top_k: int = 8) -> List[Dict]:
-        """Search across multiple domains and merge results"""
-        all_results = []
+    @property
+    def global_index(self) -> Optional[GlobalIndex]:
+        """Global cross-domain index if enabled, built and up to date with every domain (else None)"""
+        if self._global_checked:
+            return self._global_index
         
-        for domain_id in domain_ids:
-            if domain_id in self.domains:
-                results = self.search_in_domain(query, domain_id, tokenize_fn, top_k)
-                all_results.extend(results)
+        with self._global_lock:
+            if self._global_checked:
+                return self._global_index
+            
+            from config import GLOBAL_INDEX_ENABLED, GLOBAL_INDEX_DIR, FAISS_MMAP
+            if GLOBAL_INDEX_ENABLED:
+                try:
+                    index = GlobalIndex.load(Path(GLOBAL_INDEX_DIR), mmap=FAISS_MMAP)
+                    stale = index.stale_domains() if index is not None else []
+                    if stale:
+                        print(f"⚠️ Global index is stale for {stale}, using per-domain search "
+                              f"(rebuild: python scripts/build_global_index.py)", flush=True)
+                    elif index is not None:
+                        self._global_index = index
+                        print(f"🌐 Global index loaded: {index.total_chunks} chunks, "
+                              f"{len(index.domain_ids)} domains", flush=True)
+                except Exception as e:
+                    print(f"⚠️ Could not load global index: {e}", flush=True)
+            self._global_checked = True
+            return self._global_index
+    
+    def search_global(self, query: str, tokenize_fn, top_k: int = 8,
+                      domain_ids: Optional[List[str]] = None,
+                      context: Optional[QueryContext] = None) -> List[Dict]:
+        """One scan of the global index over all (domain_ids=None) or selected domains"""
+        index = self.global_index
+        context = context or self.analyze_query(query, tokenize_fn)
+        hits = index.search(context, top_k=top_k, domain_ids=domain_ids)
         
-        # Sort by score and return top_k
-        all_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-        return all_results[:top_k]
+        # Chunk text from each domain's chunk store (no per-domain indices loaded)
+        by_domain: Dict[str, List[int]] = {}
+        for domain_id, local_idx, _ in hits:
+            by_domain.setdefault(domain_id, []).append(local_idx)
+        chunks = {}
+        for domain_id, local_ids in by_domain.items():
+            for local_idx, chunk in self.domains[domain_id].get_chunk_map(local_ids).items():
+                chunks[(domain_id, local_idx)] = chunk
+        
+        return self._global_results(hits, chunks)
     
-    def search_all_domains(self, query: str, tokenize_fn, top_k: int = 8) -> List[Dict]:
-        """Search across ALL domains (expensive, use as fallback)"""
-        print("🌐 Searching across all domains", flush=True)
+    def _global_results(self, hits: List[Tuple[str, int, float]], chunks: Dict[Tuple[str, int], Dict]) -> List[Dict]:
+        """Global index hits → result dicts (copies of the cached chunks)"""
+        results = []
+        for domain_id, local_idx, score in hits:
+            chunk = chunks.get((domain_id, local_idx))
+            if chunk is None:
+                continue
+            result = dict(chunk)
+            result['score'] = score
+            result['domain_name'] = self.domains[domain_id].metadata.get('name', domain_id)
+            result['domain_id'] = domain_id
+            results.append(result)
+        return results
+    
+    def _fanout_executor(self) -> ThreadPoolExecutor:
+        if self._fanout_pool is None:
+            with self._fanout_lock:
+                if self._fanout_pool is None:
+                    from config import SEARCH_FANOUT_WORKERS
+                    self._fanout_pool = ThreadPoolExecutor(
+                        max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="domain-search"
+                    )
+        return self._fanout_pool
+    
+    def fan_out(self, domain_ids: List[str], search_fn: Callable[[Domain], object]) -> Dict[str, object]:
+        """
+        Run search_fn(domain) for each domain concurrently (bounded pool)
+        
+        Domains that raise or miss the deadline are logged and left out, so callers merge
+        partial results. Each domain gets SEARCH_DOMAIN_TIMEOUT_SECONDS from the moment its
+        search starts running: time queued behind other requests on the shared pool doesn't
+        count. A timed-out search keeps running in the background (threads can't be
+        interrupted) and its indices stay loaded for the next query.
+        
+        Returns:
+            {domain_id: search_fn result} for the domains that finished in time
+        """
+        from config import SEARCH_FANOUT_WORKERS, SEARCH_DOMAIN_TIMEOUT_SECONDS
+        
+        started: Dict[str, float] = {}
+        
+        def run(domain_id: str):
+            started[domain_id] = time.monotonic()
+            domain = self.domains[domain_id]
+            self.residency.record_access(domain_id, was_loaded=domain.is_loaded)
+            return search_fn(domain)
         
-        all_results = []
-        for domain_id in self.domains.keys():
-            results = self.search_in_domain(query, domain_id, tokenize_fn, top_k)
-            all_results.extend(results)
+        results = {}
+        if len(domain_ids) <= 1 or SEARCH_FANOUT_WORKERS <= 1:
+            for domain_id in domain_ids:
+                try:
+                    results[domain_id] = run(domain_id)
+                except Exception as e:
+                    self._record_fanout_error(self.fanout_failures, domain_id, f"failed: {e}")
+        else:
+            futures = {self._fanout_executor().submit(run, domain_id): domain_id for domain_id in domain_ids}
+            timeout = SEARCH_DOMAIN_TIMEOUT_SECONDS if SEARCH_DOMAIN_TIMEOUT_SECONDS > 0 else None
+            pending = set(futures)
+            while pending:
+                # Sleep until the earliest running search's deadline (queued ones have none yet)
+                deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started] if timeout else []
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else timeout
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        self._record_fanout_error(self.fanout_failures, futures[future], f"failed: {e}")
+                
+                now = time.monotonic()
+                for future in [f for f in pending if timeout and futures[f] in started and not f.done()
+                               and now >= started[futures[f]] + timeout]:
+                    pending.discard(future)  # keeps running, finishes unobserved
+                    self._record_fanout_error(self.fanout_timeouts, futures[future],
+                                              f"timed out after {timeout:.1f}s, skipped")
+        
+        self.residency.enforce(self.domains, keep=domain_ids)
+        return results
+    
+    def _record_fanout_error(self, counter: Dict[str, int], domain_id: str, message: str):
+        with self._fanout_lock:
+            counter[domain_id] = counter.get(domain_id, 0) + 1
+        print(f"⚠️ Domain '{domain_id}' search {message} (partial results)", flush=True)
+    
+    def _search_domains(self, domain_ids: List[str], context: QueryContext, top_k: int) -> List[Dict]:
+        """Per-domain hybrid search fanned out in parallel, merged by score"""
+        per_domain = self.fan_out(domain_ids, lambda domain: domain.search(context.text, None, top_k, context=context))
+        
+        # Merge in domain order (stable tie order regardless of completion order)
+        all_results = [r for domain_id in domain_ids for r in per_domain.get(domain_id, [])]
         
         # Sort by score and return top_k
         all_results.sort(key=lambda x: x.get('score', 0), reverse=True)
         return all_results[:top_k]
     
+    def search_multi_domain(self, query: str, domain_ids: List[str], tokenize_fn, top_k: int = 8,
+                            context: Optional[QueryContext] = None) -> List[Dict]:
+        """Search across multiple domains and merge results (query analyzed once for all of them)"""
+        context = context or self.analyze_query(query, tokenize_fn)
+        domain_ids = [d for d in domain_ids if d in self.domains]
+        
+        index = self.global_index
+        if index is not None and len(domain_ids) > 1 and index.covers(domain_ids):
+            print(f"🌐 Global index search (filter: {domain_ids})", flush=True)
+            return self.search_global(query, tokenize_fn, top_k, domain_ids=domain_ids, context=context)
+        
+        print(f"🔍 Searching in domains: {domain_ids}", flush=True)
+        return self._search_domains(domain_ids, context, top_k)
+    
+    def search_all_domains(self, query: str, tokenize_fn, top_k: int = 8,
+                           context: Optional[QueryContext] = None) -> List[Dict]:
+        """Search across ALL domains (one global scan if built, else expensive per-domain fallback)"""
+        context = context or self.analyze_query(query, tokenize_fn)
+        index = self.global_index
+        if index is not None and index.covers(self.domains):
+            print("🌐 Searching across all domains (global index)", flush=True)
+            return self.search_global(query, tokenize_fn, top_k, context=context)
+        
+        print("🌐 Searching across all domains", flush=True)
+        return self._search_domains(list(self.domains.keys()), context, top_k)
+    
+    def analyze_query(self, query: str, tokenize_fn) -> QueryContext:
+        """Normalize, tokenize and embed a query once (shared by every domain searched)"""
+        return QueryContext.build(query, tokenize_fn, self.embedder)
+    
     def search(self, query: str, tokenize_fn, top_k: int = 8, 
                domain_ids: Optional[List[str]] = None,
-               intent_data: Optional[Dict] = None) -> List[Dict]:
+               intent_data: Optional[Dict] = None,
+               context: Optional[QueryContext] = None) -> List[Dict]:
         """
         Smart search with domain detection
         
@@ -149,31 +333,124 @@ class DomainManager:
         2. Detect from intent_data
         3. Detect from query keywords
         4. Search all domains (fallback)
+        
+        The query is analyzed (tokens + embedding) once here and reused by every domain searched.
         """
+        context = context or self.analyze_query(query, tokenize_fn)
         
         # Option 1: Use explicitly provided domains
         if domain_ids:
             if len(domain_ids) == 1:
-                return self.search_in_domain(query, domain_ids[0], tokenize_fn, top_k)
+                return self.search_in_domain(query, domain_ids[0], tokenize_fn, top_k, context=context)
             else:
-                return self.search_multi_domain(query, domain_ids, tokenize_fn, top_k)
+                return self.search_multi_domain(query, domain_ids, tokenize_fn, top_k, context=context)
         
         # Option 2: Detect from intent data
         if intent_data:
             detected = self.detect_domains_from_intent(intent_data)
             if detected:
                 if len(detected) == 1:
-                    return self.search_in_domain(query, detected[0], tokenize_fn, top_k)
+                    return self.search_in_domain(query, detected[0], tokenize_fn, top_k, context=context)
                 else:
-                    return self.search_multi_domain(query, detected, tokenize_fn, top_k)
+                    return self.search_multi_domain(query, detected, tokenize_fn, top_k, context=context)
         
         # Option 3: Detect from query keywords
         detected = self.detect_domain_from_keywords(query)
         if detected:
-            return self.search_in_domain(query, detected, tokenize_fn, top_k)
+            return self.search_in_domain(query, detected, tokenize_fn, top_k, context=context)
         
         # Option 4: Search all domains (fallback)
-        return self.search_all_domains(query, tokenize_fn, top_k)
+        return self.search_all_domains(query, tokenize_fn, top_k, context=context)
+    
+    def resolve_search_domains(self, query: str, domain_ids: Optional[List[str]] = None,
+                               intent_data: Optional[Dict] = None) -> List[str]:
+        """Domains search() would scan for a query (same priority order), all domains as fallback"""
+        if domain_ids:
+            return [d for d in domain_ids if d in self.domains]
+        if intent_data:
+            detected = self.detect_domains_from_intent(intent_data)
+            if detected:
+                return [d for d in detected if d in self.domains]
+        detected = self.detect_domain_from_keywords(query)
+        if detected:
+            return [detected]
+        return list(self.domains.keys())
+    
+    def search_batch(self, queries: List[str], tokenize_fn, top_k: int = 8,
+                     domain_hints: Optional[List[Optional[List[str]]]] = None) -> List[List[Dict]]:
+        """
+        Search several queries (e.g. sub-questions) at once
+        
+        All queries are encoded in one model call; queries are then grouped so that each
+        domain (or the global index, per shared filter) runs one FAISS search over a query
+        matrix and one BM25 pass for its whole group.
+        
+        Args:
+            queries: Query texts
+            domain_hints: Optional per-query domain ids (None entries → auto-detect)
+        
+        Returns:
+            One result list per query (same order), each sorted by score, at most top_k
+        """
+        if not queries:
+            return []
+        domain_hints = domain_hints or [None] * len(queries)
+        contexts = QueryContext.build_batch(queries, tokenize_fn, self.embedder)
+        targets = [
+            self.resolve_search_domains(query, hint) for query, hint in zip(queries, domain_hints)
+        ]
+        
+        results: List[List[Dict]] = [[] for _ in queries]
+        index = self.global_index
+        
+        # ===== Multi-domain queries: global index, one batch per distinct filter =====
+        per_domain: Dict[str, List[int]] = {}
+        global_groups: Dict[Tuple[str, ...], List[int]] = {}
+        for q, domain_ids in enumerate(targets):
+            if index is not None and len(domain_ids) > 1 and index.covers(domain_ids):
+                global_groups.setdefault(tuple(domain_ids), []).append(q)
+            else:
+                for domain_id in domain_ids:
+                    per_domain.setdefault(domain_id, []).append(q)
+        
+        global_queries = {q for positions in global_groups.values() for q in positions}
+        for domain_ids, positions in global_groups.items():
+            filter_ids = None if set(domain_ids) == set(self.domains) else list(domain_ids)
+            print(f"🌐 Global index batch search: {len(positions)} queries (filter: {filter_ids or 'all'})", flush=True)
+            batch_hits = index.search_batch([contexts[q] for q in positions], top_k=top_k, domain_ids=filter_ids)
+            
+            by_domain: Dict[str, List[int]] = {}
+            for hits in batch_hits:
+                for domain_id, local_idx, _ in hits:
+                    by_domain.setdefault(domain_id, []).append(local_idx)
+            chunks = {}
+            for domain_id, local_ids in by_domain.items():
+                for local_idx, chunk in self.domains[domain_id].get_chunk_map(local_ids).items():
+                    chunks[(domain_id, local_idx)] = chunk
+            
+            for q, hits in zip(positions, batch_hits):
+                results[q] = self._global_results(hits, chunks)
+        
+        # ===== Per-domain batches =====
+        def search_group(domain: Domain) -> List[List[Dict]]:
+            positions = per_domain[domain.domain_id]
+            print(f"🔍 Batch search in domain: {domain.domain_id} ({len(positions)} queries)", flush=True)
+            return domain.search_batch([contexts[q] for q in positions], top_k)
+        
+        domain_results: Dict[Tuple[int, str], List[Dict]] = {}
+        if per_domain:
+            for domain_id, batch_results in self.fan_out(list(per_domain), search_group).items():
+                for q, query_results in zip(per_domain[domain_id], batch_results):
+                    domain_results[(q, domain_id)] = query_results
+        
+        # Merge in target order (same tie order as search_multi_domain); missing domains = partial results
+        for q, domain_ids in enumerate(targets):
+            if q in global_queries:
+                continue
+            merged = [r for domain_id in domain_ids for r in domain_results.get((q, domain_id), [])]
+            merged.sort(key=lambda x: x.get('score', 0), reverse=True)
+            results[q] = merged[:top_k]
+        return results
     
     def get_domain_info(self, domain_id: str) -> Optional[Dict]:
         """Get domain metadata"""
@@ -192,7 +469,141 @@ class DomainManager:
             for domain_id, meta in self.registry.items()
         ]
     
+    def memory_report(self) -> Dict[str, Dict]:
+        """Per-domain resident vs shared index memory"""
+        return {domain_id: domain.memory_usage() for domain_id, domain in self.domains.items()}
+    
+    def embedding_cache_stats(self) -> Optional[Dict]:
+        """Query-embedding cache hit rate and size (None if the cache is disabled)"""
+        cache = getattr(self.embedder, 'cache', None)
+        return cache.stats() if cache is not None else None
+    
+    def embedding_batch_stats(self) -> Optional[Dict]:
+        """Query-encode queue depth and batch-size histogram (None if micro-batching is disabled)"""
+        if isinstance(self.embedding_batcher, MicroBatchEmbedder):
+            return self.embedding_batcher.batch_stats()
+        return None
+    
+    def residency_stats(self) -> Dict:
+        """Loaded domains, footprints, hits and evictions"""
+        return self.residency.stats(self.domains)
+    
+    def fanout_stats(self) -> Dict:
+        """Per-domain timeouts / failures dropped from multi-domain searches"""
+        from config import SEARCH_FANOUT_WORKERS, SEARCH_DOMAIN_TIMEOUT_SECONDS
+        with self._fanout_lock:
+            return {
+                'workers': SEARCH_FANOUT_WORKERS,
+                'domain_timeout_seconds': SEARCH_DOMAIN_TIMEOUT_SECONDS,
+                'timeouts': dict(self.fanout_timeouts),
+                'failures': dict(self.fanout_failures),
+            }
+    
+    def resolve_prewarm_targets(self, spec: str) -> List[str]:
+        """PREWARM_DOMAINS value → domain ids ('' = none, 'all' = every domain)"""
+        spec = spec.strip()
+        if not spec:
+            return []
+        if spec.lower() == 'all':
+            return list(self.domains.keys())
+        
+        targets = []
+        for domain_id in (d.strip() for d in spec.split(',')):
+            if domain_id in self.domains and domain_id not in targets:
+                targets.append(domain_id)
+            elif domain_id and domain_id not in self.domains:
+                print(f"⚠️ Prewarm: unknown domain '{domain_id}' ignored", flush=True)
+        return targets
+    
+    async def prewarm(self, domain_ids: List[str], max_workers: int = 4):
+        """
+        Load domain indices in parallel worker threads without blocking the event loop
+        
+        Queries arriving meanwhile join the in-flight load (Domain.load_indices is single-flight).
+        Stops loading new domains once the residency memory budget is full: each worker checks
+        the budget right before its load, counting the loads still in flight at their on-disk size.
+        """
+        if not domain_ids:
+            return
+        
+        for domain_id in domain_ids:
+            self.prewarm_status[domain_id] = 'pending'
+        self.prewarm_started = time.time()
+        print(f"🔥 Prewarming {len(domain_ids)} domains ({max_workers} workers): {domain_ids}", flush=True)
+        
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='prewarm')
+        
+        admission = threading.Lock()
+        in_flight: Dict[str, int] = {}  # admitted loads → expected bytes
+        
+        def load_within_budget(domain_id: str) -> bool:
+            domain = self.domains[domain_id]
+            with admission:
+                if not self.residency.has_headroom(self.domains, reserved=sum(in_flight.values())):
+                    return False
+                in_flight[domain_id] = domain.estimated_footprint()
+                self.prewarm_status[domain_id] = 'loading'
+            try:
+                domain.load_indices()
+            finally:
+                with admission:
+                    del in_flight[domain_id]
+            return True
+        
+        async def warm(domain_id: str):
+            try:
+                loaded = await loop.run_in_executor(executor, load_within_budget, domain_id)
+                self.prewarm_status[domain_id] = 'warm' if loaded else 'skipped'
+            except Exception as e:
+                self.prewarm_status[domain_id] = 'failed'
+                self.prewarm_errors[domain_id] = str(e)
+                print(f"❌ Prewarm failed for {domain_id}: {e}", flush=True)
+        
+        try:
+            await asyncio.gather(*(warm(domain_id) for domain_id in domain_ids))
+            self.residency.enforce(self.domains)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.prewarm_finished = time.time()
+        
+        warm_count = sum(1 for status in self.prewarm_status.values() if status == 'warm')
+        print(f"✅ Prewarm done: {warm_count}/{len(domain_ids)} domains warm "
+              f"in {self.prewarm_finished - self.prewarm_started:.1f}s", flush=True)
+    
+    def readiness(self) -> Dict:
+        """Prewarm progress: ready once no prewarm load is pending or running"""
+        domains = {}
+        for domain_id, domain in self.domains.items():
+            status = self.prewarm_status.get(domain_id)
+            if domain.is_loaded:
+                status = 'warm'
+            elif status == 'warm':
+                status = 'evicted'
+            domains[domain_id] = status or 'lazy'
+        
+        in_progress = [d for d, status in self.prewarm_status.items() if status in ('pending', 'loading')]
+        elapsed = None
+        if self.prewarm_started is not None:
+            elapsed = (self.prewarm_finished or time.time()) - self.prewarm_started
+        
+        return {
+            'ready': not in_progress,
+            'warm': [d for d, status in domains.items() if status == 'warm'],
+            'in_progress': in_progress,
+            'failed': {d: e for d, e in self.prewarm_errors.items() if not self.domains[d].is_loaded},
+            'domains': domains,
+            'prewarm_seconds': elapsed,
+        }
+    
     def unload_all(self):
         """Unload all domains from memory"""
         for domain in self.domains.values():
             domain.unload()
+        with self._global_lock:
+            self._global_index = None
+            self._global_checked = False
+        with self._fanout_lock:
+            if self._fanout_pool is not None:
+                self._fanout_pool.shutdown(wait=False, cancel_futures=True)
+                self._fanout_pool = None
@@ -0,0 +1,192 @@
+"""
+Score Fusion - vectorized merging of ranked candidate lists (min-max / z-score / RRF) with argpartition top-k
+"""
+import numpy as np
+from typing import Hashable, Dict, List, Optional, Sequence, Tuple
+
+RRF_K = 60
+
+# Up to this many (id, score) pairs, merging in a dict is cheaper than unique + bincount
+SMALL_MERGE_MAX = 64
+
+
+def minmax_normalize(scores: np.ndarray, low: Optional[float] = None) -> Optional[np.ndarray]:
+    """Scale to [0, 1] (low: floor below the list's own min); None for a constant list (no ranking signal)"""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    low = scores.min() if low is None else min(low, scores.min())
+    high = scores.max()
+    if high - low <= 0:
+        return None
+    return (scores - low) / (high - low)
+
+
+def zscore_normalize(scores: np.ndarray) -> Optional[np.ndarray]:
+    """Zero mean, unit variance; None for a constant list"""
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(scores) == 0:
+        return scores
+    std = scores.std()
+    if std <= 0:
+        return None
+    return (scores - scores.mean()) / std
+
+
+NORMALIZERS = {
+    'minmax': minmax_normalize,
+    'zscore': zscore_normalize,
+    None: lambda scores: np.asarray(scores, dtype=np.float64),
+}
+
+
+def top_k_positions(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Positions of the k best scores, best first; ties keep position order (like a stable sort)
+
+    argpartition finds the k-th score in O(n); only the survivors are sorted.
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    threshold = -np.partition(-scores, k - 1)[k - 1]
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
+
+
+def _accumulate(id_parts: List[np.ndarray], contributions: List[np.ndarray],
+                top_k: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum contributions per id (ids in first-seen order, so ties rank like dict insertion order)"""
+    if not id_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    all_ids = np.concatenate(id_parts)
+    if len(all_ids) <= SMALL_MERGE_MAX:
+        # A handful of candidates: one dict pass over plain lists beats numpy's per-call overhead
+        fused_small: Dict[int, float] = {}
+        for idx, value in zip(all_ids.tolist(), np.concatenate(contributions).tolist()):
+            fused_small[idx] = fused_small.get(idx, 0.0) + value
+        ranked = sorted(fused_small.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return (np.fromiter((idx for idx, _ in ranked), dtype=np.int64, count=len(ranked)),
+                np.fromiter((value for _, value in ranked), dtype=np.float64, count=len(ranked)))
+    unique_ids, first_seen, inverse = np.unique(all_ids, return_index=True, return_inverse=True)
+    fused = np.bincount(inverse.reshape(-1), weights=np.concatenate(contributions), minlength=len(unique_ids))
+
+    order = np.argsort(first_seen, kind='stable')
+    unique_ids, fused = unique_ids[order], fused[order]
+    top = top_k_positions(fused, top_k)
+    return unique_ids[top], fused[top]
+
+
+def fuse_scores(ids: Sequence[np.ndarray], scores: Sequence[np.ndarray],
+                weights: Optional[Sequence[float]] = None, normalize='minmax',
+                top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted sum of per-list normalized scores over the union of candidate ids
+
+    Args:
+        ids / scores: One (candidate ids, scores) array pair per retriever; negative ids (FAISS padding) are ignored
+        weights: Per-list weight (default 1.0)
+        normalize: 'minmax', 'zscore', None or a callable, or one of those per list
+        top_k: Keep only the best k (None = all, sorted)
+
+    Returns:
+        (ids, fused scores) sorted by descending score
+    """
+    weights = weights if weights is not None else [1.0] * len(ids)
+    methods = normalize if isinstance(normalize, (list, tuple)) else [normalize] * len(ids)
+
+    id_parts, contributions = [], []
+    for list_ids, list_scores, weight, method in zip(ids, scores, weights, methods):
+        list_ids = np.asarray(list_ids, dtype=np.int64).reshape(-1)
+        list_scores = np.asarray(list_scores, dtype=np.float64).reshape(-1)
+        valid = list_ids >= 0
+        if not valid.all():
+            list_ids, list_scores = list_ids[valid], list_scores[valid]
+        normalized = (method if callable(method) else NORMALIZERS[method])(list_scores)
+        if normalized is None or len(list_ids) == 0:
+            continue
+        id_parts.append(list_ids)
+        contributions.append(normalized * weight)
+    return _accumulate(id_parts, contributions, top_k)
+
+
+def rrf_fuse(rank_lists: Sequence[np.ndarray], weights: Optional[Sequence[float]] = None,
+             k: int = RRF_K, top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted Reciprocal Rank Fusion over integer id arrays: score = sum(weight / (k + rank))
+
+    Returns:
+        (ids, RRF scores) sorted by descending score
+    """
+    weights = weights if weights is not None else [1.0] * len(rank_lists)
+    id_parts, contributions = [], []
+    for rank_list, weight in zip(rank_lists, weights):
+        rank_list = np.asarray(rank_list, dtype=np.int64).reshape(-1)
+        ranks = np.flatnonzero(rank_list >= 0)  # rank = original position (padding skipped)
+        if len(ranks) == 0:
+            continue
+        id_parts.append(rank_list[ranks])
+        contributions.append(weight / (k + ranks + 1.0))
+    return _accumulate(id_parts, contributions, top_k)
+
+
+def rrf_fuse_keys(rank_lists: Sequence[Sequence[Hashable]], weights: Optional[Sequence[float]] = None,
+                  k: int = RRF_K) -> Dict[Hashable, float]:
+    """rrf_fuse for arbitrary hashable keys (e.g. (domain_id, chunk id)); dict ordered by descending score"""
+    codes: Dict[Hashable, int] = {}
+    coded = [np.fromiter((codes.setdefault(key, len(codes)) for key in keys), dtype=np.int64, count=len(keys))
+             for keys in rank_lists]
+    ids, scores = rrf_fuse(coded, weights, k)
+    keys = list(codes)
+    return {keys[i]: float(score) for i, score in zip(ids, scores)}
+
+
+def sparse_top_k_window(scores: np.ndarray, k: int, n_docs: int) -> Tuple[int, Optional[float]]:
+    """
+    Read a sparse top-k (matched documents only, best first) as the top k of the full score
+    array, where the n_docs - len(scores) unmatched documents score 0
+
+    Returns:
+        (how many of the hits stay in the window, min-max floor: 0.0 when unmatched
+        documents fill part of the window, else None = the hits' own min)
+    """
+    if len(scores) >= k:
+        return len(scores), None
+    non_negative = int(np.count_nonzero(np.asarray(scores) >= 0))
+    zeros = min(n_docs - len(scores), k - non_negative)
+    if zeros <= 0:
+        return len(scores), None
+    return min(len(scores), k - zeros), 0.0
+
+
+def hybrid_fuse(bm25_ids: np.ndarray, bm25_scores: np.ndarray,
+                faiss_distances: np.ndarray, faiss_ids: np.ndarray,
+                top_k: Optional[int] = None, bm25_k: Optional[int] = None,
+                bm25_docs: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Domain search scoring: min-max BM25 × BM25_WEIGHT + 1/(1+L2 distance) × FAISS_WEIGHT
+
+    bm25_k / bm25_docs: the BM25 hits are a sparse top bm25_k of bm25_docs documents. With
+    fewer hits than bm25_k, min-max scaling counts the unmatched documents as 0 scores (as
+    the top bm25_k of the full score array did), so a single or weakest match keeps its weight.
+
+    Returns:
+        (chunk indices, scores) sorted by descending score
+    """
+    from config import BM25_WEIGHT, FAISS_WEIGHT
+    faiss_distances = np.asarray(faiss_distances, dtype=np.float64).reshape(-1)
+    bm25_normalize = 'minmax'
+    if bm25_k is not None and bm25_docs is not None:
+        count, floor = sparse_top_k_window(bm25_scores, bm25_k, bm25_docs)
+        bm25_ids, bm25_scores = bm25_ids[:count], bm25_scores[:count]
+        if floor is not None:
+            bm25_normalize = lambda scores: minmax_normalize(scores, low=floor)
+    return fuse_scores(
+        [bm25_ids, faiss_ids],
+        [bm25_scores, 1.0 / (1.0 + faiss_distances)],
+        weights=[BM25_WEIGHT, FAISS_WEIGHT],
+        normalize=[bm25_normalize, None],
+        top_k=top_k,
+    )
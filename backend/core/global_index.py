@@ -0,0 +1,201 @@
+"""
+Global Index - one vector index + one BM25 index over all domains, filtered by domain id
+"""
+import json
+import pickle
+import time
+import faiss
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from .bm25 import SparseBM25, BM25_DIRNAME
+from .fusion import hybrid_fuse
+from .query_context import QueryContext
+from .vector_index import (
+    build_vector_index, index_vectors, read_vector_index, resolve_index_spec, vector_search_params
+)
+
+FORMAT_VERSION = 1
+GLOBAL_META = 'global_meta.json'
+DOMAIN_CODES = 'domain_codes.npy'  # int16 per global id → position in meta['domains']
+LOCAL_IDS = 'local_ids.npy'        # int32 per global id → chunk index within its domain
+
+
+def domain_signature(domain_dir: Path) -> Dict:
+    """Cheap fingerprint of a built domain (detects rebuilds since the global index was made)"""
+    domain_dir = Path(domain_dir)
+    with open(domain_dir / "metadata.json", 'r', encoding='utf-8') as f:
+        total_chunks = json.load(f).get('total_chunks', 0)
+    return {
+        'total_chunks': total_chunks,
+        'chunks_bytes': (domain_dir / "chunks.jsonl").stat().st_size,
+        'faiss_bytes': (domain_dir / "faiss.index").stat().st_size,
+    }
+
+
+def build_global_index(domain_ids: List[str], domains_root: Path = Path("data/domains"),
+                       out_dir: Path = Path("data/global"), spec: Optional[Dict] = None) -> Dict:
+    """
+    Concatenate built domains into one index (global id = domain offset + local chunk index)
+
+    Vectors are read back from each domain's faiss.index, tokens from tokens.pkl,
+    so no re-encoding is needed.
+
+    Returns:
+        Written global_meta.json content
+    """
+    domains_root, out_dir = Path(domains_root), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    vector_parts, tokens, codes, local_ids, domains = [], [], [], [], []
+    offset = 0
+    for code, domain_id in enumerate(domain_ids):
+        domain_dir = domains_root / domain_id
+        vectors = index_vectors(faiss.read_index(str(domain_dir / "faiss.index")))
+        with open(domain_dir / "tokens.pkl", 'rb') as f:
+            domain_tokens = pickle.load(f)
+        if len(domain_tokens) != len(vectors):
+            raise ValueError(f"{domain_id}: {len(domain_tokens)} token lists vs {len(vectors)} vectors")
+
+        vector_parts.append(vectors)
+        tokens.extend(domain_tokens)
+        codes.append(np.full(len(vectors), code, dtype=np.int16))
+        local_ids.append(np.arange(len(vectors), dtype=np.int32))
+        domains.append({
+            'domain_id': domain_id,
+            'offset': offset,
+            'count': len(vectors),
+            'signature': domain_signature(domain_dir),
+        })
+        offset += len(vectors)
+
+    vectors = np.vstack(vector_parts)
+    spec = resolve_index_spec(spec, *vectors.shape)
+    faiss.write_index(build_vector_index(vectors, spec), str(out_dir / "faiss.index"))
+    SparseBM25.from_corpus(tokens).save(out_dir / BM25_DIRNAME)
+    np.save(out_dir / DOMAIN_CODES, np.concatenate(codes))
+    np.save(out_dir / LOCAL_IDS, np.concatenate(local_ids))
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'total_chunks': offset,
+        'domains': domains,
+        'vector_index': spec,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    # global_meta.json last: its presence marks a complete index
+    with open(out_dir / GLOBAL_META, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class GlobalIndex:
+    """Cross-domain hybrid search in one scan; domain filters via FAISS ID selector + BM25 doc mask"""
+
+    def __init__(self, bm25: SparseBM25, faiss_index: faiss.Index,
+                 domain_codes: np.ndarray, local_ids: np.ndarray, meta: Dict):
+        self.bm25 = bm25
+        self.faiss_index = faiss_index
+        self.domain_codes = domain_codes
+        self.local_ids = local_ids
+        self.meta = meta
+        self.domain_ids = [d['domain_id'] for d in meta['domains']]
+        self._code_of = {domain_id: code for code, domain_id in enumerate(self.domain_ids)}
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> Optional['GlobalIndex']:
+        """Load a built global index (None if absent)"""
+        index_dir = Path(index_dir)
+        meta_path = index_dir / GLOBAL_META
+        if not meta_path.exists():
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported global index format in {index_dir}: {meta.get('format_version')}")
+
+        mmap_mode = 'r' if mmap else None
+        return cls(
+            SparseBM25.load(index_dir / BM25_DIRNAME, mmap=mmap),
+            read_vector_index(index_dir / "faiss.index", mmap=mmap),
+            np.load(index_dir / DOMAIN_CODES, mmap_mode=mmap_mode),
+            np.load(index_dir / LOCAL_IDS, mmap_mode=mmap_mode),
+            meta,
+        )
+
+    def stale_domains(self, domains_root: Path = Path("data/domains")) -> List[str]:
+        """Domains rebuilt (or removed) since this index was built"""
+        stale = []
+        for entry in self.meta['domains']:
+            domain_dir = Path(domains_root) / entry['domain_id']
+            try:
+                if domain_signature(domain_dir) != entry['signature']:
+                    stale.append(entry['domain_id'])
+            except FileNotFoundError:
+                stale.append(entry['domain_id'])
+        return stale
+
+    def covers(self, domain_ids: Iterable[str]) -> bool:
+        return all(domain_id in self._code_of for domain_id in domain_ids)
+
+    def _doc_mask(self, domain_ids: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Bool mask over global ids (None = every domain)"""
+        if domain_ids is None:
+            return None
+        codes = [self._code_of[domain_id] for domain_id in domain_ids]
+        if len(codes) == len(self.domain_ids):
+            return None
+        return np.isin(self.domain_codes, codes)
+
+    def search(self, context: QueryContext, top_k: int = 8,
+               domain_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, int, float]]:
+        """
+        Hybrid search (same scoring as Domain.search) over all or selected domains
+
+        Returns:
+            [(domain_id, local chunk index, score)] sorted by descending score
+        """
+        return self.search_batch([context], top_k, domain_ids)[0]
+
+    def search_batch(self, contexts: List[QueryContext], top_k: int = 8,
+                     domain_ids: Optional[Iterable[str]] = None) -> List[List[Tuple[str, int, float]]]:
+        """search() for several queries sharing one domain filter: one FAISS call, one BM25 pass"""
+        from config import FAISS_HNSW_EF_SEARCH, FAISS_IVF_NPROBE
+
+        if not contexts:
+            return []
+        doc_mask = self._doc_mask(domain_ids)
+        n_candidates = top_k * 2
+
+        # ===== BM25 (masked) =====
+        bm25_hits = self.bm25.top_k_batch([context.bm25_terms(self.bm25) for context in contexts],
+                                          n_candidates, doc_mask=doc_mask)
+
+        # ===== FAISS (ID selector) =====
+        params = vector_search_params(
+            self.faiss_index, self.meta.get('vector_index'), ef_search=FAISS_HNSW_EF_SEARCH, nprobe=FAISS_IVF_NPROBE
+        )
+        selector = None
+        if doc_mask is not None:
+            selector = faiss.IDSelectorBatch(np.flatnonzero(doc_mask).astype('int64'))
+            params = params or faiss.SearchParameters()
+            params.sel = selector
+        query_matrix = np.vstack([context.query_matrix for context in contexts])
+        faiss_distances, faiss_ids = self.faiss_index.search(query_matrix, n_candidates, params=params)
+
+        # ===== Normalize and Merge Scores =====
+        # Unmatched eligible documents count as 0 BM25 scores (see hybrid_fuse)
+        eligible = self.bm25.corpus_size if doc_mask is None else int(np.count_nonzero(doc_mask))
+        results = []
+        for q, (bm25_ids, bm25_scores) in enumerate(bm25_hits):
+            ids, scores = hybrid_fuse(bm25_ids, bm25_scores, faiss_distances[q], faiss_ids[q], top_k=top_k,
+                                      bm25_k=n_candidates, bm25_docs=eligible)
+            results.append([
+                (self.domain_ids[int(self.domain_codes[idx])], int(self.local_ids[idx]), float(score))
+                for idx, score in zip(ids, scores)
+            ])
+        return results
+
+    @property
+    def total_chunks(self) -> int:
+        return self.meta['total_chunks']
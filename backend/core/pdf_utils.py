@@ -1,68 +1,179 @@
 """
 PDF Utilities for Page Detection
 """
+import json
+import os
 import re
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Dict, List, Optional, Tuple
 import pypdf
 
-# Simple in-memory cache: {(pdf_path, article_num): page_num}
-_page_cache: Dict[str, int] = {}
+# Article → page index of a domain's PDFs, built with the domain (next to metadata.json)
+PAGE_INDEX_NAME = 'page_index.json'
+PAGE_INDEX_VERSION = 1
+
+# "Điều 16", "Điều 16.", "Điều 2a" (not "Điều 160"); first mention per article wins
+_ARTICLE_RE = re.compile(r'Điều (\d+)([a-z](?![^\W\d_]))?(?!\d)', re.IGNORECASE)
+_INDEXED_ARTICLE_RE = re.compile(r'\d+[a-z]?')
+
+# Fallback scans: {(pdf_path, mtime, article_num): (page_num, offset) or None}, LRU-bounded
+SCAN_CACHE_SIZE = 256
+_page_cache: "OrderedDict[Tuple[str, float, str], Optional[Tuple[int, int]]]" = OrderedDict()
+
+# Loaded page indexes: {index path: (mtime, index)}
+_index_cache: Dict[str, Tuple[float, Dict]] = {}
+
+def pdf_etag(pdf_path: Path, stat: Optional[os.stat_result] = None) -> str:
+    """
+    ETag of a domain PDF without reading it
+
+    Strong tag from the content sha1 the build records in page_index.json (same in every
+    worker, survives redeploys that only touch timestamps); a weak size/mtime tag for PDFs
+    the index doesn't describe.
+    """
+    path = Path(pdf_path)
+    stat = stat or path.stat()
+    entry = (load_page_index(path.parent.parent) or {}).get('pdfs', {}).get(path.name, {})
+    if entry.get('sha1') and entry.get('size') == stat.st_size:
+        return f'"{entry["sha1"]}"'
+    return f'W/"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _page_texts(reader: pypdf.PdfReader):
+    """(1-based page number, page text with whitespace runs collapsed) per page with text"""
+    for i, page in enumerate(reader.pages):
+        text = page.extract_text()
+        if not text:
+            continue
+        # Normalize text for easier matching
+        # Replace multiple spaces/newlines with single space
+        yield i + 1, re.sub(r'\s+', ' ', text)
+
+
+def scan_article_pages(pdf_path: str) -> Dict[str, List[int]]:
+    """
+    {article_num: [page (1-based), char offset in the normalized page text]} for every
+    article mentioned in the PDF, in one pass (same matches as find_article_page's scan)
+    """
+    articles: Dict[str, List[int]] = {}
+    for page_num, text in _page_texts(pypdf.PdfReader(pdf_path)):
+        for match in _ARTICLE_RE.finditer(text):
+            number, suffix = match.group(1), (match.group(2) or '').lower()
+            for article_num in ((number, number + suffix) if suffix else (number,)):
+                articles.setdefault(article_num, [page_num, match.start()])
+    return articles
+
+
+def build_page_index(domain_dir: Path, pdf_files: List[Path], pdf_hashes: Optional[Dict[str, str]] = None) -> Dict:
+    """Scan the domain's PDFs and write {domain_dir}/page_index.json (pdf_hashes: name → sha1, for ETags)"""
+    index = {'version': PAGE_INDEX_VERSION, 'pdfs': {}}
+    for pdf_path in pdf_files:
+        entry = {'size': pdf_path.stat().st_size}
+        if pdf_hashes and pdf_hashes.get(pdf_path.name):
+            entry['sha1'] = pdf_hashes[pdf_path.name]
+        entry['articles'] = scan_article_pages(str(pdf_path))
+        index['pdfs'][pdf_path.name] = entry
+    path = Path(domain_dir) / PAGE_INDEX_NAME
+    tmp = path.with_suffix('.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return index
+
+
+def load_page_index(domain_dir: Path) -> Optional[Dict]:
+    """A domain's page index (reloaded when the file changes), None if not built"""
+    path = Path(domain_dir) / PAGE_INDEX_NAME
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    cached = _index_cache.get(str(path))
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[PDF_UTILS] Unreadable {path}: {e}")
+            return None
+        if index.get('version') != PAGE_INDEX_VERSION:
+            return None
+        cached = _index_cache[str(path)] = (mtime, index)
+    return cached[1]
+
+
+def find_article_location(pdf_path: str, article_num: str) -> Optional[Tuple[int, int]]:
+    """
+    (page number (1-based), char offset in the page text) where an article is first mentioned
+
+    Answered from the domain's page_index.json when it covers this PDF (pdfs/ sits next to
+    it); otherwise the PDF is scanned with pypdf (LRU-cached per process).
+    """
+    path = Path(pdf_path)
+    article_key = str(article_num).strip().lower()
+    index = load_page_index(path.parent.parent)
+    entry = (index or {}).get('pdfs', {}).get(path.name)
+    try:
+        stat = path.stat()
+    except OSError:
+        print(f"[PDF_UTILS] File not found: {pdf_path}")
+        return None
+    if entry is not None and stat.st_size == entry['size'] and _INDEXED_ARTICLE_RE.fullmatch(article_key):
+        location = entry['articles'].get(article_key)
+        return tuple(location) if location else None
+
+    cache_key = (str(path), stat.st_mtime, article_key)
+    if cache_key in _page_cache:
+        _page_cache.move_to_end(cache_key)
+        return _page_cache[cache_key]
+    try:
+        location = _scan_for_article(path, article_num)
+    except Exception as e:
+        print(f"[PDF_UTILS] Error scanning PDF: {e}")
+        return None
+    _page_cache[cache_key] = location
+    if len(_page_cache) > SCAN_CACHE_SIZE:
+        _page_cache.popitem(last=False)
+    return location
+
+
+def _scan_for_article(path: Path, article_num: str) -> Optional[Tuple[int, int]]:
+    reader = pypdf.PdfReader(path)
+
+    # Regex patterns to match article headers
+    # Matches: "Điều 16", "Điều 16.", "Điều  16" (flexible whitespace)
+    # Case insensitive handled by search logic
+    patterns = [
+        f"Điều {article_num}[^0-9]",  # Điều 16 followed by non-digit (avoid matching 160)
+        f"Điều {article_num}$",       # Điều 16 at end of line
+        rf"Điều {article_num}\."      # Điều 16.
+    ]
+
+    print(f"[PDF_UTILS] Scanning {path.name} for Article {article_num}...")
+
+    for page_num, normalized_text in _page_texts(reader):
+        # Check for matches (earliest position on the page)
+        matches = [m for m in (re.search(p, normalized_text, re.IGNORECASE) for p in patterns) if m]
+        if matches:
+            offset = min(m.start() for m in matches)
+            print(f"[PDF_UTILS] Found Article {article_num} on page {page_num}")
+            return page_num, offset
+
+    print(f"[PDF_UTILS] Article {article_num} not found in {path.name}")
+    return None
+
 
 def find_article_page(pdf_path: str, article_num: str) -> Optional[int]:
     """
     Find the page number where a specific article starts in a PDF.
-    
+
     Args:
         pdf_path: Path to the PDF file
         article_num: Article number (e.g., "16", "100")
-        
+
     Returns:
         Page number (1-based) or None if not found
     """
-    cache_key = f"{pdf_path}:{article_num}"
-    if cache_key in _page_cache:
-        return _page_cache[cache_key]
-    
-    try:
-        path = Path(pdf_path)
-        if not path.exists():
-            print(f"[PDF_UTILS] File not found: {pdf_path}")
-            return None
-            
-        reader = pypdf.PdfReader(path)
-        
-        # Regex patterns to match article headers
-        # Matches: "Điều 16", "Điều 16.", "Điều  16" (flexible whitespace)
-        # Case insensitive handled by search logic
-        patterns = [
-            f"Điều {article_num}[^0-9]",  # Điều 16 followed by non-digit (avoid matching 160)
-            f"Điều {article_num}$",       # Điều 16 at end of line
-            f"Điều {article_num}\."       # Điều 16.
-        ]
-        
-        print(f"[PDF_UTILS] Scanning {path.name} for Article {article_num}...")
-        
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
-            if not text:
-                continue
-                
-            # Normalize text for easier matching
-            # Replace multiple spaces/newlines with single space
-            normalized_text = re.sub(r'\s+', ' ', text)
-            
-            # Check for matches
-            for pattern in patterns:
-                if re.search(pattern, normalized_text, re.IGNORECASE):
-                    page_num = i + 1  # 1-based
-                    print(f"[PDF_UTILS] Found Article {article_num} on page {page_num}")
-                    _page_cache[cache_key] = page_num
-                    return page_num
-                    
-        print(f"[PDF_UTILS] Article {article_num} not found in {path.name}")
-        return None
-        
-    except Exception as e:
-        print(f"[PDF_UTILS] Error scanning PDF: {e}")
-        return None
+    location = find_article_location(pdf_path, article_num)
+    return location[0] if location else None
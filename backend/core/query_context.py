@@ -0,0 +1,81 @@
+"""
+Query Context - query analysis (text normalization, tokens, term ids, embedding) done once per (sub-)query
+"""
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from utils.text import normalize_query_text
+
+
+class QueryContext:
+    """
+    Everything a domain needs to search for one query, computed once and shared by all
+    domains searched (and the global index), so per-domain search does no tokenizer or model work.
+
+    - text / normalized: original and normalized query text
+    - tokens: tokenize_fn(normalized)
+    - embedding: query vector exactly as the FAISS indexes expect it (float32, shape (d,))
+    - normalized_embedding: unit-length copy (cosine use, caches), computed on first access
+    - bm25_terms(index): (term id, count) pairs for a BM25 index's vocabulary, memoized per index
+    """
+
+    def __init__(self, text: str, normalized: str, tokens: List[str], embedding: np.ndarray):
+        self.text = text
+        self.normalized = normalized
+        self.tokens = tokens
+        self.embedding = np.asarray(embedding, dtype='float32').reshape(-1)
+        self._normalized_embedding: Optional[np.ndarray] = None
+        self._term_ids: Dict[int, Tuple[object, List[Tuple[int, int]]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, query: str, tokenize_fn, embedder) -> 'QueryContext':
+        """Normalize, tokenize and encode a query (the only place query model work happens)"""
+        normalized = normalize_query_text(query)
+        tokens = tokenize_fn(normalized)
+        embedding = embedder.encode([normalized], convert_to_numpy=True)[0]
+        return cls(query, normalized, tokens, embedding)
+
+    @classmethod
+    def build_batch(cls, queries: List[str], tokenize_fn, embedder) -> List['QueryContext']:
+        """build() for several queries with a single encode call"""
+        if not queries:
+            return []
+        normalized = [normalize_query_text(query) for query in queries]
+        embeddings = embedder.encode(normalized, convert_to_numpy=True)
+        return [
+            cls(query, text, tokenize_fn(text), embedding)
+            for query, text, embedding in zip(queries, normalized, embeddings)
+        ]
+
+    @property
+    def normalized_embedding(self) -> np.ndarray:
+        if self._normalized_embedding is None:
+            norm = float(np.linalg.norm(self.embedding))
+            self._normalized_embedding = self.embedding / norm if norm > 0 else self.embedding
+        return self._normalized_embedding
+
+    @property
+    def query_matrix(self) -> np.ndarray:
+        """(1, d) float32 row for faiss.Index.search"""
+        return self.embedding.reshape(1, -1)
+
+    def bm25_terms(self, bm25_index) -> List[Tuple[int, int]]:
+        """
+        Query term ids for one BM25 index (vocabularies differ per domain), low-impact
+        terms dropped per config; memoized so repeated searches of an index reuse them
+        """
+        key = id(bm25_index)
+        with self._lock:
+            cached = self._term_ids.get(key)
+            if cached is not None and cached[0] is bm25_index:
+                return cached[1]
+
+        from config import BM25_STOPWORDS, BM25_MAX_DF_RATIO
+        terms = bm25_index.select_terms(self.tokens, stopwords=BM25_STOPWORDS, max_df_ratio=BM25_MAX_DF_RATIO)
+        with self._lock:
+            self._term_ids[key] = (bm25_index, terms)
+        return terms
+
+    def __repr__(self) -> str:
+        return f"QueryContext({self.normalized!r}, tokens={len(self.tokens)}, dim={self.embedding.shape[0]})"
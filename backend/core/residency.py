@@ -0,0 +1,130 @@
+"""
+Domain Residency Manager - keep loaded domains within a memory budget
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Set
+
+
+class DomainResidencyManager:
+    """
+    Tracks which domains are loaded and evicts (Domain.unload) when over budget:
+    - Footprint: Domain.memory_footprint() (heap + mmap'd index bytes)
+    - Eviction: least recently used first
+    - Pinned: configured domains + the N most frequently used ones are never evicted
+    """
+
+    def __init__(self, budget_bytes: int = 0, pinned: Iterable[str] = (), hot_pin_count: int = 0):
+        self.budget_bytes = budget_bytes  # 0 = unlimited
+        self.pinned: Set[str] = set(pinned)
+        self.hot_pin_count = hot_pin_count
+        self._lock = threading.Lock()
+        self._last_access: Dict[str, float] = {}
+        self._hits: Dict[str, int] = {}
+        self._loads: Dict[str, int] = {}
+        self._evictions: Dict[str, int] = {}
+
+    def record_access(self, domain_id: str, was_loaded: bool):
+        """Call on every domain search (was_loaded: indices were already resident)"""
+        with self._lock:
+            self._last_access[domain_id] = time.time()
+            self._hits[domain_id] = self._hits.get(domain_id, 0) + 1
+            if not was_loaded:
+                self._loads[domain_id] = self._loads.get(domain_id, 0) + 1
+
+    def pin(self, domain_id: str):
+        with self._lock:
+            self.pinned.add(domain_id)
+
+    def unpin(self, domain_id: str):
+        with self._lock:
+            self.pinned.discard(domain_id)
+
+    def _protected(self) -> Set[str]:
+        """Explicit pins + hottest domains by hit count"""
+        hot = sorted(self._hits, key=self._hits.get, reverse=True)[:self.hot_pin_count]
+        return self.pinned | set(hot)
+
+    def has_headroom(self, domains: Dict, reserved: int = 0) -> bool:
+        """
+        True if another domain may be loaded without exceeding the budget
+
+        reserved: bytes of loads already admitted but not finished (not resident yet)
+        """
+        if not self.budget_bytes:
+            return True
+        resident = sum(domain.memory_footprint()['total'] for domain in domains.values() if domain.is_loaded)
+        return resident + reserved < self.budget_bytes
+
+    def enforce(self, domains: Dict, keep: Iterable[str] = ()) -> List[str]:
+        """
+        Evict LRU domains until resident memory fits the budget
+
+        Args:
+            domains: domain_id -> Domain
+            keep: domains in use right now (never evicted in this pass)
+
+        Returns:
+            Evicted domain ids
+        """
+        if not self.budget_bytes:
+            return []
+
+        evicted = []
+        with self._lock:
+            footprints = {
+                domain_id: domain.memory_footprint()['total']
+                for domain_id, domain in domains.items() if domain.is_loaded
+            }
+            resident = sum(footprints.values())
+            if resident <= self.budget_bytes:
+                return []
+
+            protected = self._protected() | set(keep)
+            candidates = sorted(
+                (domain_id for domain_id in footprints if domain_id not in protected),
+                key=lambda domain_id: self._last_access.get(domain_id, 0.0)
+            )
+
+            for domain_id in candidates:
+                if resident <= self.budget_bytes:
+                    break
+                domains[domain_id].unload()
+                resident -= footprints[domain_id]
+                self._evictions[domain_id] = self._evictions.get(domain_id, 0) + 1
+                evicted.append(domain_id)
+
+        if evicted:
+            print(f"♻️ Evicted domains over budget: {evicted} (resident ≈ {resident / 1e6:.1f} MB)", flush=True)
+        if resident > self.budget_bytes:
+            print(f"⚠️ Pinned/in-use domains alone exceed memory budget "
+                  f"({resident / 1e6:.1f} MB > {self.budget_bytes / 1e6:.1f} MB)", flush=True)
+        return evicted
+
+    def stats(self, domains: Dict) -> Dict:
+        """Residency stats for sizing containers"""
+        with self._lock:
+            protected = self._protected()
+            per_domain = {}
+            resident = {'heap': 0, 'mapped': 0, 'total': 0}
+            for domain_id, domain in domains.items():
+                footprint = domain.memory_footprint()
+                for key in resident:
+                    resident[key] += footprint[key]
+                per_domain[domain_id] = {
+                    'loaded': domain.is_loaded,
+                    'pinned': domain_id in protected,
+                    'hits': self._hits.get(domain_id, 0),
+                    'loads': self._loads.get(domain_id, 0),
+                    'evictions': self._evictions.get(domain_id, 0),
+                    'last_access': self._last_access.get(domain_id),
+                    'footprint': footprint,
+                }
+
+            return {
+                'budget_bytes': self.budget_bytes,
+                'resident_bytes': resident,
+                'loaded_domains': sum(1 for d in per_domain.values() if d['loaded']),
+                'total_evictions': sum(self._evictions.values()),
+                'domains': per_domain,
+            }
@@ -3,10 +3,9 @@ Search Module - BM25 + FAISS Hybrid Search with LLM Re-ranking
 """
 
 import re
-import numpy as np
-from collections import defaultdict
 from typing import List, Dict
 from config import BM25_WEIGHT, FAISS_WEIGHT
+from .fusion import rrf_fuse, rrf_fuse_keys, top_k_positions
 
 
 def reciprocal_rank_fusion(rank_lists: List[List[int]], weights: List[float] = None, k: int = 60) -> Dict[int, float]:
@@ -15,23 +14,14 @@ def reciprocal_rank_fusion(rank_lists: List[List[int]], weights: List[float] = N
     Score = sum(weight * (1 / (k + rank)))
     
     Args:
-        rank_lists: List of lists, where each list contains indices in ranked order
+        rank_lists: List of lists, where each list contains indices (or any hashable keys) in ranked order
         weights: List of weights for each rank list
         k: Constant (default 60)
     
     Returns:
-        Dictionary mapping index -> RRF score
+        Dictionary mapping index -> RRF score, ordered by descending score
     """
-    if weights is None:
-        weights = [1.0] * len(rank_lists)
-        
-    rrf_scores = defaultdict(float)
-    
-    for rank_list, weight in zip(rank_lists, weights):
-        for rank, idx in enumerate(rank_list):
-            rrf_scores[idx] += weight * (1 / (k + rank + 1))
-            
-    return rrf_scores
+    return rrf_fuse_keys(rank_lists, weights, k)
 
 
 def rerank_with_llm(query: str, candidates: List[Dict], gemini_model, top_k: int = 5) -> List[Dict]:
@@ -173,14 +163,13 @@ def advanced_hybrid_search(
     print(f'[INFO] Decomposed into {len(sub_queries)} sub-queries: {sub_queries}')
     
     # Step 3: Hybrid search with sub-queries
-    combined_scores = defaultdict(float)
-    seen_chunks = set()
+    rank_lists = []
     
     for sub_q in sub_queries:
         # BM25 search
         query_tokens = tokenize_fn(sub_q)
         bm25_scores = bm25_index.get_scores(query_tokens)
-        bm25_top_indices = np.argsort(bm25_scores)[::-1][:top_k * 2]
+        bm25_top_indices = top_k_positions(bm25_scores, top_k * 2)
         
         # FAISS search
         query_embedding = embedder.encode([sub_q], convert_to_numpy=True)
@@ -189,29 +178,13 @@ def advanced_hybrid_search(
         faiss_distances, faiss_indices = faiss_index.search(query_embedding, top_k * 2)
         
         # ✅ Collect rankings for RRF
-        bm25_rank_list = list(bm25_top_indices)
-        faiss_rank_list = list(faiss_indices[0])
-        
-        # Apply RRF with weights
-        rrf_scores = reciprocal_rank_fusion(
-            [bm25_rank_list, faiss_rank_list], 
-            weights=[BM25_WEIGHT, FAISS_WEIGHT],
-            k=60
-        )
-        
-        # Merge into combined scores
-        for idx, score in rrf_scores.items():
-            combined_scores[idx] += score
-        
-        seen_chunks.update(bm25_top_indices)
-        seen_chunks.update(faiss_indices[0])
+        rank_lists.extend([bm25_top_indices, faiss_indices[0]])
     
-    if not combined_scores:
+    # Step 4: Weighted RRF over every sub-query's rankings at once (= per-sub-query RRF summed)
+    ranked_ids, _ = rrf_fuse(rank_lists, weights=[BM25_WEIGHT, FAISS_WEIGHT] * len(sub_queries), k=60, top_k=top_k * 2)
+    if len(ranked_ids) == 0:
         return []
-    
-    # Step 4: Sort by RRF score
-    ranked = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)[:top_k * 2]
-    results = [all_chunks[idx] for idx, _ in ranked]
+    results = [all_chunks[idx] for idx in ranked_ids]
     
     # ✅ Step 5: LLM Re-ranking (Unified & Final)
     # Removed intermediate Semantic Reranking (Step 4 in old code)
@@ -256,7 +229,7 @@ def simple_search(
     # BM25 search
     query_tokens = tokenize_fn(query)
     bm25_scores = bm25_index.get_scores(query_tokens)
-    bm25_top_indices = np.argsort(bm25_scores)[::-1][:top_k * 2]
+    bm25_top_indices = top_k_positions(bm25_scores, top_k * 2)
     
     # FAISS search
     query_embedding = embedder.encode([query], convert_to_numpy=True)
@@ -264,29 +237,25 @@ def simple_search(
     faiss_lib.normalize_L2(query_embedding)
     faiss_distances, faiss_indices = faiss_index.search(query_embedding, top_k * 2)
     
-    # ✅ Use Weighted Reciprocal Rank Fusion (RRF)
-    bm25_rank_list = list(bm25_top_indices)
-    faiss_rank_list = list(faiss_indices[0])
-    
-    combined_scores = reciprocal_rank_fusion(
-        [bm25_rank_list, faiss_rank_list], 
+    # ✅ Use Weighted Reciprocal Rank Fusion (RRF), vectorized
+    ranked_ids, ranked_scores = rrf_fuse(
+        [bm25_top_indices, faiss_indices[0]],
         weights=[BM25_WEIGHT, FAISS_WEIGHT],
         k=60
     )
     
     # Log top RRF scores
-    sorted_debug = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)[:5]
-    for idx, score in sorted_debug:
+    for idx, score in zip(ranked_ids[:5], ranked_scores[:5]):
         print(f'[RRF] Chunk {idx}: score={score:.4f}', flush=True)
     
-    # Sort and return top_k
-    ranked = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    # Keep top_k
+    ranked_ids, ranked_scores = ranked_ids[:top_k], ranked_scores[:top_k]
     
     # Log final scores
     print(f'[HYBRID] Top results:', flush=True)
-    for rank, (idx, score) in enumerate(ranked[:3]):
+    for rank, (idx, score) in enumerate(zip(ranked_ids[:3], ranked_scores[:3])):
         print(f'  #{rank+1}: Chunk {idx} (score={score:.3f})', flush=True)
     
-    results = [all_chunks[idx] for idx, _ in ranked]
+    results = [all_chunks[idx] for idx in ranked_ids]
     
     return results
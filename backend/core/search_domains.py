@@ -2,7 +2,7 @@
 Domain-based Search Module
 """
 from typing import List, Dict, Optional
-from .search import rerank_with_llm
+from .search import rerank_with_llm, reciprocal_rank_fusion
 
 
 def search_with_domains(
@@ -100,13 +100,11 @@ def search_multi_query_with_domains(
         top_k: Number of final results
     
     Returns:
-        Merged and deduplicated top_k results
+        Merged top_k results, deduplicated by chunk id and ordered by RRF score
+        ('score' keeps the best hybrid score, 'rrf_score' the fused one)
     """
     
-    all_results = []
-    seen_contents = set()
-    
-    # Search each sub-question
+    questions, domain_hints = [], []
     for sub_q in sub_questions:
         if isinstance(sub_q, dict):
             question = sub_q.get('question', '')
@@ -120,30 +118,34 @@ def search_multi_query_with_domains(
         
         print(f"\n[MULTI-SEARCH] Sub-question: '{question}'", flush=True)
         print(f"[MULTI-SEARCH] Domain: {domain_id if domain_id else 'AUTO-DETECT'}", flush=True)
-        
-        # Search with domain hint
-        results = domain_manager.search(
-            query=question,
-            tokenize_fn=tokenize_fn,
-            top_k=top_k,
-            domain_ids=[domain_id] if domain_id else None
-        )
-        
-        # Deduplicate by content
+        questions.append(question)
+        domain_hints.append([domain_id] if domain_id else None)
+    
+    # One batched search for all sub-questions (single encode, one FAISS/BM25 pass per domain)
+    per_question = domain_manager.search_batch(questions, tokenize_fn, top_k=top_k, domain_hints=domain_hints)
+    
+    # Merge by chunk identity with Reciprocal Rank Fusion (chunks found by several sub-questions rise)
+    by_key = {}
+    rank_lists = []
+    for results in per_question:
+        ranked_keys = []
         for result in results:
-            content = result.get('content', '')
-            # Use first 100 chars as fingerprint
-            fingerprint = content[:100] if content else ''
-            
-            if fingerprint and fingerprint not in seen_contents:
-                seen_contents.add(fingerprint)
-                all_results.append(result)
+            key = (result.get('domain_id'), result.get('id') or result.get('content', ''))
+            best = by_key.get(key)
+            if best is None or result.get('score', 0) > best.get('score', 0):
+                by_key[key] = result
+            ranked_keys.append(key)
+        rank_lists.append(ranked_keys)
+    
+    rrf_scores = reciprocal_rank_fusion(rank_lists)
+    all_results = []
+    for key, rrf_score in sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True):
+        result = by_key[key]
+        result['rrf_score'] = rrf_score
+        all_results.append(result)
     
     print(f"\n[MULTI-SEARCH] Collected {len(all_results)} unique results", flush=True)
     
-    # Sort by score
-    all_results.sort(key=lambda x: x.get('score', 0), reverse=True)
-    
     # Re-rank if Quality mode
     if use_advanced and gemini_model and len(all_results) > top_k:
         # Combine all sub-questions into one query for re-ranking
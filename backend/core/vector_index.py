@@ -0,0 +1,204 @@
+"""
+Vector Index Module - FAISS index building (Flat / HNSW / IVF, fp32 / fp16 / SQ8 / PQ) and loading (mmap / read-only / prefault)
+"""
+import os
+import faiss
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+
+# Flat codes (IndexFlat*, IndexScalarQuantizer, HNSW storage) are only mapped with
+# IO_FLAG_MMAP_IFC; IO_FLAG_MMAP alone covers IVF inverted lists.
+_MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0) | faiss.IO_FLAG_READ_ONLY
+
+PREFAULT_BLOCK_SIZE = 1 << 20
+
+# Vector encodings (stored codes) → FAISS factory strings
+# fp16: 2× smaller, ~lossless; sq8: 4× smaller, per-dimension trained 8-bit ranges
+VECTOR_ENCODINGS = {
+    'fp32': 'Flat',
+    'fp16': 'SQfp16',
+    'sq8': 'SQ8',
+}
+
+# Index types (metadata.json "vector_index": {"type": ..., params}) and their defaults
+# - flat: exact scan
+# - hnsw: graph, M links/node; ef_search = candidate list size at query time
+# - ivf_flat: nlist k-means cells, nprobe cells scanned per query (nlist 0 = auto)
+# - ivf_pq: as ivf_flat, vectors PQ-compressed to pq_m × pq_nbits bits
+INDEX_TYPE_DEFAULTS = {
+    'flat': {'encoding': 'fp32'},
+    'hnsw': {'encoding': 'fp32', 'M': 32, 'ef_construction': 40, 'ef_search': 64},
+    'ivf_flat': {'encoding': 'fp32', 'nlist': 0, 'nprobe': 8},
+    'ivf_pq': {'nlist': 0, 'nprobe': 8, 'pq_m': 64, 'pq_nbits': 8},
+}
+DEFAULT_INDEX_SPEC = {'type': 'flat', 'encoding': 'fp32'}
+
+# k-means wants ≥ 39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def normalize_index_spec(spec: Optional[Dict] = None) -> Dict:
+    """Fill defaults and validate a vector index spec ({'type': ..., params})"""
+    spec = dict(spec or {})
+    index_type = spec.get('type', DEFAULT_INDEX_SPEC['type']).lower().replace('-', '_')
+    if index_type not in INDEX_TYPE_DEFAULTS:
+        raise ValueError(f"Unknown vector index type: {index_type} (expected one of {list(INDEX_TYPE_DEFAULTS)})")
+    
+    spec = {'type': index_type, **INDEX_TYPE_DEFAULTS[index_type], **{k: v for k, v in spec.items() if k != 'type'}}
+    if 'encoding' in spec:
+        spec['encoding'] = spec['encoding'].lower()
+        if spec['encoding'] not in VECTOR_ENCODINGS:
+            raise ValueError(f"Unknown vector encoding: {spec['encoding']} (expected one of {list(VECTOR_ENCODINGS)})")
+    return spec
+
+
+def resolve_index_spec(spec: Optional[Dict], n_vectors: int, dim: int) -> Dict:
+    """Fix data-dependent parameters (auto nlist, PQ sizes) for a corpus of n_vectors × dim"""
+    spec = normalize_index_spec(spec)
+    
+    if spec['type'] in ('ivf_flat', 'ivf_pq'):
+        nlist = spec['nlist'] or int(4 * np.sqrt(n_vectors))
+        spec['nlist'] = max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+        spec['nprobe'] = min(spec['nprobe'], spec['nlist'])
+    
+    if spec['type'] == 'ivf_pq':
+        if dim % spec['pq_m'] != 0:
+            raise ValueError(f"pq_m={spec['pq_m']} must divide the vector dimension {dim}")
+        # 2^nbits PQ centroids need at least that many training vectors
+        spec['pq_nbits'] = max(1, min(spec['pq_nbits'], int(np.log2(max(n_vectors, 2)))))
+    
+    return spec
+
+
+def index_factory_string(spec: Optional[Dict] = None) -> str:
+    """FAISS index_factory description for a (resolved) spec"""
+    spec = normalize_index_spec(spec)
+    index_type = spec['type']
+    
+    if index_type == 'flat':
+        return VECTOR_ENCODINGS[spec['encoding']]
+    if index_type == 'hnsw':
+        if spec['encoding'] == 'fp32':
+            return f"HNSW{spec['M']}"
+        return f"HNSW{spec['M']},{VECTOR_ENCODINGS[spec['encoding']]}"
+    if not spec['nlist']:
+        raise ValueError("nlist must be resolved first (resolve_index_spec)")
+    if index_type == 'ivf_flat':
+        return f"IVF{spec['nlist']},{VECTOR_ENCODINGS[spec['encoding']]}"
+    # 'np': skip polysemous training (20× slower to train, unused by IVF search)
+    return f"IVF{spec['nlist']},PQ{spec['pq_m']}x{spec['pq_nbits']}np"
+
+
+def build_vector_index(embeddings: np.ndarray, spec: Optional[Dict] = None) -> faiss.Index:
+    """
+    Build (train + add) an L2 index over embeddings
+
+    Args:
+        embeddings: (n, d) vectors
+        spec: {'type': 'flat' | 'hnsw' | 'ivf_flat' | 'ivf_pq', ...params} (default fp32 IndexFlatL2)
+
+    Returns:
+        FAISS index with all vectors added (ids = row order)
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    spec = resolve_index_spec(spec, *embeddings.shape)
+    index = faiss.index_factory(embeddings.shape[1], index_factory_string(spec), faiss.METRIC_L2)
+    
+    if spec['type'] == 'hnsw':
+        index.hnsw.efConstruction = spec['ef_construction']
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def vector_search_params(index: faiss.Index, spec: Optional[Dict] = None,
+                         ef_search: int = 0, nprobe: int = 0) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query search knobs for an index (None for exact indexes)
+
+    Args:
+        index: loaded FAISS index
+        spec: domain's vector_index spec (defaults for ef_search / nprobe)
+        ef_search, nprobe: overrides (0 = use spec)
+    """
+    spec = spec or {}
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe or spec.get('nprobe', INDEX_TYPE_DEFAULTS['ivf_flat']['nprobe']))
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or spec.get('ef_search', INDEX_TYPE_DEFAULTS['hnsw']['ef_search']))
+    return None
+
+
+def index_vectors(index: faiss.Index) -> np.ndarray:
+    """Stored vectors as float32 in id order (decoded for quantized indexes)"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        ivf.make_direct_map()  # IVF lists are not in id order
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_code_bytes(index: faiss.Index) -> int:
+    """Bytes of stored vector codes (what a full scan reads; excludes graph links / centroids)"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return int(ivf.code_size) * ivf.ntotal
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return int(index.sa_code_size()) * index.ntotal
+
+
+def prefault_file(path) -> int:
+    """
+    Pull a file into the OS page cache (sequential read)
+
+    Returns:
+        Number of bytes read
+    """
+    total = 0
+    with open(path, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        while True:
+            block = f.read(PREFAULT_BLOCK_SIZE)
+            if not block:
+                break
+            total += len(block)
+    return total
+
+
+def read_vector_index(path, mmap: bool = True, prefault: bool = False) -> faiss.Index:
+    """
+    Read a FAISS index from disk
+
+    Args:
+        path: Path to faiss.index
+        mmap: Map the index read-only so every worker shares one page-cache copy
+        prefault: Warm the page cache and fault the mapping in up front
+                  (first query then doesn't pay for page faults)
+
+    Returns:
+        FAISS index
+    """
+    path = str(path)
+
+    if prefault:
+        prefault_file(path)
+
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(path, _MMAP_FLAGS)
+        except RuntimeError as e:
+            # Index types without mmap support fall back to a heap copy
+            print(f"⚠️ mmap not supported for {Path(path).name} ({e}), reading into memory", flush=True)
+
+    if index is None:
+        index = faiss.read_index(path)
+
+    if prefault and mmap and index.ntotal > 0:
+        # One scan over the codes touches every mapped page
+        index.search(np.zeros((1, index.d), dtype='float32'), 1)
+
+    return index
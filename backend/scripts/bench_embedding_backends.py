@@ -0,0 +1,103 @@
+"""
+Accuracy and latency of embedder backends (torch fp32 / torch_int8 / onnx / onnx_int8) against torch fp32
+
+Documents: chunks of one domain encoded by the fp32 model (what the built indexes contain).
+Queries: the first words of other chunks, encoded by each backend.
+Reported: cosine agreement with fp32 query vectors, recall@k of the fp32 top-k, batch-1 latency, batch throughput.
+
+Usage:
+    python scripts/bench_embedding_backends.py
+    python scripts/bench_embedding_backends.py --domain lao_dong --docs 1000 --queries 200 --k 8
+    python scripts/bench_embedding_backends.py --backends torch_int8 onnx_int8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import EMBEDDING_MODEL
+from core.chunk_store import ChunkStore
+from scripts.quantize_faiss import recall_at_k
+from utils.embedding import EMBEDDING_BACKENDS, load_embedding_model
+
+
+def sample_texts(domain_id: str, n_docs: int, n_queries: int, query_words: int, seed: int = 0):
+    """Disjoint document / pseudo-query chunk samples from a domain"""
+    store = ChunkStore(Path(f"data/domains/{domain_id}/chunks.jsonl"))
+    rng = np.random.default_rng(seed)
+    picked = rng.permutation(len(store))[:n_docs + n_queries].tolist()
+    chunks = store.get_many(picked)
+    texts = [chunks[i]['content'] for i in picked if i in chunks]
+    docs = texts[:n_docs]
+    queries = [' '.join(text.split()[:query_words]) for text in texts[n_docs:]]
+    return docs, queries
+
+
+def latency_ms(embedder, queries, batch_size: int):
+    """(p50, p95) ms of single-query encodes, and texts/sec at batch_size"""
+    embedder.encode(queries[:2], convert_to_numpy=True)  # warm-up
+    single = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.encode([query], convert_to_numpy=True)
+        single.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    embedder.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+    throughput = len(queries) / (time.perf_counter() - start)
+    return np.percentile(single, 50), np.percentile(single, 95), throughput
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument('--model', default=EMBEDDING_MODEL)
+    parser.add_argument('--domain', default='dat_dai')
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--query-words', type=int, default=20)
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    docs, queries = sample_texts(args.domain, args.docs, args.queries, args.query_words)
+    print(f"📊 {args.model} on {args.domain}: {len(docs)} documents, {len(queries)} queries, recall@{args.k}")
+
+    reference = load_embedding_model('torch', args.model)
+    doc_vectors = reference.encode(docs, batch_size=args.batch_size, convert_to_numpy=True).astype('float32')
+    index = faiss.IndexFlatL2(doc_vectors.shape[1])
+    index.add(doc_vectors)
+    ref_queries = reference.encode(queries, batch_size=args.batch_size, convert_to_numpy=True).astype('float32')
+    _, truth = index.search(ref_queries, args.k)
+
+    rows = []
+    for backend in args.backends:
+        embedder = reference if backend == 'torch' else load_embedding_model(backend, args.model)
+        vectors = embedder.encode(queries, batch_size=args.batch_size, convert_to_numpy=True).astype('float32')
+        cosines = cosine_rows(vectors, ref_queries)
+        _, found = index.search(vectors, args.k)
+        p50, p95, throughput = latency_ms(embedder, queries, args.batch_size)
+        rows.append((backend, cosines.mean(), cosines.min(), recall_at_k(truth, found), p50, p95, throughput))
+
+    base_p50 = rows[0][4] if rows and rows[0][0] == 'torch' else None
+    print(f"\n   {'backend':<11} {'cos mean':>9} {'cos min':>8} {'R@' + str(args.k):>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'texts/s':>8}")
+    for backend, cos_mean, cos_min, recall, p50, p95, throughput in rows:
+        speedup = f"{base_p50 / p50:>7.2f}×" if base_p50 else f"{'-':>8}"
+        print(f"   {backend:<11} {cos_mean:>9.5f} {cos_min:>8.5f} {recall:>7.4f} "
+              f"{p50:>8.1f} {p95:>8.1f} {speedup} {throughput:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
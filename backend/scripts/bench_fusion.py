@@ -0,0 +1,83 @@
+"""
+Microbenchmark: dict-based score merging (previous Domain.search / reciprocal_rank_fusion) vs core.fusion
+
+Candidates per list = 2 × top_k in Domain.search (16 for top_k=8); larger sizes preview deeper candidate pools.
+
+Usage:
+    python scripts/bench_fusion.py
+    python scripts/bench_fusion.py --sizes 16 64 256 --top-k 8 --number 2000
+"""
+
+import argparse
+import sys
+import timeit
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import BM25_WEIGHT, FAISS_WEIGHT
+from core.fusion import hybrid_fuse, rrf_fuse
+
+
+def dict_hybrid(bm25_ids, bm25_scores, faiss_distances, faiss_ids, top_k):
+    """Previous Domain.search merge: Python loops into a dict, then sorted(dict.items())"""
+    combined_scores = {}
+    bm25_min, bm25_max = bm25_scores.min(), bm25_scores.max()
+    bm25_range = bm25_max - bm25_min
+    if bm25_range > 0:
+        for idx, score in zip(bm25_ids, bm25_scores):
+            combined_scores[int(idx)] = (score - bm25_min) / bm25_range * BM25_WEIGHT
+    for idx, distance in zip(faiss_ids, faiss_distances):
+        if idx < 0:
+            break
+        combined_scores[int(idx)] = combined_scores.get(int(idx), 0) + 1 / (1 + distance) * FAISS_WEIGHT
+    return sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def dict_rrf(rank_lists, weights, top_k, k=60):
+    """Previous reciprocal_rank_fusion + sort"""
+    rrf_scores = defaultdict(float)
+    for rank_list, weight in zip(rank_lists, weights):
+        for rank, idx in enumerate(rank_list):
+            rrf_scores[idx] += weight * (1 / (k + rank + 1))
+    return sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[16, 64, 256, 1024, 4096], help='candidates per list')
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--number', type=int, default=500, help='calls per timing run')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"📊 Fusion overhead per query (µs, best of 5), top_k={args.top_k}")
+    print(f"   {'candidates':>10} {'hybrid dict':>12} {'hybrid np':>10} {'speedup':>8} "
+          f"{'rrf dict':>9} {'rrf np':>7} {'speedup':>8}")
+    for n in args.sizes:
+        # Overlapping id ranges, like BM25 and FAISS agreeing on part of the pool
+        bm25_ids = rng.choice(n * 4, size=n, replace=False)
+        bm25_scores = np.sort(rng.random(n) * 20)[::-1]
+        faiss_ids = rng.choice(n * 4, size=n, replace=False).astype('int64')
+        faiss_distances = np.sort(rng.random(n).astype('float32') * 2)
+
+        hybrid_old = per_call_us(lambda: dict_hybrid(bm25_ids, bm25_scores, faiss_distances, faiss_ids, args.top_k), args.number)
+        hybrid_new = per_call_us(lambda: hybrid_fuse(bm25_ids, bm25_scores, faiss_distances, faiss_ids, top_k=args.top_k), args.number)
+        rank_lists, weights = [bm25_ids, faiss_ids], [BM25_WEIGHT, FAISS_WEIGHT]
+        rrf_old = per_call_us(lambda: dict_rrf(rank_lists, weights, args.top_k), args.number)
+        rrf_new = per_call_us(lambda: rrf_fuse(rank_lists, weights, top_k=args.top_k), args.number)
+
+        print(f"   {n:>10} {hybrid_old:>12.1f} {hybrid_new:>10.1f} {hybrid_old / hybrid_new:>7.1f}× "
+              f"{rrf_old:>9.1f} {rrf_new:>7.1f} {rrf_old / rrf_new:>7.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,22 @@ Build domain indices from pre-organized files
 Files should already be in:
 - data/domains/{domain_id}/raw/*.json
 - data/domains/{domain_id}/pdfs/*.pdf
+
+Each domain is a stage graph (pdf_to_json → chunks → tokens → bm25, chunks → faiss → metadata,
+pdfs → page_index); data/domains/{domain_id}/build_manifest.json records the input hashes of
+every stage and only stale stages rerun. Domains with stale stages are built in parallel worker processes.
+Articles are streamed from the raw JSON and chunks pass through the tokens/faiss stages in
+BUILD_STREAM_BATCH_SIZE batches, so build memory does not grow with the size of a law.
+
+Usage:
+    python scripts/build_domains_simple.py                      # all domains in the registry
+    python scripts/build_domains_simple.py lao_dong dat_dai
+    python scripts/build_domains_simple.py --dry-run            # print the stages that would run
+    python scripts/build_domains_simple.py --force --workers 1
 """
 
+import argparse
 import json
-import pickle
 from pathlib import Path
 import sys
 import os
@@ -16,232 +28,572 @@ if sys.platform == 'win32':
     sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
     sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
     os.environ['PYTHONIOENCODING'] = 'utf-8'
-from typing import List
+from typing import Dict, List, Optional, Set
+
+import numpy as np
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils.tokenizer import tokenize_vi as tokenize_vietnamese
-from rank_bm25 import BM25Okapi
-from sentence_transformers import SentenceTransformer
-from utils.embedding import load_embedding_model
+from utils.tokenizer import tokenize_underthesea as tokenize_vietnamese, underthesea_tokenizer_id
+from utils.build_cache import BuildCache, content_hash
+from utils.build_graph import BuildGraph, Stage
+from utils.stream_io import PickledListWriter, batched, iter_jsonl, iter_pickled_list
+from utils.embedding import backend_model_id
+from utils.embedding_pool import CorpusEncoder, build_encoder
+from core.document_processor import CHUNKER_VERSION, iter_van_ban_phap_luat_json
+from core.chunk_store import write_chunk_offsets
+from core.pdf_utils import PAGE_INDEX_NAME, PAGE_INDEX_VERSION, build_page_index
+from core.bm25 import SparseBM25, BM25_DIRNAME, FORMAT_VERSION as BM25_FORMAT_VERSION
+from core.vector_index import build_vector_index, normalize_index_spec, resolve_index_spec, index_factory_string
 
 # ===== CONFIG =====
-from config import EMBEDDING_MODEL
+from config import (EMBEDDING_MODEL, BUILD_EMBEDDING_BACKEND, FAISS_VECTOR_ENCODING, BUILD_CACHE_DIR,
+                    BUILD_STREAM_BATCH_SIZE)
 
 # Load domain registry
 with open("data/domain_registry.json", "r", encoding="utf-8") as f:
     DOMAIN_REGISTRY = json.load(f)
 
-def build_domain(domain_id: str):
-    """Build indices for a single domain from files in domains/{domain_id}/raw/"""
-    
+REQUIRED_FILES = ['chunks.jsonl', 'tokens.pkl', f'{BM25_DIRNAME}/meta.json', 'faiss.index', 'metadata.json']
+
+
+def declared_index_spec(domain_dir: Path) -> Optional[dict]:
+    """The vector_index spec declared in a domain's metadata.json (None if it declares none)"""
+    return _recorded_metadata(domain_dir).get('vector_index') or None
+
+
+def domain_index_spec(domain_id: str, domain_dir: Path) -> dict:
+    """
+    Declared vector index spec for a domain: metadata.json > registry entry > FAISS_VECTOR_ENCODING
+
+    Data-dependent parameters (auto nlist, pq_nbits) stay unresolved here; every build resolves
+    them for the current corpus and records the result as metadata.json "vector_index_resolved".
+    """
+    declared = declared_index_spec(domain_dir)
+    if declared:
+        return normalize_index_spec(declared)
+
+    registry_spec = DOMAIN_REGISTRY.get(domain_id, {}).get('vector_index')
+    if registry_spec:
+        return normalize_index_spec(registry_spec)
+    return normalize_index_spec({'encoding': FAISS_VECTOR_ENCODING})
+
+
+def build_model_id() -> str:
+    """Id of the model + backend encoding the documents (BUILD_EMBEDDING_BACKEND, not the query-side one)"""
+    return backend_model_id(backend=BUILD_EMBEDDING_BACKEND)
+
+
+def build_fingerprint() -> dict:
+    """What produced a domain's artifacts (recorded in metadata.json); a change triggers a rebuild"""
+    return {
+        'chunker_version': CHUNKER_VERSION,
+        'tokenizer': underthesea_tokenizer_id(),
+        'embedding_model_id': build_model_id(),
+    }
+
+
+def stale_fingerprint(metadata: dict) -> dict:
+    """{key: (recorded, current)} for recorded keys that differ (keys missing in older metadata are not compared)"""
+    current = build_fingerprint()
+    current['embedding_model'] = EMBEDDING_MODEL
+    return {key: (metadata[key], value) for key, value in current.items() if key in metadata and metadata[key] != value}
+
+
+def pdf_for_chunk(domain_id: str, modified_by: str, pdf_files: List[Path]) -> str:
+    """Source PDF of a chunk (dau_thau: by the amending law in metadata 'modified_by')"""
+    if not pdf_files:
+        return ''
+    if domain_id == 'dau_thau' and modified_by:
+        if '90/2025' in modified_by or 'Luật 90/2025' in modified_by:
+            matched_pdf = [f for f in pdf_files if '90_2025' in f.name or '90/2025' in f.name]
+        elif '57/2024' in modified_by or 'Luật 57/2024' in modified_by:
+            matched_pdf = [f for f in pdf_files if '57_2024' in f.name or '57/2024' in f.name]
+        else:
+            matched_pdf = [f for f in pdf_files if f.stem == 'luat_dau_thau']
+        return matched_pdf[0].name if matched_pdf else pdf_files[0].name
+    return pdf_files[0].name
+
+
+def count_lines(path: Path) -> int:
+    """Non-empty lines of a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def merge_encode_stats(batch_stats: List[Dict]) -> Dict:
+    """CorpusEncoder.last_stats of the streamed batches as one (padding weighted by chunks)"""
+    if not batch_stats:
+        return {'chunks': 0, 'seconds': 0.0, 'chunks_per_sec': 0.0}
+    chunks = sum(stats['chunks'] for stats in batch_stats)
+    seconds = sum(stats['seconds'] for stats in batch_stats)
+    return {
+        'chunks': chunks,
+        'seconds': seconds,
+        'chunks_per_sec': chunks / seconds if seconds > 0 else 0.0,
+        'workers': batch_stats[0]['workers'],
+        'batches': sum(stats['batches'] for stats in batch_stats),
+        **{key: float(sum(stats[key] * stats['chunks'] for stats in batch_stats) / chunks)
+           for key in ('padding_ratio', 'unsorted_padding_ratio')},
+    }
+
+
+def domain_graph(domain_id: str, encoder: CorpusEncoder = None, cache: BuildCache = None) -> BuildGraph:
+    """
+    Stage graph of one domain
+
+    encoder: CorpusEncoder for the faiss stage (loads the model on first encode)
+    cache: shared content-addressed tokens/embeddings cache (BUILD_CACHE_DIR if omitted)
+    """
+    domain_dir = Path(f"data/domains/{domain_id}")
+    raw_dir = domain_dir / "raw"
+    domain_name = DOMAIN_REGISTRY.get(domain_id, {}).get('name', domain_id)
+    state = {'cache': cache}
+    graph: BuildGraph = None
+
+    # Directory order, as the builder always used it (pdf_files()[0] is the default chunk PDF)
+    def pdf_files() -> List[Path]:
+        return list((domain_dir / "pdfs").glob("*.pdf"))
+
+    def json_files() -> List[Path]:
+        return list(raw_dir.glob("*.json")) if raw_dir.exists() else []
+
+    def get_cache() -> BuildCache:
+        if state['cache'] is None:
+            state['cache'] = BuildCache(Path(BUILD_CACHE_DIR))
+        return state['cache']
+
+    # ===== STAGE 0: PDF → JSON (only when no JSON was provided) =====
+    def convert_output() -> str:
+        return f"raw/{pdf_files()[0].stem}_hopnhat.json"  # ✅ Thêm _hopnhat
+
+    def run_convert():
+        from scripts.pdf_to_json import PDFToJSONConverter
+
+        pdf_path = pdf_files()[0]
+        print(f"🔄 Auto-converting PDF to JSON: {pdf_path.name}")
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        json_output = domain_dir / convert_output()
+        # Inside a parallel domain worker the pages are extracted in-process (no nested pool)
+        workers = 1 if _worker_encoder is not None else None
+        PDFToJSONConverter(workers=workers).convert(str(pdf_path), str(json_output))
+        print(f"✅ Conversion complete: {json_output.name}\n")
+
+    # ===== STAGE 1: Load and chunk data =====
+    def chunks_inputs() -> Dict:
+        # A converted JSON counts even if deleted since (pdf_to_json is intermediate)
+        names = [f"raw/{f.name}" for f in json_files()]
+        if not names and stages[0].name == 'pdf_to_json':
+            names = stages[0].outputs
+        return {
+            'chunker_version': CHUNKER_VERSION,
+            'domain_name': domain_name,
+            'json': [[name, graph.hash_file(name)] for name in names],
+            'pdf_files': [f.name for f in pdf_files()],
+        }
+
+    def run_chunks():
+        files = json_files()
+        if not files:
+            raise FileNotFoundError(f"No JSON files found in {raw_dir}")
+        print(f"📂 Found {len(files)} JSON file(s):")
+        for f in files:
+            print(f"  - {f.name}")
+
+        print("\n📖 Loading and chunking data (streamed)...")
+        pdfs = pdf_files()  # once per domain, not per chunk
+        chunks_path = domain_dir / "chunks.jsonl"
+        tmp_path = chunks_path.with_suffix('.jsonl.tmp')  # a failed parse leaves the previous chunks in place
+        total = 0
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            for json_path in files:
+                # ✅ Use shared document processor for consistent chunking
+                # This supports the new "Reverse Context" strategy (Specific Content -> Context)
+                # Articles are parsed and written one at a time (no whole-document load)
+                file_total = 0
+                for p_chunk in iter_van_ban_phap_luat_json(str(json_path)):
+                    chunk = {
+                        'id': f"{domain_id}_{total}",
+                        'content': p_chunk['content'],
+                        'source': p_chunk['source'],  # Keep the source string (Dieu X, Khoan Y...)
+                        'json_file': json_path.name,
+                        'pdf_file': pdf_for_chunk(domain_id, p_chunk['metadata'].get('modified_by', ''), pdfs),
+                        'article_num': p_chunk['metadata'].get('article_num', ''),
+                        'clause_num': p_chunk['metadata'].get('clause_num', ''),
+                        'point_num': p_chunk['metadata'].get('point_num', ''),
+                        'domain_id': domain_id,
+                        'domain_name': domain_name
+                    }
+                    out.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+                    total += 1
+                    file_total += 1
+                print(f"  📄 {json_path.name}: {file_total} chunks (granular)")
+
+        print(f"\n✅ Total chunks: {total}")
+        if not total:
+            tmp_path.unlink()
+            raise ValueError("No chunks to process")
+        os.replace(tmp_path, chunks_path)
+        print(f"  ✓ Saved {total} chunks")
+
+        # Byte offsets per line → O(1) chunk fetch at query time
+        write_chunk_offsets(chunks_path)
+        print(f"  ✓ Saved chunks.offsets.npy")
+        return {'total_chunks': total}
+
+    def content_batches():
+        """Chunk texts of chunks.jsonl in BUILD_STREAM_BATCH_SIZE batches"""
+        return batched((chunk['content'] for chunk in iter_jsonl(domain_dir / "chunks.jsonl")), BUILD_STREAM_BATCH_SIZE)
+
+    # ===== STAGE 2: Tokenize =====
+    def run_tokens():
+        total = tokenized = 0
+        with PickledListWriter(domain_dir / "tokens.pkl") as writer:
+            for texts in content_batches():
+                tokenized_chunks, misses = get_cache().tokens(texts, tokenize_vietnamese, underthesea_tokenizer_id())
+                writer.append(tokenized_chunks)
+                total += len(texts)
+                tokenized += misses
+        get_cache().save()
+        print(f"  ✓ Tokenized {tokenized} new/changed chunks ({total - tokenized} from cache)")
+        print(f"  ✓ Saved tokens.pkl")
+
+    # ===== STAGE 3: Build BM25 index =====
+    def run_bm25():
+        # Same index as SparseBM25.from_okapi(BM25Okapi(tokens)), without holding the token lists
+        bm25_index = SparseBM25.from_token_stream(iter_pickled_list(domain_dir / "tokens.pkl"))
+        bm25_index.save(domain_dir / BM25_DIRNAME)
+        print(f"  ✓ Saved {BM25_DIRNAME}/ ({bm25_index.meta['vocab_size']} terms, {bm25_index.meta['postings']} postings)")
+
+    # ===== STAGE 4: Build FAISS index =====
+    def run_faiss():
+        import faiss
+
+        model_id = build_model_id()
+        total = count_lines(domain_dir / "chunks.jsonl")
+        print(f"  Encoding {total} chunks ({model_id}, {encoder.workers} worker(s), length-bucketed, "
+              f"batches of {BUILD_STREAM_BATCH_SIZE})...")
+
+        # Vectors go batch by batch into a memory-mapped .npy; the index is built from it
+        vectors_path = domain_dir / "embeddings.tmp.npy"
+        embeddings, encoded, position, batch_stats = None, 0, 0, []
+        try:
+            for texts in content_batches():
+                encoder.last_stats = {}
+                vectors, misses = get_cache().embeddings(texts, encoder.encode, model_id)
+                if embeddings is None:
+                    embeddings = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32,
+                                                           shape=(total, vectors.shape[1]))
+                embeddings[position:position + len(vectors)] = vectors
+                position += len(vectors)
+                encoded += misses
+                if encoder.last_stats:
+                    batch_stats.append(encoder.last_stats)
+            get_cache().save()
+            stats = merge_encode_stats(batch_stats)
+            if encoded:
+                print(f"  ⚡ {stats['chunks']} chunks in {stats['seconds']:.1f}s → {stats['chunks_per_sec']:.1f} chunks/sec "
+                      f"(padding {stats['padding_ratio']:.0%}, unsorted {stats['unsorted_padding_ratio']:.0%})")
+            print(f"  ✓ Encoded {encoded} new/changed chunks ({total - encoded} from cache)")
+
+            # Type/params declared in metadata.json, else registry, else config encoding
+            dimension = embeddings.shape[1]
+            index_spec = resolve_index_spec(domain_index_spec(domain_id, domain_dir), len(embeddings), dimension)
+            faiss_index = build_vector_index(embeddings, index_spec)
+        finally:
+            del embeddings
+            vectors_path.unlink(missing_ok=True)
+        faiss.write_index(faiss_index, str(domain_dir / "faiss.index"))
+        print(f"  ✓ Saved faiss.index ({index_factory_string(index_spec)}, {dimension}D, {faiss_index.ntotal} vectors)")
+
+        return {'embedding_dim': dimension, 'vector_index': index_spec, 'encoded': encoded, 'throughput': stats}
+
+    # ===== STAGE 5: Save metadata =====
+    def metadata_inputs() -> Dict:
+        return {
+            **build_fingerprint(),
+            'domain_name': domain_name,
+            'json_files': [f.name for f in json_files()],
+            'pdf_files': [f.name for f in pdf_files()],
+            'chunks': graph.hash_file("chunks.jsonl"),
+            'faiss': graph.hash_file("faiss.index"),
+        }
+
+    def run_metadata():
+        faiss_info = graph.info('faiss')
+        declared = declared_index_spec(domain_dir)
+        resolved = faiss_info.get('vector_index') or _recorded_metadata(domain_dir).get('vector_index_resolved')
+        metadata = {
+            'domain_id': domain_id,
+            'domain_name': domain_name,
+            'total_chunks': graph.info('chunks').get('total_chunks') or count_lines(domain_dir / "chunks.jsonl"),
+            'json_files': [f.name for f in json_files()],
+            'pdf_files': [f.name for f in pdf_files()],
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_dim': faiss_info.get('embedding_dim'),
+            # Only a metadata.json declaration is kept: registry / FAISS_VECTOR_ENCODING edits apply on rebuild
+            **({'vector_index': declared} if declared else {}),
+            'vector_index_resolved': resolved or domain_index_spec(domain_id, domain_dir),
+            **build_fingerprint()
+        }
+        with open(domain_dir / "metadata.json", 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        print(f"  📊 Saved metadata.json")
+
+    # ===== STAGE 6: Article → page index of the PDFs (find-page endpoint) =====
+    def page_index_inputs() -> Dict:
+        return {
+            'version': PAGE_INDEX_VERSION,
+            'pdfs': [[f.name, graph.hash_file(f"pdfs/{f.name}")] for f in sorted(pdf_files())],
+        }
+
+    def run_page_index():
+        hashes = {f.name: graph.hash_file(f"pdfs/{f.name}") for f in pdf_files()}
+        index = build_page_index(domain_dir, pdf_files(), hashes)
+        for name, entry in index['pdfs'].items():
+            print(f"  ✓ {name}: {len(entry['articles'])} articles located")
+        print(f"  📑 Saved {PAGE_INDEX_NAME}")
+
+    stages = []
+    if pdf_files() and (not json_files() or 'pdf_to_json' in _manifest_stages(domain_dir)):
+        stages.append(Stage('pdf_to_json', lambda: {'pdf': graph.hash_file(f"pdfs/{pdf_files()[0].name}")},
+                            [convert_output()], run_convert, intermediate=True))
+    stages += [
+        Stage('chunks', chunks_inputs, ['chunks.jsonl', 'chunks.offsets.npy'], run_chunks,
+              deps=['pdf_to_json'] if stages else []),
+        Stage('tokens', lambda: {'tokenizer': underthesea_tokenizer_id(), 'chunks': graph.hash_file("chunks.jsonl")},
+              ['tokens.pkl'], run_tokens, deps=['chunks']),
+        Stage('bm25', lambda: {'format_version': BM25_FORMAT_VERSION, 'tokens': graph.hash_file("tokens.pkl")},
+              [f'{BM25_DIRNAME}/meta.json'], run_bm25, deps=['tokens']),
+        Stage('faiss', lambda: {'embedding_model_id': build_model_id(), 'chunks': graph.hash_file("chunks.jsonl"),
+                                'vector_index': domain_index_spec(domain_id, domain_dir)},
+              ['faiss.index'], run_faiss, deps=['chunks']),
+        Stage('metadata', metadata_inputs, ['metadata.json'], run_metadata, deps=['chunks', 'faiss']),
+    ]
+    if pdf_files():
+        stages.append(Stage('page_index', page_index_inputs, [PAGE_INDEX_NAME], run_page_index))
+    graph = BuildGraph(domain_dir, stages)
+    return graph
+
+
+def _manifest_stages(domain_dir: Path) -> Dict:
+    manifest_path = domain_dir / "build_manifest.json"
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _recorded_metadata(domain_dir: Path) -> Dict:
+    metadata_path = domain_dir / "metadata.json"
+    if not metadata_path.exists():
+        return {}
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _adoptable(domain_id: str, graph: BuildGraph) -> bool:
+    """
+    Artifacts built before build_manifest.json existed are taken as current unless metadata.json
+    records another chunker/tokenizer/model (then every stage reruns, mostly from the build cache)
+    """
+    domain_dir = graph.root
+    if graph.manifest or not all((domain_dir / f).exists() for f in REQUIRED_FILES):
+        return False
+    with open(domain_dir / 'metadata.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    changed = stale_fingerprint(meta)
+    for key, (recorded, current) in changed.items():
+        print(f"♻️ {domain_id}: {key} {recorded} → {current}")
+    return not changed
+
+
+def plan_domain(domain_id: str, force: bool = False, adopt: bool = False) -> List:
+    """[(stage, reason)] a build of the domain would run (adopt: record adoptable legacy artifacts)"""
+    domain_dir = Path(f"data/domains/{domain_id}")
+    if not domain_dir.exists():
+        return []
+    graph = domain_graph(domain_id)
+    if not force and _adoptable(domain_id, graph):
+        if not adopt:
+            return []
+        graph.adopt()
+        print(f"📌 {domain_id}: existing artifacts recorded in build_manifest.json")
+    return graph.plan(force)
+
+
+def build_domain(domain_id: str, encoder: CorpusEncoder = None, cache: BuildCache = None,
+                 force: bool = False) -> Optional[Dict]:
+    """
+    Build indices for a single domain from files in domains/{domain_id}/raw/ (stale stages only)
+
+    Returns the encoding throughput stats if the faiss stage ran.
+    """
     print(f"\n{'='*60}")
     print(f"🔨 Building domain: {domain_id}")
     print(f"{'='*60}\n")
-    
+
     domain_dir = Path(f"data/domains/{domain_id}")
-    
     if not domain_dir.exists():
         print(f"⚠️ Domain directory not found: {domain_dir}")
-        return
-    
-    # Check if already built (has all required files)
-    required_files = ['chunks.jsonl', 'tokens.pkl', 'bm25.pkl', 'faiss.index', 'metadata.json']
-    if all((domain_dir / f).exists() for f in required_files):
-        print(f"✅ Domain '{domain_id}' already built - SKIPPING")
-        print(f"   Location: {domain_dir}")
-        # Show metadata
-        with open(domain_dir / 'metadata.json', 'r', encoding='utf-8') as f:
-            meta = json.load(f)
-            print(f"   Chunks: {meta.get('total_chunks', 0)}")
-        return
-    
-    # ✅ Auto-convert PDF nếu chưa có JSON
-    raw_dir = domain_dir / "raw"
-    json_files = list(raw_dir.glob("*.json")) if raw_dir.exists() else []
-
-    if not json_files:
-        # Check for PDF
-        pdfs_dir = domain_dir / "pdfs"
-        pdf_files = list(pdfs_dir.glob("*.pdf")) if pdfs_dir.exists() else []
-        
-        if pdf_files:
-            print(f"⚠️ No JSON found, but found PDF: {pdf_files[0].name}")
-            print(f"🔄 Auto-converting PDF to JSON...")
-            
-            # Import converter (FIX: use correct module)
-            try:
-                from scripts.pdf_to_json import PDFToJSONConverter
-                
-                raw_dir.mkdir(parents=True, exist_ok=True)
-                json_output = raw_dir / f"{pdf_files[0].stem}_hopnhat.json"  # ✅ Thêm _hopnhat
-                
-                converter = PDFToJSONConverter()
-                converter.convert(str(pdf_files[0]), str(json_output))
-                
-                json_files = [json_output]
-                print(f"✅ Conversion complete: {json_output.name}\n")
-                
-            except ImportError as ie:
-                print(f"❌ Cannot import PDFConverter: {ie}")
-                print(f"   Please check if core/pdf_converter.py exists")
-                return
-            except Exception as e:
-                print(f"❌ Conversion failed: {e}")
-                import traceback
-                traceback.print_exc()
-                return
-
-    # Check for JSON files (sau khi đã convert)
-    if not json_files:
-        print(f"⚠️ No JSON files found in {domain_dir / 'raw'}")
-        return
-    
-    print(f"📂 Found {len(json_files)} JSON file(s):")
-    for f in json_files:
-        print(f"  - {f.name}")
-    
-    # ===== STEP 1: Load and chunk data =====
-    print("\n📖 Loading and chunking data...")
-    chunks = []
-    
-    for json_path in json_files:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            # ✅ Use shared document processor for consistent chunking
-            # This supports the new "Reverse Context" strategy (Specific Content -> Context)
-            from core.document_processor import xu_ly_van_ban_phap_luat_json
-            
-            processed_chunks, nguon_luat = xu_ly_van_ban_phap_luat_json(str(json_path))
-            print(f"  📄 {json_path.name}: {len(processed_chunks)} chunks (granular)")
-            
-            for p_chunk in processed_chunks:
-                # Find PDF file based on modification source (if any)
-                pdf_file = ''
-                pdf_files = list((domain_dir / "pdfs").glob("*.pdf"))
-                
-                if pdf_files:
-                    nguon_sua_doi = p_chunk['metadata'].get('modified_by', '')
-                    
-                    # Map nguon_sua_doi → pdf_file for dau_thau domain
-                    if domain_id == 'dau_thau' and nguon_sua_doi:
-                        if '90/2025' in nguon_sua_doi or 'Luật 90/2025' in nguon_sua_doi:
-                            matched_pdf = [f for f in pdf_files if '90_2025' in f.name or '90/2025' in f.name]
-                            pdf_file = matched_pdf[0].name if matched_pdf else pdf_files[0].name
-                        elif '57/2024' in nguon_sua_doi or 'Luật 57/2024' in nguon_sua_doi:
-                            matched_pdf = [f for f in pdf_files if '57_2024' in f.name or '57/2024' in f.name]
-                            pdf_file = matched_pdf[0].name if matched_pdf else pdf_files[0].name
-                        else:
-                            matched_pdf = [f for f in pdf_files if f.stem == 'luat_dau_thau']
-                            pdf_file = matched_pdf[0].name if matched_pdf else pdf_files[0].name
-                    else:
-                        pdf_file = pdf_files[0].name
-
-                # Create final chunk
-                chunks.append({
-                    'id': f"{domain_id}_{len(chunks)}",
-                    'content': p_chunk['content'],
-                    'source': p_chunk['source'],  # Keep the source string (Dieu X, Khoan Y...)
-                    'json_file': json_path.name,
-                    'pdf_file': pdf_file,
-                    'article_num': p_chunk['metadata'].get('article_num', ''),
-                    'clause_num': p_chunk['metadata'].get('clause_num', ''),
-                    'point_num': p_chunk['metadata'].get('point_num', ''),
-                    'domain_id': domain_id,
-                    'domain_name': DOMAIN_REGISTRY.get(domain_id, {}).get('name', domain_id)
-                })
-    
-    print(f"\n✅ Total chunks: {len(chunks)}")
-    
-    if len(chunks) == 0:
-        print("⚠️ No chunks to process!")
-        return
-    
-    # ===== STEP 2: Save chunks as JSONL =====
-    print("\n💾 Saving chunks.jsonl...")
-    chunks_path = domain_dir / "chunks.jsonl"
-    with open(chunks_path, 'w', encoding='utf-8') as f:
-        for chunk in chunks:
-            f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
-    print(f"  ✓ Saved {len(chunks)} chunks")
-    
-    # ===== STEP 3: Tokenize =====
-    print("\n🔤 Tokenizing chunks...")
-    tokenized_chunks = [tokenize_vietnamese(chunk['content']) for chunk in chunks]
-    
-    tokens_path = domain_dir / "tokens.pkl"
-    with open(tokens_path, 'wb') as f:
-        pickle.dump(tokenized_chunks, f)
-    print(f"  ✓ Saved tokens.pkl")
-    
-    # ===== STEP 4: Build BM25 index =====
-    print("\n🔍 Building BM25 index...")
-    bm25_index = BM25Okapi(tokenized_chunks)
-    
-    bm25_path = domain_dir / "bm25.pkl"
-    with open(bm25_path, 'wb') as f:
-        pickle.dump(bm25_index, f)
-    print(f"  ✓ Saved bm25.pkl")
-    
-    # ===== STEP 5: Build FAISS index =====
-    print("\n🧠 Building FAISS index...")
-    print(f"  Loading embedder: {EMBEDDING_MODEL}...")
-    embedder = load_embedding_model()
-    
-    print(f"  Encoding {len(chunks)} chunks...")
-    texts = [chunk['content'] for chunk in chunks]
-    embeddings = embedder.encode(texts, show_progress_bar=True)
-    
-    # Build FAISS index
-    import faiss
-    dimension = embeddings.shape[1]
-    faiss_index = faiss.IndexFlatL2(dimension)
-    faiss_index.add(embeddings)
-    
-    faiss_path = domain_dir / "faiss.index"
-    faiss.write_index(faiss_index, str(faiss_path))
-    print(f"  ✓ Saved faiss.index ({dimension}D, {faiss_index.ntotal} vectors)")
-    
-    # ===== STEP 6: Save metadata =====
-    metadata = {
-        'domain_id': domain_id,
-        'domain_name': DOMAIN_REGISTRY.get(domain_id, {}).get('name', domain_id),
-        'total_chunks': len(chunks),
-        'json_files': [f.name for f in json_files],
-        'pdf_files': [f.name for f in (domain_dir / "pdfs").glob("*.pdf")],
-        'embedding_model': EMBEDDING_MODEL,
-        'embedding_dim': dimension
-    }
-    
-    metadata_path = domain_dir / "metadata.json"
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print(f"\n📊 Saved metadata.json")
-    
-    print(f"\n🎉 Domain '{domain_id}' built successfully!")
+        return None
+
+    if encoder is None:
+        with build_encoder() as encoder:
+            return build_domain(domain_id, encoder, cache, force)
+
+    graph = domain_graph(domain_id, encoder, cache)
+    if not force and _adoptable(domain_id, graph):
+        graph.adopt()
+        print(f"📌 Existing artifacts recorded in build_manifest.json")
+    try:
+        ran = graph.run(force)
+    except Exception as e:
+        # Stages that finished are recorded; the failed one reruns next time
+        print(f"\n❌ Error building domain '{domain_id}': {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+    if not ran:
+        print(f"✅ Domain '{domain_id}' up to date - SKIPPING")
+        return None
+    print(f"\n🎉 Domain '{domain_id}' built: {', '.join(ran)}")
     print(f"  Location: {domain_dir}")
-    print(f"  Chunks: {len(chunks)}")
-    print(f"  Files: chunks.jsonl, tokens.pkl, bm25.pkl, faiss.index, metadata.json")
+    return (ran.get('faiss') or {}).get('throughput')
+
+
+# ===== Parallel domain builds =====
+
+_worker_encoder: Optional[CorpusEncoder] = None
+
+
+def _init_domain_worker(threads: int):
+    """
+    One in-process encoder per worker (model loaded once per process), CPU split between workers;
+    PDF extraction also runs in-process (see run_convert), so no pool is started inside a worker
+    """
+    global _worker_encoder
+    import torch
+    from config import BUILD_ENCODE_BATCH_SIZE
+    sys.stdout.reconfigure(line_buffering=True)
+    torch.set_num_threads(threads)
+    _worker_encoder = CorpusEncoder(workers=1, batch_size=BUILD_ENCODE_BATCH_SIZE, backend=BUILD_EMBEDDING_BACKEND)
+
+
+def _build_in_worker(domain_id: str, force: bool):
+    return build_domain(domain_id, _worker_encoder, force=force)
+
+
+def cache_keys_in_use(domains_dir: Path = Path("data/domains")) -> Set[str]:
+    """Content hashes of every chunk on disk, over all domains (what the shared build cache must keep)"""
+    return {
+        content_hash(chunk['content'])
+        for chunks_path in sorted(domains_dir.glob("*/chunks.jsonl"))
+        for chunk in iter_jsonl(chunks_path)
+    }
+
+
+def build_domains(domain_ids: List[str], workers: int, force: bool = False) -> Dict[str, Dict]:
+    """Build domains (stale stages only); {domain_id: encoding throughput} for domains that re-encoded"""
+    throughput = {}
+
+    def collect(domain_id, stats):
+        if stats and stats.get('chunks'):
+            throughput[domain_id] = stats
+
+    if workers > 1 and len(domain_ids) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f"🧵 Building {len(domain_ids)} domains on {workers} worker processes ({threads} threads each)")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_domain_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(_build_in_worker, domain_id, force): domain_id for domain_id in domain_ids}
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
+        return throughput
+
+    cache = BuildCache(Path(BUILD_CACHE_DIR))
+    # One encoder (model load / worker pool) and one build cache for every domain
+    with build_encoder() as encoder:
+        for domain_id in domain_ids:
+            collect(domain_id, build_domain(domain_id, encoder, cache, force))
+    return throughput
 
 
 def main():
-    """Build all domains from registry"""
-    print("🚀 Building all domains...")
-    
-    for domain_id in DOMAIN_REGISTRY.keys():
-        try:
-            build_domain(domain_id)
-        except Exception as e:
-            print(f"\n❌ Error building domain '{domain_id}': {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-    
-    print("\n" + "="*60)
-    print("✅ All domains built!")
-    print("="*60)
+    """Build all (or the given) domains from registry"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('domains', nargs='*', help='domain ids (default: all in registry)')
+    parser.add_argument('--dry-run', action='store_true', help='print the stages that would run and exit')
+    parser.add_argument('--force', action='store_true', help='rerun every stage')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='parallel domain builds (default BUILD_DOMAIN_WORKERS = serial; 0 = one per CPU)')
+    args = parser.parse_args()
+
+    from config import BUILD_DOMAIN_WORKERS, GLOBAL_INDEX_ENABLED, GLOBAL_INDEX_DIR, TOKENIZER_DICT_PATH
+    domain_ids = args.domains or list(DOMAIN_REGISTRY.keys())
+    unknown = [d for d in domain_ids if d not in DOMAIN_REGISTRY]
+    if unknown:
+        parser.error(f"unknown domain(s): {unknown}")
+
+    plans = {domain_id: plan_domain(domain_id, args.force, adopt=not args.dry_run) for domain_id in domain_ids}
+    stale = [domain_id for domain_id, plan in plans.items() if plan]
+    derived_stale = bool(stale) or not Path(TOKENIZER_DICT_PATH).exists() or (
+        GLOBAL_INDEX_ENABLED and not (Path(GLOBAL_INDEX_DIR) / "global_meta.json").exists())
+
+    if args.dry_run:
+        print("🧪 Dry run: stages that would run")
+        for domain_id, plan in plans.items():
+            if not Path(f"data/domains/{domain_id}").exists():
+                print(f"  {domain_id:<24} ⚠️ domain directory not found")
+            elif not plan:
+                print(f"  {domain_id:<24} up to date")
+            else:
+                print(f"  {domain_id:<24} " + ', '.join(f"{stage} ({reason})" for stage, reason in plan))
+        if derived_stale:
+            print(f"  {'(derived)':<24} tokenizer dictionary" + (", global index" if GLOBAL_INDEX_ENABLED else ""))
+        return
+
+    print(f"🚀 Building domains: {len(stale)} of {len(domain_ids)} have stale stages")
+    workers = args.workers if args.workers is not None else BUILD_DOMAIN_WORKERS
+    workers = min(workers or os.cpu_count() or 1, max(1, len(stale)))
+    throughput = build_domains(stale, workers, args.force)
+
+    if throughput:
+        print("\n⚡ Encoding throughput:")
+        for domain_id, stats in throughput.items():
+            print(f"  {domain_id:<20} {stats['chunks']:>6} chunks  {stats['chunks_per_sec']:>8.1f} chunks/sec")
+
+    failed = [domain_id for domain_id in stale if plan_domain(domain_id)]
+    if failed:
+        print(f"\n⚠️ Still stale after the build (see errors above): {failed}")
+    elif stale:
+        # Entries of chunks that no longer exist (amended / re-chunked away) would otherwise pile up
+        removed = BuildCache(Path(BUILD_CACHE_DIR)).prune(cache_keys_in_use())
+        print(f"\n🧹 Build cache pruned: {removed['tokens']} token lists, {removed['embeddings']} vectors")
+    if not derived_stale:
+        print("\n✅ All domains up to date")
+        return
+
+    # Query-time word dictionary (TOKENIZER_MODE=fast) is derived from tokens.pkl
+    from utils.tokenizer import DictionaryTokenizer
+    DictionaryTokenizer.from_domains(Path("data/domains")).save(Path(TOKENIZER_DICT_PATH))
+    print(f"\n📖 Tokenizer dictionary written: {TOKENIZER_DICT_PATH}")
+
+    # Global cross-domain index is derived from the domains → rebuild it too
+    if GLOBAL_INDEX_ENABLED:
+        print("\n🌐 Building global cross-domain index...")
+        from scripts.build_global_index import main as build_global
+        sys.argv = sys.argv[:1]
+        build_global()
+
+    if not failed:
+        print("\n" + "="*60)
+        print("✅ All domains built!")
+        print("="*60)
 
 
 if __name__ == "__main__":
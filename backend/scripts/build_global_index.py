@@ -0,0 +1,42 @@
+"""
+Build the global cross-domain index (data/global/) from already built domains
+
+Usage:
+    python scripts/build_global_index.py
+    python scripts/build_global_index.py --spec '{"type": "hnsw", "M": 32}'
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.global_index import build_global_index
+from config import GLOBAL_INDEX_DIR, FAISS_VECTOR_ENCODING
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spec', help='JSON vector_index spec (default: flat, FAISS_VECTOR_ENCODING)')
+    args = parser.parse_args()
+
+    with open("data/domain_registry.json", "r", encoding="utf-8") as f:
+        registry = json.load(f)
+    domain_ids = [d for d in registry if (Path("data/domains") / d / "metadata.json").exists()]
+    missing = [d for d in registry if d not in domain_ids]
+    if missing:
+        print(f"⚠️ Not built yet, left out of the global index: {missing}")
+
+    spec = json.loads(args.spec) if args.spec else {'encoding': FAISS_VECTOR_ENCODING}
+    start = time.time()
+    meta = build_global_index(domain_ids, out_dir=Path(GLOBAL_INDEX_DIR), spec=spec)
+    print(f"✅ Global index: {meta['total_chunks']} chunks from {len(meta['domains'])} domains "
+          f"→ {GLOBAL_INDEX_DIR}/ in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Convert pickled BM25Okapi indices (bm25.pkl / tokens.pkl) to native CSR arrays (bm25/)
+
+Usage:
+    python scripts/convert_bm25.py              # all domains in registry
+    python scripts/convert_bm25.py lao_dong     # selected domains
+"""
+
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.bm25 import SparseBM25, BM25_DIRNAME
+
+PARITY_SAMPLE_QUERIES = 50
+
+
+def convert_domain(domain_id: str) -> bool:
+    """Convert one domain and check score parity against BM25Okapi"""
+    domain_dir = Path(f"data/domains/{domain_id}")
+    bm25_path = domain_dir / "bm25.pkl"
+    tokens_path = domain_dir / "tokens.pkl"
+
+    tokenized_chunks = None
+    if tokens_path.exists():
+        with open(tokens_path, 'rb') as f:
+            tokenized_chunks = pickle.load(f)
+
+    if bm25_path.exists():
+        with open(bm25_path, 'rb') as f:
+            okapi = pickle.load(f)
+    elif tokenized_chunks is not None:
+        from rank_bm25 import BM25Okapi
+        okapi = BM25Okapi(tokenized_chunks)
+    else:
+        print(f"⚠️ {domain_id}: no bm25.pkl or tokens.pkl, skipping")
+        return False
+
+    start = time.time()
+    sparse = SparseBM25.from_okapi(okapi)
+    sparse.save(domain_dir / BM25_DIRNAME)
+    print(f"✅ {domain_id}: {sparse.meta['vocab_size']} terms, {sparse.meta['postings']} postings "
+          f"({sparse.nbytes / 1024:.0f} KB) in {time.time() - start:.2f}s")
+
+    # Parity: chunk prefixes as queries
+    if tokenized_chunks:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(tokenized_chunks), size=min(PARITY_SAMPLE_QUERIES, len(tokenized_chunks)), replace=False)
+        loaded = SparseBM25.load(domain_dir / BM25_DIRNAME)
+        max_diff = 0.0
+        for idx in sample:
+            query = tokenized_chunks[idx][:8]
+            max_diff = max(max_diff, float(np.abs(okapi.get_scores(query) - loaded.get_scores(query)).max()))
+        print(f"   Parity vs BM25Okapi: max |Δscore| = {max_diff:.2e} over {len(sample)} queries")
+
+    return True
+
+
+def main():
+    if len(sys.argv) > 1:
+        domain_ids = sys.argv[1:]
+    else:
+        with open("data/domain_registry.json", "r", encoding="utf-8") as f:
+            domain_ids = list(json.load(f).keys())
+
+    for domain_id in domain_ids:
+        convert_domain(domain_id)
+
+
+if __name__ == "__main__":
+    main()
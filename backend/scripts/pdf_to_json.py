@@ -12,13 +12,24 @@ Example:
 Prerequisites:
     - PDF file must exist in: data/domains/{domain_id}/pdfs/*.pdf
     - Output will be saved to: data/domains/{domain_id}/raw/*.json
+
+Pages are extracted in-process (or in a process pool with PDF_EXTRACT_WORKERS > 1) and
+cached per page under {BUILD_CACHE_DIR}/pdf_pages/ keyed by PDF hash, so re-running a
+conversion after a change to normalize_text / parse_structure skips pdfplumber entirely.
 """
 
 import sys
 import os
 import json
 import re
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Force UTF-8 on Windows (only if not already wrapped)
 if sys.platform == 'win32':
@@ -39,9 +50,47 @@ except ImportError:
     sys.exit(1)
 
 
+# Bump when extract_page output changes (invalidates the page cache)
+PAGE_EXTRACTOR_VERSION = 1
+PAGES_PER_TASK = 8
+
+
+def pdf_hash(pdf_path: str) -> str:
+    digest = hashlib.sha1()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_page_range(pdf_path: str, page_numbers: List[int]) -> List[Tuple[int, Dict]]:
+    """Worker: open the PDF once and extract a run of pages (1-based)"""
+    converter = PDFToJSONConverter(workers=1, cache_dir=False)
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num in page_numbers:
+            page = pdf.pages[page_num - 1]
+            results.append((page_num, converter.extract_page(page)))
+            page.close()  # drop parsed layout objects, keeps worker memory flat
+    return results
+
+
 class PDFToJSONConverter:
     """Convert legal PDF to structured JSON with table support"""
     
+    def __init__(self, workers: Optional[int] = None, cache_dir=None):
+        """
+        Args:
+            workers: page extraction processes (default PDF_EXTRACT_WORKERS; 1 = in-process, 0 = one per CPU)
+            cache_dir: page cache directory (default {BUILD_CACHE_DIR}/pdf_pages; False = no cache)
+        """
+        from config import PDF_EXTRACT_WORKERS, BUILD_CACHE_DIR
+        workers = PDF_EXTRACT_WORKERS if workers is None else workers
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        if cache_dir is None:
+            cache_dir = Path(BUILD_CACHE_DIR) / 'pdf_pages'
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+    
     def table_to_markdown(self, table: list) -> str:
         """Convert a table (list of rows) to Markdown format"""
         if not table or len(table) < 1:
@@ -83,53 +132,89 @@ class PDFToJSONConverter:
         
         return "\n".join(lines)
     
+    def extract_page(self, page) -> Dict:
+        """Page text + its tables as Markdown (tables detected once: extract_tables() would run find_tables() again)"""
+        tables = [table.extract() for table in page.find_tables()]
+        markdown = [md for md in (self.table_to_markdown(table) for table in tables) if md]
+        return {'text': page.extract_text() or '', 'tables': markdown}
+    
+    # ===== Page cache =====
+    
+    def _page_cache_path(self, digest: str, page_num: int) -> Path:
+        return self.cache_dir / f"{digest}-v{PAGE_EXTRACTOR_VERSION}" / f"{page_num:05d}.json"
+    
+    def _cached_page(self, digest: str, page_num: int) -> Optional[Dict]:
+        path = self._page_cache_path(digest, page_num)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def _cache_page(self, digest: str, page_num: int, content: Dict):
+        path = self._page_cache_path(digest, page_num)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    
+    # ===== Extraction =====
+    
+    def extract_pages(self, pdf_path: str) -> List[Dict]:
+        """extract_page() for every page, in order: page cache first, missing pages in a process pool"""
+        start = time.time()
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+        
+        digest = pdf_hash(pdf_path) if self.cache_dir else None
+        pages: Dict[int, Dict] = {}
+        if digest:
+            for page_num in range(1, page_count + 1):
+                cached = self._cached_page(digest, page_num)
+                if cached is not None:
+                    pages[page_num] = cached
+        
+        missing = [n for n in range(1, page_count + 1) if n not in pages]
+        if missing:
+            # Contiguous runs: each task opens the PDF once
+            tasks = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+            workers = min(self.workers, len(tasks))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    batches = executor.map(_extract_page_range, [pdf_path] * len(tasks), tasks)
+                    extracted = [item for batch in batches for item in batch]
+            else:
+                extracted = _extract_page_range(pdf_path, missing)
+            for page_num, content in extracted:
+                pages[page_num] = content
+                if digest:
+                    self._cache_page(digest, page_num, content)
+        
+        print(f"  📄 {page_count} pages ({page_count - len(missing)} cached, {len(missing)} extracted"
+              f"{f' on {min(self.workers, len(missing))} processes' if len(missing) > PAGES_PER_TASK else ''})"
+              f" in {time.time() - start:.1f}s")
+        return [pages[n] for n in range(1, page_count + 1)]
+    
     def extract_text_with_tables(self, pdf_path: str) -> str:
         """Extract text from PDF, converting tables to Markdown"""
         parts = []
         table_count = 0
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_parts = []
-                
-                # Extract tables from this page
-                tables = page.extract_tables()
-                
-                if tables:
-                    # Get text without table areas
-                    table_bboxes = []
-                    if hasattr(page, 'find_tables'):
-                        found_tables = page.find_tables()
-                        for t in found_tables:
-                            table_bboxes.append(t.bbox)
-                    
-                    # Extract text outside tables
-                    if table_bboxes:
-                        # Create page without table regions
-                        filtered_page = page
-                        for bbox in table_bboxes:
-                            # Crop out table area by getting text from non-table regions
-                            pass
-                    
-                    # Get full text first
-                    text = page.extract_text()
-                    if text:
-                        page_parts.append(text)
-                    
-                    # Append tables as markdown
-                    for table in tables:
-                        md_table = self.table_to_markdown(table)
-                        if md_table:
-                            table_count += 1
-                            page_parts.append(f"\n[BẢNG {table_count}]\n{md_table}\n")
-                else:
-                    # No tables, just extract text
-                    text = page.extract_text()
-                    if text:
-                        page_parts.append(text)
-                
-                if page_parts:
-                    parts.append("\n".join(page_parts))
+        for page in self.extract_pages(pdf_path):
+            page_parts = []
+            if page['text']:
+                page_parts.append(page['text'])
+            
+            # Append tables as markdown (numbered across the document)
+            for md_table in page['tables']:
+                table_count += 1
+                page_parts.append(f"\n[BẢNG {table_count}]\n{md_table}\n")
+            
+            if page_parts:
+                parts.append("\n".join(page_parts))
         
         if table_count > 0:
             print(f"  📊 Found {table_count} table(s), converted to Markdown")
@@ -0,0 +1,134 @@
+"""
+Compare fp16 / SQ8 FAISS encodings against the fp32 baseline and optionally re-encode domains
+
+Recall@k: leave-one-out queries (sampled stored vectors, self match dropped), exact fp32 top-k as ground truth.
+
+Usage:
+    python scripts/quantize_faiss.py                          # all domains, fp16 + sq8 report
+    python scripts/quantize_faiss.py dat_dai --k 8 16
+    python scripts/quantize_faiss.py dat_dai --apply sq8      # rewrite faiss.index + metadata.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.vector_index import (
+    VECTOR_ENCODINGS, build_vector_index, index_vectors, index_code_bytes, resolve_index_spec, index_factory_string
+)
+
+
+def leave_one_out_search(index: faiss.Index, queries: np.ndarray, query_ids: np.ndarray, k: int):
+    """Top-k ids per query with the query's own vector removed; also returns seconds/query"""
+    start = time.perf_counter()
+    _, ids = index.search(queries, k + 1)
+    elapsed = (time.perf_counter() - start) / len(queries)
+
+    top = np.empty((len(queries), k), dtype='int64')
+    for row, (found, self_id) in enumerate(zip(ids, query_ids)):
+        others = found[found != self_id]
+        top[row] = others[:k]
+    return top, elapsed
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    """Mean fraction of true top-k ids present in found top-k"""
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def compare_domain(domain_id: str, encodings, ks, n_queries: int, seed: int = 0):
+    faiss_path = Path(f"data/domains/{domain_id}/faiss.index")
+    if not faiss_path.exists():
+        print(f"⚠️ {domain_id}: no faiss.index, skipping")
+        return
+
+    current = faiss.read_index(str(faiss_path))
+    vectors = index_vectors(current)
+    if not isinstance(current, faiss.IndexFlat):
+        print(f"⚠️ {domain_id}: current index is {type(current).__name__}, "
+              f"baseline uses its decoded vectors (rebuild for a true fp32 baseline)")
+
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[query_ids]
+    max_k = max(ks)
+
+    baseline = build_vector_index(vectors, {'encoding': 'fp32'})
+    truth, base_latency = leave_one_out_search(baseline, queries, query_ids, max_k)
+    base_bytes = index_code_bytes(baseline)
+
+    print(f"\n📊 {domain_id}: {baseline.ntotal} vectors × {baseline.d}D, {len(queries)} queries")
+    header = f"   {'encoding':<8} {'codes':>10} {'ratio':>6} {'µs/query':>9} " + " ".join(f"{'R@' + str(k):>7}" for k in ks)
+    print(header)
+    print(f"   {'fp32':<8} {base_bytes / 1024:>8.0f}KB {1.0:>5.1f}× {base_latency * 1e6:>9.0f} "
+          + " ".join(f"{1.0:>7.4f}" for _ in ks))
+
+    for encoding in encodings:
+        candidate = build_vector_index(vectors, {'encoding': encoding})
+        found, latency = leave_one_out_search(candidate, queries, query_ids, max_k)
+        code_bytes = index_code_bytes(candidate)
+        recalls = [recall_at_k(truth[:, :k], found[:, :k]) for k in ks]
+        print(f"   {encoding:<8} {code_bytes / 1024:>8.0f}KB {base_bytes / code_bytes:>5.1f}× {latency * 1e6:>9.0f} "
+              + " ".join(f"{r:>7.4f}" for r in recalls))
+
+
+def apply_index_spec(domain_id: str, spec: dict):
+    """Rebuild a domain's faiss.index from its stored vectors with a new spec, declare it in metadata.json"""
+    domain_dir = Path(f"data/domains/{domain_id}")
+    faiss_path = domain_dir / "faiss.index"
+
+    current = faiss.read_index(str(faiss_path))
+    if not isinstance(current, faiss.IndexFlat):
+        print(f"⚠️ {domain_id}: re-encoding already approximate vectors ({type(current).__name__}); "
+              f"rebuild the domain for full precision")
+
+    vectors = index_vectors(current)
+    resolved = resolve_index_spec(spec, *vectors.shape)
+    index = build_vector_index(vectors, resolved)
+    tmp_path = faiss_path.with_suffix('.index.tmp')
+    faiss.write_index(index, str(tmp_path))
+    tmp_path.replace(faiss_path)
+
+    metadata_path = domain_dir / "metadata.json"
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata['vector_index'] = spec  # declared: the next domain build re-resolves it for its corpus
+    metadata['vector_index_resolved'] = resolved
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ {domain_id}: faiss.index rebuilt as {index_factory_string(resolved)} ({faiss_path.stat().st_size / 1024:.0f} KB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('domains', nargs='*', help='domain ids (default: all in registry)')
+    parser.add_argument('--encodings', nargs='+', default=['fp16', 'sq8'], choices=[e for e in VECTOR_ENCODINGS if e != 'fp32'])
+    parser.add_argument('--k', nargs='+', type=int, default=[1, 8, 16])
+    parser.add_argument('--queries', type=int, default=300, help='leave-one-out queries per domain')
+    parser.add_argument('--apply', choices=list(VECTOR_ENCODINGS), help='re-encode faiss.index with this encoding')
+    args = parser.parse_args()
+
+    domain_ids = args.domains
+    if not domain_ids:
+        with open("data/domain_registry.json", "r", encoding="utf-8") as f:
+            domain_ids = list(json.load(f).keys())
+
+    for domain_id in domain_ids:
+        if args.apply:
+            apply_index_spec(domain_id, {'type': 'flat', 'encoding': args.apply})
+        else:
+            compare_domain(domain_id, args.encodings, args.k, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Recall / latency sweep over vector index types (Flat, HNSW, IVF-Flat, IVF-PQ) and their search knobs
+
+Vectors come from a domain's faiss.index; --scale N grows the corpus to N vectors (stored vectors + noise)
+to preview behaviour on larger decree / circular corpora. Ground truth: exact fp32 top-k.
+
+Usage:
+    python scripts/sweep_vector_index.py dat_dai
+    python scripts/sweep_vector_index.py dat_dai --scale 50000 --k 16
+    python scripts/sweep_vector_index.py dat_dai --apply '{"type": "hnsw", "M": 32, "ef_search": 64}'
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.vector_index import (
+    build_vector_index, index_vectors, index_code_bytes, resolve_index_spec, index_factory_string, vector_search_params
+)
+from scripts.quantize_faiss import recall_at_k, apply_index_spec
+
+# (spec, knob name, knob values)
+SWEEP = [
+    ({'type': 'hnsw', 'M': 16}, 'ef_search', [16, 32, 64, 128]),
+    ({'type': 'hnsw', 'M': 32}, 'ef_search', [16, 32, 64, 128]),
+    ({'type': 'hnsw', 'M': 32, 'encoding': 'sq8'}, 'ef_search', [32, 64, 128]),
+    ({'type': 'ivf_flat'}, 'nprobe', [1, 2, 4, 8, 16, 32]),
+    ({'type': 'ivf_flat', 'encoding': 'sq8'}, 'nprobe', [4, 8, 16]),
+    ({'type': 'ivf_pq', 'pq_m': 64}, 'nprobe', [4, 8, 16, 32]),
+]
+
+
+def scaled_vectors(vectors: np.ndarray, n: int, seed: int = 0) -> np.ndarray:
+    """Grow a corpus to n vectors: originals + jittered copies (keeps the real distribution)"""
+    if n <= len(vectors):
+        return vectors
+    rng = np.random.default_rng(seed)
+    extra = vectors[rng.integers(len(vectors), size=n - len(vectors))]
+    noise = rng.standard_normal(extra.shape).astype('float32') * vectors.std(axis=0) * 0.3
+    return np.vstack([vectors, extra + noise]).astype('float32')
+
+
+def timed_search(index: faiss.Index, queries: np.ndarray, k: int, params=None):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k, params=params)
+    return ids, (time.perf_counter() - start) / len(queries)
+
+
+def sweep_domain(domain_id: str, k: int, n_queries: int, scale: int, seed: int = 0):
+    faiss_path = Path(f"data/domains/{domain_id}/faiss.index")
+    if not faiss_path.exists():
+        print(f"⚠️ {domain_id}: no faiss.index, skipping")
+        return
+
+    vectors = scaled_vectors(index_vectors(faiss.read_index(str(faiss_path))), scale, seed)
+    rng = np.random.default_rng(seed + 1)
+    # Held-out style queries: jittered corpus vectors (not exact copies of an indexed vector)
+    queries = vectors[rng.integers(len(vectors), size=n_queries)]
+    queries = queries + rng.standard_normal(queries.shape).astype('float32') * vectors.std(axis=0) * 0.1
+
+    exact = build_vector_index(vectors)
+    truth, exact_latency = timed_search(exact, queries, k)
+
+    print(f"\n📊 {domain_id}: {len(vectors)} vectors × {vectors.shape[1]}D, {n_queries} queries, recall@{k}")
+    print(f"   {'index':<22} {'knob':<14} {'recall':>7} {'µs/query':>9} {'speedup':>8} {'codes':>9} {'build':>7}")
+    print(f"   {'Flat':<22} {'-':<14} {1.0:>7.4f} {exact_latency * 1e6:>9.0f} {1.0:>7.1f}× "
+          f"{index_code_bytes(exact) / 1e6:>7.1f}MB {'-':>7}")
+
+    for spec, knob, values in SWEEP:
+        spec = resolve_index_spec(spec, *vectors.shape)
+        start = time.perf_counter()
+        index = build_vector_index(vectors, spec)
+        build_seconds = time.perf_counter() - start
+        code_bytes = index_code_bytes(index)
+
+        for value in values:
+            params = vector_search_params(index, spec, **{knob: value})
+            found, latency = timed_search(index, queries, k, params)
+            recall = recall_at_k(truth, found)
+            print(f"   {index_factory_string(spec):<22} {f'{knob}={value}':<14} {recall:>7.4f} {latency * 1e6:>9.0f} "
+                  f"{exact_latency / latency:>7.1f}× {code_bytes / 1e6:>7.1f}MB {build_seconds:>6.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('domains', nargs='*', help='domain ids (default: all in registry)')
+    parser.add_argument('--k', type=int, default=16)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scale', type=int, default=0, help='grow each corpus to this many vectors')
+    parser.add_argument('--apply', help='JSON vector_index spec: rebuild faiss.index + record in metadata.json')
+    args = parser.parse_args()
+
+    domain_ids = args.domains
+    if not domain_ids:
+        with open("data/domain_registry.json", "r", encoding="utf-8") as f:
+            domain_ids = list(json.load(f).keys())
+
+    for domain_id in domain_ids:
+        if args.apply:
+            apply_index_spec(domain_id, json.loads(args.apply))
+        else:
+            sweep_domain(domain_id, args.k, args.queries, args.scale)
+
+
+if __name__ == "__main__":
+    main()
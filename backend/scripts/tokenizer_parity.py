@@ -0,0 +1,129 @@
+"""
+Parity report: dictionary tokenizer (TOKENIZER_MODE=fast) vs underthesea on the corpus
+
+Pseudo-queries are the first words of sampled chunks (the source chunk counts as the relevant document).
+Reported per strategy:
+- exact: share of texts segmented identically; token F1 against underthesea tokens
+- BM25 R@k: overlap of the top-k with underthesea-tokenized queries (same index)
+- self@k: share of queries whose source chunk is in the top-k (both tokenizers)
+- latency per query (uncached / memoized)
+
+Usage:
+    python scripts/tokenizer_parity.py
+    python scripts/tokenizer_parity.py --queries 100 --query-words 12 --k 8
+    python scripts/tokenizer_parity.py --write        # (re)write TOKENIZER_DICT_PATH only
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import TOKENIZER_DICT_PATH, BM25_STOPWORDS, BM25_MAX_DF_RATIO
+from core.bm25 import SparseBM25, BM25_DIRNAME
+from core.chunk_store import ChunkStore
+from utils.tokenizer import DictionaryTokenizer, tokenize_underthesea
+
+
+def token_f1(reference, candidate) -> float:
+    overlap = sum((Counter(reference) & Counter(candidate)).values())
+    if not reference or not candidate:
+        return float(reference == candidate)
+    precision, recall = overlap / len(candidate), overlap / len(reference)
+    return 2 * precision * recall / (precision + recall) if overlap else 0.0
+
+
+def bm25_top(bm25: SparseBM25, tokens, k: int) -> set:
+    ids, _ = bm25.top_k(tokens, k, stopwords=BM25_STOPWORDS, max_df_ratio=BM25_MAX_DF_RATIO)
+    return set(ids.tolist())
+
+
+def domain_samples(domain_id: str, n: int, query_words: int, seed: int = 0):
+    """[(chunk index, pseudo-query, full chunk text)]"""
+    store = ChunkStore(Path(f"data/domains/{domain_id}/chunks.jsonl"))
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(store), size=min(n, len(store)), replace=False).tolist()
+    chunks = store.get_many(picked)
+    return [(i, ' '.join(chunks[i]['content'].split()[:query_words]), chunks[i]['content']) for i in picked if i in chunks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('domains', nargs='*', help='domain ids (default: all in registry)')
+    parser.add_argument('--queries', type=int, default=60, help='pseudo-queries per domain')
+    parser.add_argument('--query-words', type=int, default=15)
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--write', action='store_true', help='write the dictionary to TOKENIZER_DICT_PATH and exit')
+    args = parser.parse_args()
+
+    tokenizers = {
+        'unigram': DictionaryTokenizer.from_domains(strategy='unigram'),
+        'longest': DictionaryTokenizer.from_domains(strategy='longest'),
+    }
+    if args.write:
+        tokenizers['unigram'].save(Path(TOKENIZER_DICT_PATH))
+        print(f"✅ Wrote {TOKENIZER_DICT_PATH} ({len(tokenizers['unigram'].counts)} words, "
+              f"{len(tokenizers['unigram'].compounds)} compounds)")
+        return
+
+    domain_ids = args.domains
+    if not domain_ids:
+        with open("data/domain_registry.json", "r", encoding="utf-8") as f:
+            domain_ids = list(json.load(f).keys())
+
+    totals = {name: Counter() for name in ['underthesea', *tokenizers]}
+    timings = {name: [] for name in totals}
+    cached_timings = {name: [] for name in tokenizers}
+
+    for domain_id in domain_ids:
+        bm25 = SparseBM25.load(Path(f"data/domains/{domain_id}") / BM25_DIRNAME)
+        for chunk_idx, query, content in domain_samples(domain_id, args.queries, args.query_words):
+            start = time.perf_counter()
+            reference = tokenize_underthesea(query)
+            timings['underthesea'].append(time.perf_counter() - start)
+            reference_top = bm25_top(bm25, reference, args.k)
+            totals['underthesea']['self'] += chunk_idx in reference_top
+            totals['underthesea']['n'] += 1
+
+            content_reference = tokenize_underthesea(content)
+            for name, tokenizer in tokenizers.items():
+                start = time.perf_counter()
+                tokens = tokenizer(query)
+                timings[name].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                tokenizer(query)
+                cached_timings[name].append(time.perf_counter() - start)
+
+                top = bm25_top(bm25, tokens, args.k)
+                content_tokens = tokenizer(content)
+                stats = totals[name]
+                stats['n'] += 1
+                stats['exact'] += tokens == reference
+                stats['f1'] += token_f1(reference, tokens)
+                stats['chunk_exact'] += content_tokens == content_reference
+                stats['chunk_f1'] += token_f1(content_reference, content_tokens)
+                stats['recall'] += len(top & reference_top) / max(1, len(reference_top))
+                stats['self'] += chunk_idx in top
+
+    n = totals['underthesea']['n']
+    print(f"\n📊 Tokenizer parity: {len(domain_ids)} domains, {n} pseudo-queries ({args.query_words} words), k={args.k}")
+    print(f"   {'tokenizer':<12} {'exact':>6} {'F1':>7} {'chunk exact':>11} {'chunk F1':>9} "
+          f"{'BM25 R@' + str(args.k):>9} {'self@' + str(args.k):>7} {'µs/query':>9} {'cached':>7}")
+    print(f"   {'underthesea':<12} {1.0:>6.3f} {1.0:>7.4f} {1.0:>11.3f} {1.0:>9.4f} {1.0:>9.4f} "
+          f"{totals['underthesea']['self'] / n:>7.3f} {np.mean(timings['underthesea']) * 1e6:>9.0f} {'-':>7}")
+    for name in tokenizers:
+        stats = totals[name]
+        print(f"   {name:<12} {stats['exact'] / n:>6.3f} {stats['f1'] / n:>7.4f} {stats['chunk_exact'] / n:>11.3f} "
+              f"{stats['chunk_f1'] / n:>9.4f} {stats['recall'] / n:>9.4f} {stats['self'] / n:>7.3f} "
+              f"{np.mean(timings[name]) * 1e6:>9.0f} {np.mean(cached_timings[name]) * 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
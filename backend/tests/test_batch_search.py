@@ -0,0 +1,126 @@
+import sys
+import os
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.bm25 import SparseBM25
+from core.domain_manager import DomainManager
+from core.query_context import QueryContext
+from core.search_domains import search_multi_query_with_domains
+
+
+class TextSeededEmbedder:
+    """Deterministic vector per text; counts encode calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return np.stack([
+            np.random.default_rng(sum(map(ord, text))).standard_normal(768).astype('float32')
+            for text in texts
+        ])
+
+
+def tokenize(text):
+    return text.lower().split()
+
+
+def test_bm25_top_k_batch_matches_single():
+    rng = np.random.default_rng(0)
+    words = [f'w{i}' for i in range(50)]
+    corpus = [list(rng.choice(words, size=12)) for _ in range(300)]
+    bm25 = SparseBM25.from_corpus(corpus)
+    queries = [list(rng.choice(words, size=3)) for _ in range(5)] + [['unknown']]
+    terms_list = [bm25.select_terms(q) for q in queries]
+
+    for (batch_ids, batch_scores), terms in zip(bm25.top_k_batch(terms_list, 10), terms_list):
+        ids, scores = bm25.top_k_terms(terms, 10, method='dense')
+        assert np.allclose(batch_scores, scores)
+        assert set(batch_ids) == set(ids)
+
+
+def test_search_batch_matches_sequential():
+    embedder = TextSeededEmbedder()
+    manager = DomainManager(embedder=embedder)
+    manager._global_checked = True  # per-domain path (no global index)
+    if not {'hon_nhan', 'lao_dong'} <= set(manager.domains):
+        return
+
+    queries = ['điều kiện kết hôn', 'thời giờ làm việc', 'quyền của người lao động']
+    hints = [['hon_nhan'], ['lao_dong'], ['lao_dong', 'hon_nhan']]
+    batched = manager.search_batch(queries, tokenize, top_k=4, domain_hints=hints)
+    assert embedder.calls == 1
+
+    for query, hint, results in zip(queries, hints, batched):
+        expected = manager.search(query, tokenize, top_k=4, domain_ids=hint)
+        assert [r['id'] for r in results] == [r['id'] for r in expected]
+        assert np.allclose([r['score'] for r in results], [r['score'] for r in expected])
+    manager.unload_all()
+
+
+def _full_argsort_scores(domain, tokens, embedding, top_k):
+    """Domain.search scoring over the full BM25 score array (the argsort formula top_k_batch replaced)"""
+    from config import BM25_WEIGHT, FAISS_WEIGHT
+    bm25_scores = domain.bm25_index.get_scores(tokens)
+    top = np.argsort(bm25_scores)[::-1][:top_k * 2]
+    subset = bm25_scores[top]
+    combined = {}
+    if subset.max() - subset.min() > 0:
+        for idx in top:
+            combined[int(idx)] = (bm25_scores[idx] - subset.min()) / (subset.max() - subset.min()) * BM25_WEIGHT
+    distances, ids = domain.faiss_index.search(embedding.reshape(1, -1), top_k * 2)
+    for distance, idx in zip(distances[0], ids[0]):
+        combined[int(idx)] = combined.get(int(idx), 0) + 1 / (1 + distance) * FAISS_WEIGHT
+    return sorted(combined.values(), reverse=True)[:top_k]
+
+
+def test_few_match_scores_keep_full_array_floor():
+    """Queries matching fewer docs than the BM25 candidates: scores as if unmatched docs scored 0"""
+    embedder = TextSeededEmbedder()
+    manager = DomainManager(embedder=embedder)
+    if 'dat_dai' not in manager.domains:
+        return
+    domain = manager.domains['dat_dai']
+    bm25 = domain.bm25_index
+    if not hasattr(bm25, 'top_k_batch'):
+        return
+
+    doc_freq = np.diff(np.asarray(bm25.indptr))
+    rare = [[bm25.vocab[t]] for t in np.flatnonzero((doc_freq >= 1) & (doc_freq <= 5))[:20]]
+    for tokens in [['lãnh_thổ']] + rare:
+        context = QueryContext.build(' '.join(tokens), lambda text: tokens, embedder)
+        results = domain.search(context.text, None, top_k=8, context=context)
+        expected = _full_argsort_scores(domain, tokens, context.query_matrix, top_k=8)
+        assert np.allclose([r['score'] for r in results], expected), tokens
+    manager.unload_all()
+
+
+def test_multi_query_merges_by_chunk_id():
+    manager = DomainManager(embedder=TextSeededEmbedder())
+    manager._global_checked = True
+    if 'hon_nhan' not in manager.domains:
+        return
+
+    # The same sub-question twice: every chunk is found twice but kept once, RRF doubles up
+    sub_questions = [{'question': 'điều kiện kết hôn', 'domain': 'hon_nhan'}] * 2
+    results = search_multi_query_with_domains(sub_questions, manager, tokenize, top_k=5)
+    ids = [r['id'] for r in results]
+    assert len(ids) == len(set(ids)) == 5
+    single = manager.search('điều kiện kết hôn', tokenize, top_k=5, domain_ids=['hon_nhan'])
+    assert ids == [r['id'] for r in single]
+    assert all(r['rrf_score'] > 0 for r in results)
+    manager.unload_all()
+
+
+if __name__ == "__main__":
+    test_bm25_top_k_batch_matches_single()
+    test_search_batch_matches_sequential()
+    test_multi_query_merges_by_chunk_id()
+    print("✅ Batch search tests passed")
@@ -0,0 +1,151 @@
+import sys
+import os
+import pickle
+import numpy as np
+from pathlib import Path
+from rank_bm25 import BM25Okapi
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.bm25 import SparseBM25
+
+CORPUS = [
+    ['điều', '1', 'phạm_vi', 'điều_chỉnh', 'luật', 'này', 'quy_định', 'về', 'đất_đai'],
+    ['người', 'lao_động', 'có', 'quyền', 'nghỉ', 'thai_sản', 'theo', 'quy_định'],
+    ['hợp_đồng', 'lao_động', 'là', 'sự', 'thỏa_thuận', 'giữa', 'người', 'lao_động'],
+    ['nam', 'từ', 'đủ', '20', 'tuổi', 'nữ', 'từ', 'đủ', '18', 'tuổi', 'kết_hôn'],
+    ['điều_kiện', 'kết_hôn', 'theo', 'quy_định', 'của', 'luật', 'này'],
+    ['quy_định', 'quy_định', 'quy_định', 'về', 'đấu_thầu'],
+]
+
+QUERIES = [
+    ['điều_kiện', 'kết_hôn'],
+    ['quy_định', 'về', 'lao_động'],
+    ['lao_động', 'lao_động', 'người'],   # repeated terms count twice
+    ['không_có_trong_từ_điển'],
+    [],
+]
+
+
+def _random_corpus(n_docs=300, vocab_size=400, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = [f"từ_{i}" for i in range(vocab_size)]
+    # Zipf-ish term distribution so some terms get negative idf (epsilon floor)
+    probs = 1.0 / np.arange(1, vocab_size + 1)
+    probs /= probs.sum()
+    return [list(rng.choice(vocab, size=rng.integers(5, 60), p=probs)) for _ in range(n_docs)]
+
+
+def test_scores_match_okapi():
+    okapi = BM25Okapi(CORPUS)
+    sparse = SparseBM25.from_okapi(okapi)
+    for query in QUERIES:
+        assert np.allclose(okapi.get_scores(query), sparse.get_scores(query), rtol=1e-5, atol=1e-6), query
+
+
+def test_scores_match_okapi_random_corpus():
+    corpus = _random_corpus()
+    okapi = BM25Okapi(corpus)
+    sparse = SparseBM25.from_okapi(okapi)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        query = list(rng.choice(corpus[rng.integers(len(corpus))], size=4))
+        expected = okapi.get_scores(query)
+        actual = sparse.get_scores(query)
+        assert np.allclose(expected, actual, rtol=1e-5, atol=1e-6)
+        assert np.argmax(expected) == np.argmax(actual) or np.isclose(expected.max(), actual[np.argmax(expected)])
+
+
+def test_token_stream_matches_okapi_index():
+    corpus = _random_corpus()
+    expected = SparseBM25.from_okapi(BM25Okapi(corpus))
+    streamed = SparseBM25.from_token_stream(iter(corpus))
+    assert streamed.vocab == expected.vocab
+    assert streamed.meta == expected.meta
+    for name in ('indptr', 'doc_ids', 'impacts'):
+        assert np.array_equal(getattr(streamed, name), getattr(expected, name)), name
+
+
+def test_save_load_mmap(tmp_path):
+    okapi = BM25Okapi(CORPUS)
+    SparseBM25.from_okapi(okapi).save(tmp_path / "bm25")
+
+    loaded = SparseBM25.load(tmp_path / "bm25", mmap=True)
+    assert isinstance(loaded.impacts, np.memmap)
+    assert loaded.corpus_size == len(CORPUS)
+    for query in QUERIES:
+        assert np.allclose(okapi.get_scores(query), loaded.get_scores(query), rtol=1e-5, atol=1e-6)
+
+
+def test_domain_parity():
+    """Parity on a real domain's bm25.pkl (skipped when data is absent)"""
+    bm25_path = Path(backend_dir) / "data/domains/hon_nhan/bm25.pkl"
+    tokens_path = Path(backend_dir) / "data/domains/hon_nhan/tokens.pkl"
+    if not bm25_path.exists() or not tokens_path.exists():
+        return
+
+    with open(bm25_path, 'rb') as f:
+        okapi = pickle.load(f)
+    with open(tokens_path, 'rb') as f:
+        tokenized_chunks = pickle.load(f)
+
+    sparse = SparseBM25.from_okapi(okapi)
+    for tokens in tokenized_chunks[:20]:
+        query = tokens[:6]
+        assert np.allclose(okapi.get_scores(query), sparse.get_scores(query), rtol=1e-5, atol=1e-5)
+
+
+def _exhaustive_top_k(sparse, query, k):
+    scores = sparse.get_scores(query)
+    matched = np.flatnonzero(scores)
+    return np.sort(scores[matched])[::-1][:k]
+
+
+def test_top_k_matches_exhaustive():
+    # Second corpus: so few words that the average idf is negative, making epsilon-floored
+    # impacts (and term upper bounds) negative
+    for corpus in (_random_corpus(n_docs=800, vocab_size=600, seed=3), _random_corpus(vocab_size=6, seed=5)):
+        sparse = SparseBM25.from_corpus(corpus)
+        rng = np.random.default_rng(4)
+        for _ in range(100):
+            query = list(rng.choice(corpus[rng.integers(len(corpus))], size=rng.integers(1, 8)))
+            for k in (1, 5, 16):
+                expected = _exhaustive_top_k(sparse, query, k)
+                for method in ('dense', 'maxscore'):
+                    ids, scores = sparse.top_k(query, k, method=method)
+                    assert np.allclose(scores, expected, rtol=1e-5), (query, k, method)
+                    # Returned scores are the true full scores of the returned docs
+                    assert np.allclose(sparse.get_scores(query)[ids], scores, rtol=1e-5)
+    assert np.asarray(sparse.term_max).min() < 0
+
+
+def test_top_k_drops_low_impact_terms():
+    sparse = SparseBM25.from_okapi(BM25Okapi(CORPUS))
+
+    ids, _ = sparse.top_k(['của', 'kết_hôn'], 3, stopwords={'của'})
+    kept_ids, _ = sparse.top_k(['kết_hôn'], 3)
+    assert list(ids) == list(kept_ids)
+
+    # 'quy_định' appears in 4/6 documents
+    assert sparse.select_terms(['quy_định', 'đấu_thầu'], max_df_ratio=0.5) == [(sparse.term_to_id['đấu_thầu'], 1)]
+    # Never drop every term
+    assert len(sparse.select_terms(['quy_định'], max_df_ratio=0.5)) == 1
+
+    ids, scores = sparse.top_k(['không_có_trong_từ_điển'], 5)
+    assert len(ids) == 0 and len(scores) == 0
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_scores_match_okapi()
+    test_scores_match_okapi_random_corpus()
+    with tempfile.TemporaryDirectory() as d:
+        test_save_load_mmap(Path(d))
+    test_domain_parity()
+    test_top_k_matches_exhaustive()
+    test_top_k_drops_low_impact_terms()
+    print("✅ SparseBM25 matches BM25Okapi")
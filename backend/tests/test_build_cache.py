@@ -0,0 +1,108 @@
+import sys
+import os
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.build_cache import BuildCache
+
+
+class CountingEncoder:
+    """Vector = [len(text), first char code]; records the texts it had to encode"""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[len(t), ord(t[0])] for t in texts], dtype='float32')
+
+
+def test_only_new_texts_are_processed(tmp_path):
+    texts = ['điều 1 luật cũ', 'điều 2', 'điều 3 luật cũ']
+    encoder = CountingEncoder()
+    cache = BuildCache(tmp_path)
+
+    vectors, encoded = cache.embeddings(texts, encoder, 'model-a')
+    tokens, tokenized = cache.tokens(texts, str.split, 'tok-a')
+    assert encoded == 3 and tokenized == 3
+    cache.save()
+
+    # Amendment: one chunk changed, one added, one duplicated
+    amended = ['điều 1 luật cũ', 'điều 2 sửa đổi', 'điều 3 luật cũ', 'điều 4 mới', 'điều 4 mới']
+    reloaded = BuildCache(tmp_path)
+    vectors, encoded = reloaded.embeddings(amended, encoder, 'model-a')
+    tokens, tokenized = reloaded.tokens(amended, str.split, 'tok-a')
+    assert encoded == 2 and tokenized == 2
+    assert encoder.seen[3:] == ['điều 2 sửa đổi', 'điều 4 mới']
+    assert vectors.tolist() == [[len(t), ord(t[0])] for t in amended]
+    assert tokens == [t.split() for t in amended]
+
+    # Another model id shares nothing
+    _, encoded = reloaded.embeddings(amended, encoder, 'model-b@onnx')
+    assert encoded == 4
+    reloaded.save()
+    assert BuildCache(tmp_path).embeddings(amended, encoder, 'model-a')[1] == 0
+    assert not list(tmp_path.glob('embeddings/*/pending.*'))
+
+
+def test_prune_drops_unreferenced_entries(tmp_path):
+    from utils.build_cache import content_hash
+
+    old = ['điều 1', 'điều 2 cũ', 'điều 3']
+    cache = BuildCache(tmp_path)
+    cache.embeddings(old, CountingEncoder(), 'model-a')
+    cache.tokens(old, str.split, 'tok-a')
+    cache.save()
+
+    # Amendment replaced điều 2; the new text is cached but not saved yet
+    current = ['điều 1', 'điều 2 mới', 'điều 3']
+    cache.embeddings(current, CountingEncoder(), 'model-a')
+    removed = cache.prune(content_hash(text) for text in current)
+    assert removed == {'tokens': 1, 'embeddings': 1}
+
+    reloaded = BuildCache(tmp_path)
+    assert reloaded.tokens(old, str.split, 'tok-a')[1] == 1
+    encoder = CountingEncoder()
+    vectors, encoded = reloaded.embeddings(current, encoder, 'model-a')
+    assert encoded == 0
+    assert vectors.tolist() == [[len(t), ord(t[0])] for t in current]
+    assert reloaded.embeddings(old, encoder, 'model-a')[1] == 1
+    assert BuildCache(tmp_path).prune(content_hash(text) for text in current + old) == {'tokens': 0, 'embeddings': 0}
+
+
+def _save_worker(root, worker, rounds):
+    """One build process: each round caches a few new texts and saves"""
+    cache = BuildCache(root)
+    for i in range(rounds):
+        texts = [f'{worker}-{i}-{j}' for j in range(3)]
+        cache.embeddings(texts, CountingEncoder(), 'model-a')
+        cache.tokens(texts, str.split, 'tok-a')
+        cache.save()
+
+
+def test_concurrent_saves_keep_every_entry(tmp_path):
+    import multiprocessing
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_save_worker, args=(str(tmp_path), w, 5)) for w in 'abc']
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    texts = [f'{w}-{i}-{j}' for w in 'abc' for i in range(5) for j in range(3)]
+    cache = BuildCache(tmp_path)
+    vectors, encoded = cache.embeddings(texts, CountingEncoder(), 'model-a')
+    assert encoded == 0
+    assert vectors.tolist() == [[len(t), ord(t[0])] for t in texts]
+    assert cache.tokens(texts, str.split, 'tok-a')[1] == 0
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
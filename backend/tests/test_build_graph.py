@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.build_graph import BuildGraph, Stage
+
+
+def _graph(root, params, runs):
+    """source.txt → upper.txt (intermediate) → count.txt; source.txt → length.txt"""
+    graph = None
+
+    def step(name, output, fn):
+        def run():
+            runs.append(name)
+            (root / output).write_text(fn(), encoding='utf-8')
+        return run
+
+    stages = [
+        Stage('upper', lambda: {'src': graph.hash_file('source.txt')}, ['upper.txt'],
+              step('upper', 'upper.txt', lambda: (root / 'source.txt').read_text(encoding='utf-8').upper()),
+              intermediate=True),
+        Stage('count', lambda: {'upper': graph.hash_file('upper.txt'), 'mode': params['mode']}, ['count.txt'],
+              step('count', 'count.txt', lambda: str(len((root / 'upper.txt').read_text(encoding='utf-8').split()))),
+              deps=['upper']),
+        Stage('length', lambda: {'src': graph.hash_file('source.txt')}, ['length.txt'],
+              step('length', 'length.txt', lambda: str(len((root / 'source.txt').read_text(encoding='utf-8')))),
+              deps=[]),
+    ]
+    graph = BuildGraph(root, stages)
+    return graph
+
+
+def test_only_stale_stages_rerun(tmp_path):
+    (tmp_path / 'source.txt').write_text('điều một', encoding='utf-8')
+    params, runs = {'mode': 'words'}, []
+
+    graph = _graph(tmp_path, params, runs)
+    assert [name for name, _ in graph.plan()] == ['upper', 'count', 'length']
+    graph.run()
+    assert runs == ['upper', 'count', 'length']
+    assert _graph(tmp_path, params, runs).plan() == []
+
+    # Parameter change: only the stage that uses it
+    params['mode'] = 'tokens'
+    runs.clear()
+    _graph(tmp_path, params, runs).run()
+    assert runs == ['count']
+
+    # Same words, different case: upper.txt is identical → count stays fresh
+    (tmp_path / 'source.txt').write_text('ĐIỀU một', encoding='utf-8')
+    runs.clear()
+    graph = _graph(tmp_path, params, runs)
+    assert graph.plan() == [('upper', 'inputs changed'), ('count', 'after upper'), ('length', 'inputs changed')]
+    graph.run()
+    assert runs == ['upper', 'length']
+
+    # Missing regular output → rerun; missing intermediate output alone → nothing
+    (tmp_path / 'length.txt').unlink()
+    (tmp_path / 'upper.txt').unlink()
+    runs.clear()
+    graph = _graph(tmp_path, params, runs)
+    assert graph.plan() == [('length', 'missing length.txt')]
+    graph.run()
+    assert runs == ['length']
+
+    # ...unless a dependent stage has to run
+    params['mode'] = 'chars'
+    runs.clear()
+    graph = _graph(tmp_path, params, runs)
+    assert graph.plan() == [('upper', 'needed by count'), ('count', 'inputs changed')]
+    graph.run()
+    assert runs == ['upper', 'count']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
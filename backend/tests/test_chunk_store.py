@@ -0,0 +1,87 @@
+import sys
+import os
+import json
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.chunk_store import ChunkStore, build_chunk_offsets, write_chunk_offsets, offsets_path_for
+
+
+def _write_chunks(path, n):
+    chunks = [{"id": f"test_{i}", "content": f"Điều {i}. Nội dung {'x' * i}"} for i in range(n)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+    return chunks
+
+
+def test_offsets_match_lines(tmp_path):
+    chunks_path = tmp_path / "chunks.jsonl"
+    chunks = _write_chunks(chunks_path, 50)
+
+    offsets = write_chunk_offsets(chunks_path)
+    assert offsets_path_for(chunks_path).exists()
+    assert len(offsets) == len(chunks) + 1
+    assert int(offsets[-1]) == chunks_path.stat().st_size
+
+    store = ChunkStore(chunks_path)
+    assert len(store) == len(chunks)
+    assert store.get(0) == chunks[0]
+    assert store.get(49) == chunks[49]
+
+    fetched = store.get_many([42, 3, 42, 999])
+    assert sorted(fetched) == [3, 42]
+    assert fetched[42] == chunks[42]
+    store.close()
+
+
+def test_fallback_builds_missing_offsets(tmp_path):
+    chunks_path = tmp_path / "chunks.jsonl"
+    chunks = _write_chunks(chunks_path, 10)
+
+    store = ChunkStore(chunks_path)
+    assert store.get(7) == chunks[7]
+    # Offsets persisted on first load
+    assert offsets_path_for(chunks_path).exists()
+    store.close()
+
+
+def test_stale_offsets_are_rebuilt(tmp_path):
+    chunks_path = tmp_path / "chunks.jsonl"
+    _write_chunks(chunks_path, 5)
+    write_chunk_offsets(chunks_path)
+
+    # Rewrite chunks without refreshing the sidecar
+    chunks = _write_chunks(chunks_path, 8)
+    store = ChunkStore(chunks_path)
+    assert len(store) == 8
+    assert store.get(7) == chunks[7]
+    assert np.array_equal(np.load(offsets_path_for(chunks_path)), build_chunk_offsets(chunks_path))
+    store.close()
+
+
+def test_out_of_range(tmp_path):
+    chunks_path = tmp_path / "chunks.jsonl"
+    _write_chunks(chunks_path, 3)
+    store = ChunkStore(chunks_path)
+    try:
+        store.get(3)
+        assert False, "Expected IndexError"
+    except IndexError:
+        pass
+    store.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in [test_offsets_match_lines, test_fallback_builds_missing_offsets,
+                 test_stale_offsets_are_rebuilt, test_out_of_range]:
+        with tempfile.TemporaryDirectory() as d:
+            test(Path(d))
+            print(f"✅ {test.__name__}")
@@ -0,0 +1,146 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.domain import Domain
+
+
+class SlowReader:
+    """Replaces Domain._read_indices: slow, counts disk reads"""
+
+    def __init__(self, delay=0.05, fail_first=False):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.fail_first and call == 1:
+            raise OSError("disk read failed")
+        return object(), object()
+
+
+def _domain(reader):
+    domain = Domain('lao_dong', MagicMock())
+    domain._read_indices = reader
+    return domain
+
+
+def test_concurrent_threads_load_once():
+    reader = SlowReader()
+    domain = _domain(reader)
+
+    threads = [threading.Thread(target=domain.load_indices) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert reader.calls == 1
+    assert domain.is_loaded
+    assert domain._load_future is None
+
+
+def test_concurrent_coroutines_and_threads_load_once():
+    reader = SlowReader()
+    domain = _domain(reader)
+
+    async def main():
+        thread = threading.Thread(target=domain.load_indices)
+        thread.start()
+        await asyncio.gather(*(domain.load_indices_async() for _ in range(16)))
+        thread.join()
+
+    asyncio.run(main())
+    assert reader.calls == 1
+    assert domain.is_loaded
+
+
+def test_failed_load_is_shared_then_retried():
+    reader = SlowReader(fail_first=True)
+    domain = _domain(reader)
+    errors = []
+
+    def load():
+        try:
+            domain.load_indices()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every waiter saw the leader's error; nothing was published
+    assert reader.calls == 1
+    assert len(errors) == 8
+    assert not domain.is_loaded
+
+    # Next caller starts a fresh load
+    domain.load_indices()
+    assert reader.calls == 2
+    assert domain.is_loaded
+
+
+def test_unload_during_use_keeps_references():
+    reader = SlowReader(delay=0)
+    domain = _domain(reader)
+
+    bm25_index, faiss_index, chunk_store, chunks_cache = domain._acquire_indices()
+    domain.unload()
+    assert bm25_index is not None and faiss_index is not None
+    assert not domain.is_loaded
+
+    # The in-flight search reads through its own store and fills the discarded cache
+    chunks = domain.get_chunk_map([0, 1], handles=(chunk_store, chunks_cache))
+    assert sorted(chunks) == [0, 1]
+    assert sorted(chunks_cache) == [0, 1]
+    assert domain._chunk_store is None
+    assert domain._chunks_cache == {}
+
+    # Reload after eviction
+    domain._acquire_indices()
+    assert reader.calls == 2
+
+
+def test_chunk_store_survives_concurrent_unload():
+    domain = _domain(SlowReader(delay=0))
+    stop = threading.Event()
+
+    def evict():
+        while not stop.is_set():
+            domain.unload()
+
+    thread = threading.Thread(target=evict)
+    thread.start()
+    try:
+        for i in range(200):
+            assert domain.chunk_store is not None
+            assert 0 in domain.get_chunk_map([0, i % 2])
+    finally:
+        stop.set()
+        thread.join()
+
+
+if __name__ == "__main__":
+    test_concurrent_threads_load_once()
+    test_concurrent_coroutines_and_threads_load_once()
+    test_failed_load_is_shared_then_retried()
+    test_unload_during_use_keeps_references()
+    test_chunk_store_survives_concurrent_unload()
+    print("✅ Domain loading is single-flight")
@@ -0,0 +1,73 @@
+import sys
+import os
+import importlib.util
+import numpy as np
+from pathlib import Path
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.embedding import EMBEDDING_BACKENDS, OnnxEmbedder, load_embedding_model, load_sentence_transformer
+
+TEXTS = ['điều kiện kết hôn', 'quyền và nghĩa vụ của người lao động theo luật này', 'thuế', 'hợp đồng đất đai']
+
+
+def _tiny_model(model_dir: Path) -> str:
+    """2-layer BERT with a toy vocabulary saved locally (no download)"""
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    words = sorted(set(' '.join(TEXTS).split()))
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words
+    (model_dir / 'vocab.txt').write_text('\n'.join(vocab), encoding='utf-8')
+    BertTokenizerFast(vocab_file=str(model_dir / 'vocab.txt'), do_lower_case=True).save_pretrained(model_dir)
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2,
+                        num_attention_heads=4, intermediate_size=128)
+    BertModel(config).save_pretrained(model_dir)
+    return str(model_dir)
+
+
+def _cosines(a, b):
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def test_backends_agree_with_fp32(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.EMBEDDING_ONNX_DIR', str(tmp_path / 'onnx'))
+    model_name = _tiny_model(tmp_path)
+    reference = load_sentence_transformer(model_name).encode(TEXTS, convert_to_numpy=True)
+
+    backends = ['torch_int8']
+    if importlib.util.find_spec('onnxruntime') and importlib.util.find_spec('onnx'):
+        backends += ['onnx', 'onnx_int8']
+
+    for backend in backends:
+        embedder = load_embedding_model(backend, model_name)
+        vectors = embedder.encode(TEXTS, convert_to_numpy=True)
+        assert vectors.shape == reference.shape
+        assert _cosines(vectors, reference).min() > 0.99, backend
+        assert embedder.encode(TEXTS[0], convert_to_numpy=True).shape == reference.shape[1:]
+
+    if 'onnx' in backends:
+        # Exported graph is reused, not re-exported
+        onnx = load_embedding_model('onnx', model_name)
+        assert isinstance(onnx, OnnxEmbedder)
+        assert onnx.onnx_path.exists()
+        np.testing.assert_allclose(onnx.encode(TEXTS, batch_size=1), onnx.encode(TEXTS, batch_size=4), atol=1e-5)
+
+
+def test_unknown_backend():
+    assert 'torch' in EMBEDDING_BACKENDS
+    try:
+        load_embedding_model('tensorrt')
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
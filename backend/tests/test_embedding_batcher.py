@@ -0,0 +1,84 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.embedding_batcher import MicroBatchEmbedder
+
+
+class SlowEmbedder:
+    """Vector = [len(text), first char code]; each model call costs 20 ms"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(len(texts))
+        time.sleep(0.02)
+        if self.fail_on in texts:
+            raise RuntimeError("model error")
+        return np.array([[len(t), ord(t[0])] for t in texts], dtype='float32')
+
+
+def test_threads_share_batches():
+    embedder = SlowEmbedder()
+    batcher = MicroBatchEmbedder(embedder, max_batch_size=8, max_wait_ms=5)
+    texts = [f"{chr(97 + i)} query {'x' * i}" for i in range(20)]
+    results = {}
+
+    def worker(text):
+        results[text] = batcher.encode([text], convert_to_numpy=True)[0]
+
+    threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for text in texts:
+        assert results[text].tolist() == [len(text), ord(text[0])]
+    assert len(embedder.calls) < len(texts)
+    assert max(embedder.calls) <= 8
+
+    stats = batcher.batch_stats()
+    assert stats['requests'] == len(texts)
+    assert sum(size * count for size, count in stats['batch_size_histogram'].items()) == len(texts)
+    assert stats['queue_depth'] == 0
+    batcher.close()
+
+
+def test_async_callers_and_errors():
+    embedder = SlowEmbedder(fail_on='bad')
+    batcher = MicroBatchEmbedder(embedder, max_batch_size=16, max_wait_ms=5)
+
+    async def main():
+        vectors = await asyncio.gather(*[batcher.encode_async(f"q{i}") for i in range(6)])
+        assert [v[0] for v in vectors] == [2] * 6
+        try:
+            await batcher.encode_async('bad')
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert embedder.calls[0] == 6  # all six coroutines in one model call
+
+    # Large calls bypass the queue
+    batcher.encode([f"t{i}" for i in range(16)])
+    assert embedder.calls[-1] == 16
+    batcher.close()
+
+
+if __name__ == "__main__":
+    test_threads_share_batches()
+    test_async_callers_and_errors()
+    print("✅ Embedding batcher tests passed")
@@ -0,0 +1,85 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.embedding_cache import EmbeddingCache, CachedEmbedder
+
+
+class CountingEmbedder:
+    """Deterministic fake model: vector depends only on the text"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        self.encoded.extend(texts)
+        rows = [np.random.default_rng(sum(map(ord, t))).standard_normal(8) for t in texts]
+        return np.array(rows, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+def test_hits_skip_the_model():
+    model = CountingEmbedder()
+    embedder = CachedEmbedder(model, 'model-a', EmbeddingCache(max_size=10))
+
+    first = embedder.encode(['điều kiện kết hôn'], convert_to_numpy=True)
+    again = embedder.encode(['  điều kiện   kết hôn '], convert_to_numpy=True)  # same normalized key
+    assert np.array_equal(first, again)
+    assert model.encoded == ['điều kiện kết hôn']
+
+    # Mixed batch: only misses go to the model, once each, order preserved
+    batch = embedder.encode(['a', 'điều kiện kết hôn', 'b', 'a'])
+    assert model.encoded[1:] == ['a', 'b']
+    assert batch.shape == (4, 8)
+    assert np.array_equal(batch[0], batch[3]) and np.array_equal(batch[1], first[0])
+
+    stats = embedder.cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 4
+    assert embedder.get_sentence_embedding_dimension() == 8  # passthrough
+
+
+def test_lru_eviction_and_ttl():
+    cache = EmbeddingCache(max_size=2)
+    cache.put('a', np.ones(3))
+    cache.put('b', np.ones(3))
+    cache.get('a')              # a is now most recent
+    cache.put('c', np.ones(3))  # evicts b
+    assert cache.get('b') is None and cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+
+    ttl_cache = EmbeddingCache(max_size=10, ttl_seconds=0.05)
+    ttl_cache.put('x', np.ones(3))
+    assert ttl_cache.get('x') is not None
+    time.sleep(0.06)
+    assert ttl_cache.get('x') is None
+    assert ttl_cache.stats()['expirations'] == 1
+
+
+def test_model_id_and_flags_in_key():
+    cache = EmbeddingCache(max_size=10)
+    model = CountingEmbedder()
+    CachedEmbedder(model, 'model-a', cache).encode(['q'])
+    CachedEmbedder(model, 'model-b', cache).encode(['q'])
+    CachedEmbedder(model, 'model-a', cache).encode(['q'], normalize_embeddings=True)
+    assert len(model.encoded) == 3
+
+    # Cached vectors can't be modified through a returned array
+    result = CachedEmbedder(model, 'model-a', cache).encode(['q'])
+    result[0, 0] = 123.0
+    assert CachedEmbedder(model, 'model-a', cache).encode(['q'])[0, 0] != 123.0
+
+
+if __name__ == "__main__":
+    test_hits_skip_the_model()
+    test_lru_eviction_and_ttl()
+    test_model_id_and_flags_in_key()
+    print("✅ Embedding cache tests passed")
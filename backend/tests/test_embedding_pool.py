@@ -0,0 +1,59 @@
+import sys
+import os
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.embedding_pool import CorpusEncoder, length_buckets, padding_ratio
+from tests.test_embedding_backends import TEXTS, _tiny_model
+
+
+class LengthEmbedder:
+    """Vector = [word count, first char code]; records the batches it was given"""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append([len(t.split()) for t in texts])
+        return np.array([[len(t.split()), ord(t[0])] for t in texts], dtype='float32')
+
+
+def test_buckets_reduce_padding_and_keep_order():
+    texts = [chr(97 + i % 26) + ' w' * ((i * 7) % 13) for i in range(40)]
+    embedder = LengthEmbedder()
+    encoder = CorpusEncoder(workers=1, batch_size=8, embedder=embedder)
+    vectors = encoder.encode(texts)
+
+    assert vectors.tolist() == [[len(t.split()), ord(t[0])] for t in texts]
+    # Each batch covers a contiguous length range
+    assert all(max(batch) <= min(later) for batch, later in zip(embedder.batches, embedder.batches[1:]))
+    stats = encoder.last_stats
+    assert stats['batches'] == 5 and stats['chunks'] == 40
+    assert stats['padding_ratio'] < stats['unsorted_padding_ratio']
+
+    lengths = [3, 1, 2, 1]
+    buckets = length_buckets(lengths, 2)
+    assert [b.tolist() for b in buckets] == [[1, 3], [2, 0]]
+    assert padding_ratio(lengths, buckets) == 1 - 7 / 8
+
+
+def test_process_pool_matches_in_process(tmp_path):
+    model_name = _tiny_model(tmp_path)
+    texts = [TEXTS[i % len(TEXTS)] + ' thuế' * (i % 5) for i in range(24)]
+    reference = CorpusEncoder(workers=1, batch_size=4, model_name=model_name).encode(texts)
+
+    with CorpusEncoder(workers=2, batch_size=4, backend='torch', model_name=model_name, buckets_per_task=1) as encoder:
+        vectors = encoder.encode(texts)
+        again = encoder.encode(texts[:6])  # pool (and the models) reused
+    np.testing.assert_allclose(vectors, reference, atol=1e-5)
+    np.testing.assert_allclose(again, reference[:6], atol=1e-5)
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,93 @@
+import sys
+import os
+import time
+from unittest.mock import MagicMock
+import pytest
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import config
+from core.domain_manager import DomainManager
+from core.query_context import QueryContext
+
+
+def _manager(delays, failing=()):
+    """Domains whose search sleeps (releases the GIL like FAISS/numpy) then returns one hit"""
+    manager = DomainManager(embedder=MagicMock())
+    manager._global_checked = True  # per-domain path (no global index)
+    for domain_id, domain in manager.domains.items():
+        def search(query, tokenize_fn, top_k=8, context=None, domain_id=domain_id):
+            time.sleep(delays.get(domain_id, 0.0))
+            if domain_id in failing:
+                raise RuntimeError(f"{domain_id} is broken")
+            return [{'id': f'{domain_id}_0', 'score': delays.get(domain_id, 0.0), 'domain_id': domain_id}]
+        domain.search = search
+        domain.memory_footprint = lambda: {'heap': 0, 'mapped': 0, 'total': 0}
+    return manager
+
+
+def _context():
+    return QueryContext('q', 'q', ['q'], [0.0, 0.0])
+
+
+def test_fanout_latency_is_slowest_domain(monkeypatch):
+    monkeypatch.setattr(config, 'SEARCH_FANOUT_WORKERS', 4)
+    monkeypatch.setattr(config, 'SEARCH_DOMAIN_TIMEOUT_SECONDS', 5.0)
+    delays = {'lao_dong': 0.3, 'dat_dai': 0.3, 'hon_nhan': 0.3, 'hinh_su': 0.3}
+    manager = _manager(delays)
+    if not set(delays) <= set(manager.domains):
+        return
+
+    start = time.time()
+    results = manager.search_multi_domain('q', list(delays), None, top_k=8, context=_context())
+    elapsed = time.time() - start
+    assert {r['domain_id'] for r in results} == set(delays)
+    assert elapsed < 0.9  # serial would take 1.2s
+    manager.unload_all()
+
+
+def test_fanout_partial_results_on_timeout_and_failure(monkeypatch):
+    monkeypatch.setattr(config, 'SEARCH_FANOUT_WORKERS', 4)
+    monkeypatch.setattr(config, 'SEARCH_DOMAIN_TIMEOUT_SECONDS', 0.3)
+    delays = {'lao_dong': 0.05, 'dat_dai': 1.0, 'hon_nhan': 0.05}
+    manager = _manager(delays, failing={'hon_nhan'})
+    if not set(delays) <= set(manager.domains):
+        return
+
+    start = time.time()
+    results = manager.search_multi_domain('q', list(delays), None, top_k=8, context=_context())
+    assert time.time() - start < 0.8
+    assert [r['domain_id'] for r in results] == ['lao_dong']
+    stats = manager.fanout_stats()
+    assert stats['timeouts'] == {'dat_dai': 1}
+    assert stats['failures'] == {'hon_nhan': 1}
+    manager.unload_all()
+
+
+def test_fanout_deadline_excludes_queue_wait(monkeypatch):
+    """A request queued behind another one on the shared pool still gets its full timeout"""
+    import threading
+    monkeypatch.setattr(config, 'SEARCH_FANOUT_WORKERS', 2)
+    monkeypatch.setattr(config, 'SEARCH_DOMAIN_TIMEOUT_SECONDS', 1.0)
+    delays = {'lao_dong': 0.8, 'dat_dai': 0.8, 'hon_nhan': 0.4, 'hinh_su': 0.4}
+    manager = _manager(delays)
+    if not set(delays) <= set(manager.domains):
+        pytest.skip("domain registry lacks the test domains")
+
+    search = lambda domain: domain.search('q', None)
+    busy = threading.Thread(target=manager.fan_out, args=(['lao_dong', 'dat_dai'], search))
+    busy.start()
+    time.sleep(0.05)
+    results = manager.fan_out(['hon_nhan', 'hinh_su'], search)  # queued ~0.75s, then 0.4s of search
+    busy.join()
+    assert set(results) == {'hon_nhan', 'hinh_su'}
+    assert manager.fanout_stats()['timeouts'] == {}
+    manager.unload_all()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
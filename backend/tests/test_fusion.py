@@ -0,0 +1,100 @@
+import sys
+import os
+import numpy as np
+from collections import defaultdict
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.fusion import fuse_scores, hybrid_fuse, rrf_fuse, rrf_fuse_keys, sparse_top_k_window, top_k_positions
+from core.search import reciprocal_rank_fusion
+from config import BM25_WEIGHT, FAISS_WEIGHT
+
+
+def dict_hybrid(bm25_ids, bm25_scores, faiss_distances, faiss_ids):
+    """Previous Domain.search merge (reference)"""
+    combined = {}
+    bm25_range = bm25_scores.max() - bm25_scores.min() if len(bm25_ids) else 0
+    if bm25_range > 0:
+        for idx, score in zip(bm25_ids, bm25_scores):
+            combined[int(idx)] = (score - bm25_scores.min()) / bm25_range * BM25_WEIGHT
+    for idx, distance in zip(faiss_ids, faiss_distances):
+        if idx < 0:
+            break
+        combined[int(idx)] = combined.get(int(idx), 0) + 1 / (1 + distance) * FAISS_WEIGHT
+    return sorted(combined.items(), key=lambda x: x[1], reverse=True)
+
+
+def dict_rrf(rank_lists, weights, k=60):
+    scores = defaultdict(float)
+    for rank_list, weight in zip(rank_lists, weights):
+        for rank, idx in enumerate(rank_list):
+            scores[idx] += weight * (1 / (k + rank + 1))
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def test_top_k_positions_stable():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 0.5, 3.0])
+    assert top_k_positions(scores, 2).tolist() == [1, 3]
+    assert top_k_positions(scores, 4).tolist() == [1, 3, 5, 2]
+    assert top_k_positions(scores).tolist() == np.argsort(-scores, kind='stable').tolist()
+
+
+def test_hybrid_matches_dict_merge():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        bm25_ids = rng.choice(200, size=16, replace=False)
+        bm25_scores = np.sort(rng.random(16) * 10)[::-1]
+        faiss_ids = rng.choice(200, size=16, replace=False)
+        faiss_ids[12:] = -1  # ANN padding
+        faiss_distances = np.sort(rng.random(16).astype('float32') * 5)
+
+        expected = dict_hybrid(bm25_ids, bm25_scores, faiss_distances, faiss_ids)[:8]
+        ids, scores = hybrid_fuse(bm25_ids, bm25_scores, faiss_distances, faiss_ids, top_k=8)
+        assert ids.tolist() == [idx for idx, _ in expected]
+        assert np.allclose(scores, [score for _, score in expected])
+
+    # Constant BM25 list carries no signal (dropped, as before)
+    ids, _ = hybrid_fuse(np.array([5, 6]), np.array([1.0, 1.0]), np.array([0.5]), np.array([7]))
+    assert ids.tolist() == [7]
+
+    # Sparse top-k with fewer hits than k: unmatched docs are the 0 floor, so a single match counts
+    ids, scores = hybrid_fuse(np.array([5]), np.array([2.0]), np.array([0.5]), np.array([7]), bm25_k=4, bm25_docs=100)
+    assert ids.tolist() == [5, 7]
+    # Negative hits fall below the unmatched zeros (out of the window) unless zeros run out
+    assert sparse_top_k_window(np.array([3.0, 1.0, -1.0]), 4, 100) == (2, 0.0)
+    assert sparse_top_k_window(np.array([3.0, 1.0, -1.0]), 4, 4) == (3, 0.0)
+    assert sparse_top_k_window(np.array([3.0, 1.0, -1.0]), 4, 3) == (3, None)
+    assert sparse_top_k_window(np.array([3.0, 2.0]), 2, 100) == (2, None)
+
+
+def test_rrf_matches_dict_loop():
+    rng = np.random.default_rng(1)
+    lists = [rng.choice(100, size=20, replace=False) for _ in range(4)]
+    weights = [0.4, 0.6, 0.4, 0.6]
+    expected = dict_rrf(lists, weights)
+    ids, scores = rrf_fuse(lists, weights)
+    assert np.allclose(scores, [s for _, s in expected])
+    assert set(ids.tolist()) == {idx for idx, _ in expected}
+
+    keyed = reciprocal_rank_fusion([[('a', 1), ('b', 2)], [('b', 2), ('c', 3)]])
+    assert list(keyed)[0] == ('b', 2)
+    assert np.isclose(keyed[('b', 2)], 1 / 62 + 1 / 61)
+
+
+def test_zscore_fusion():
+    ids, scores = fuse_scores([np.array([1, 2, 3])], [np.array([1.0, 2.0, 3.0])], normalize='zscore')
+    assert ids.tolist() == [3, 2, 1]
+    assert np.isclose(scores.sum(), 0.0)
+    assert rrf_fuse_keys([]) == {}
+
+
+if __name__ == "__main__":
+    test_top_k_positions_stable()
+    test_hybrid_matches_dict_merge()
+    test_rrf_matches_dict_loop()
+    test_zscore_fusion()
+    print("✅ Fusion tests passed")
@@ -0,0 +1,86 @@
+import sys
+import os
+import json
+import pickle
+import faiss
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.global_index import GlobalIndex, build_global_index
+from core.query_context import QueryContext
+
+WORDS = ['lao_động', 'hợp_đồng', 'kết_hôn', 'ly_hôn', 'đất_đai', 'thuế', 'thu_nhập', 'quyền', 'nghĩa_vụ', 'điều']
+
+
+def _make_domain(root, domain_id, n, seed):
+    rng = np.random.default_rng(seed)
+    domain_dir = root / domain_id
+    domain_dir.mkdir(parents=True)
+    tokens = [list(rng.choice(WORDS, size=8)) + [domain_id] for _ in range(n)]
+    vectors = rng.standard_normal((n, 16)).astype('float32')
+
+    index = faiss.IndexFlatL2(16)
+    index.add(vectors)
+    faiss.write_index(index, str(domain_dir / "faiss.index"))
+    with open(domain_dir / "tokens.pkl", 'wb') as f:
+        pickle.dump(tokens, f)
+    with open(domain_dir / "chunks.jsonl", 'w', encoding='utf-8') as f:
+        for i, t in enumerate(tokens):
+            f.write(json.dumps({'id': f"{domain_id}_{i}", 'content': ' '.join(t)}, ensure_ascii=False) + '\n')
+    with open(domain_dir / "metadata.json", 'w', encoding='utf-8') as f:
+        json.dump({'domain_id': domain_id, 'total_chunks': n}, f)
+    return vectors
+
+
+def test_global_search_matches_per_domain(tmp_path):
+    domains_root = tmp_path / "domains"
+    vectors = {d: _make_domain(domains_root, d, n, seed) for d, n, seed in [('a', 40, 1), ('b', 60, 2), ('c', 30, 3)]}
+    meta = build_global_index(['a', 'b', 'c'], domains_root=domains_root, out_dir=tmp_path / "global")
+    assert meta['total_chunks'] == 130
+
+    index = GlobalIndex.load(tmp_path / "global")
+    assert index.stale_domains(domains_root) == []
+    assert index.covers(['a', 'c']) and not index.covers(['z'])
+
+    query = vectors['b'][5] + 0.01
+    # Filtered to one domain: same vector neighbours as that domain's own index
+    hits = index.search(QueryContext("", "", [], query), top_k=5, domain_ids=['b'])
+    assert [d for d, _, _ in hits] == ['b'] * 5
+    own = faiss.IndexFlatL2(16)
+    own.add(vectors['b'])
+    _, expected = own.search(query.reshape(1, -1), 5)
+    assert [local for _, local, _ in hits] == list(expected[0])
+
+    # BM25 side respects the filter too
+    hits = index.search(QueryContext("", "", ['a', 'kết_hôn'], query), top_k=10, domain_ids=['a', 'c'])
+    assert hits and all(d in ('a', 'c') for d, _, _ in hits)
+
+    # Unfiltered: best vector match wins across domains
+    hits = index.search(QueryContext("", "", [], vectors['c'][7]), top_k=3)
+    assert hits[0][:2] == ('c', 7)
+
+
+def test_stale_domains_detected(tmp_path):
+    domains_root = tmp_path / "domains"
+    _make_domain(domains_root, 'a', 20, 1)
+    _make_domain(domains_root, 'b', 20, 2)
+    build_global_index(['a', 'b'], domains_root=domains_root, out_dir=tmp_path / "global")
+
+    with open(domains_root / 'b' / "chunks.jsonl", 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'id': 'b_new', 'content': 'mới'}) + '\n')
+    assert GlobalIndex.load(tmp_path / "global").stale_domains(domains_root) == ['b']
+    assert GlobalIndex.load(tmp_path / "missing") is None
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in [test_global_search_matches_per_domain, test_stale_domains_detected]:
+        with tempfile.TemporaryDirectory() as d:
+            test(Path(d))
+            print(f"✅ {test.__name__}")
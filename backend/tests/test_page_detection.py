@@ -2,6 +2,8 @@ import sys
 import os
 from pathlib import Path
 
+import pytest
+
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -32,5 +34,41 @@ def test_page_detection():
     else:
         print(f"❌ Unexpectedly found Article {article_num} on page {page}")
 
+def test_page_index_matches_scan():
+    """Build-time page index answers like the pypdf scan (skipped when data is absent)"""
+    import shutil
+    import tempfile
+    import core.pdf_utils as pdf_utils
+
+    source = Path(os.path.dirname(os.path.abspath(__file__))).parent / "data/domains/thue_tncn/pdfs/thue_tncn.pdf"
+    if not source.exists():
+        pytest.skip("thue_tncn.pdf not available")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = Path(tmp_dir) / "pdfs" / source.name
+        pdf_path.parent.mkdir()
+        shutil.copy(source, pdf_path)
+
+        scanned = {article: pdf_utils.find_article_location(str(pdf_path), article) for article in ("1", "5", "999")}
+        assert scanned["1"] is not None and scanned["999"] is None
+
+        index = pdf_utils.build_page_index(Path(tmp_dir), [pdf_path])
+        assert (Path(tmp_dir) / pdf_utils.PAGE_INDEX_NAME).exists()
+        articles = index['pdfs'][source.name]['articles']
+        assert {a: tuple(articles[a]) if a in articles else None for a in scanned} == scanned
+
+        # Lookups no longer scan the PDF
+        def no_scan(path, article_num):
+            raise AssertionError("scanned despite the page index")
+        scan = pdf_utils._scan_for_article
+        pdf_utils._scan_for_article = no_scan
+        pdf_utils._page_cache.clear()
+        try:
+            for article, location in scanned.items():
+                assert pdf_utils.find_article_location(str(pdf_path), article) == location
+            assert pdf_utils.find_article_page(str(pdf_path), "5") == scanned["5"][0]
+        finally:
+            pdf_utils._scan_for_article = scan
+
 if __name__ == "__main__":
     test_page_detection()
+    test_page_index_matches_scan()
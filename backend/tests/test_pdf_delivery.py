@@ -0,0 +1,60 @@
+import sys
+import os
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+PDF_URL = "/api/pdf-file/thue_tncn/thue_tncn.pdf"
+
+
+def test_raw_pdf_range_and_etag(monkeypatch):
+    """Raw PDF endpoint: content ETag, 304, Range / If-Range (skipped when data is absent)"""
+    monkeypatch.chdir(backend_dir)
+    pdf_path = Path("data/domains/thue_tncn/pdfs/thue_tncn.pdf")
+    if not pdf_path.exists():
+        pytest.skip("thue_tncn.pdf not available")
+    from fastapi.testclient import TestClient
+    import app as app_module
+    client = TestClient(app_module.app)
+    size = pdf_path.stat().st_size
+
+    full = client.get(PDF_URL)
+    assert full.status_code == 200 and len(full.content) == size
+    etag = full.headers["etag"]
+    assert not etag.startswith("W/")  # content sha1 from page_index.json
+    assert full.headers["accept-ranges"] == "bytes"
+    assert "max-age=" in full.headers["cache-control"]
+
+    # Revalidation: no body
+    assert client.get(PDF_URL, headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+    part = client.get(PDF_URL, headers={"Range": "bytes=100-199", "If-Range": etag})
+    assert part.status_code == 206
+    assert part.content == pdf_path.read_bytes()[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{size}"
+    # Changed file (If-Range mismatch): whole file
+    assert client.get(PDF_URL, headers={"Range": "bytes=0-9", "If-Range": '"stale"'}).status_code == 200
+
+    # Only PDFs inside data/domains
+    assert client.get("/api/pdf-file/thue_tncn/..%2F..%2F..%2Fdomain_registry.json").status_code == 404
+    assert client.get("/api/pdf-file/..%2F..%2F..%2Fdata/missing.pdf").status_code == 404
+
+
+def test_pdf_etag_without_page_index(tmp_path):
+    """PDFs the page index doesn't describe get a weak size/mtime tag (file not read)"""
+    from core.pdf_utils import pdf_etag
+    pdf_path = tmp_path / "pdfs" / "moi.pdf"
+    pdf_path.parent.mkdir()
+    pdf_path.write_bytes(b"%PDF-1.4 moi")
+    etag = pdf_etag(pdf_path)
+    assert etag.startswith('W/"') and etag == pdf_etag(pdf_path)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,37 @@
+import sys
+import os
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from scripts.pdf_to_json import PDFToJSONConverter
+
+
+def test_pool_and_page_cache_match_serial(tmp_path):
+    """Pool extraction and cached re-runs give the serial text (skipped when data is absent)"""
+    pdf_path = Path(backend_dir) / "data/domains/thue_tncn/pdfs/thue_tncn.pdf"
+    if not pdf_path.exists():
+        pytest.skip("thue_tncn.pdf not available")
+
+    serial = PDFToJSONConverter(workers=1, cache_dir=False).extract_text_with_tables(str(pdf_path))
+    assert '[BẢNG 1]' in serial
+
+    pooled = PDFToJSONConverter(workers=2, cache_dir=tmp_path)
+    assert pooled.extract_text_with_tables(str(pdf_path)) == serial
+    cached_pages = list(tmp_path.glob("*/*.json"))
+    assert len(cached_pages) == 19
+
+    # A re-run only reads the cache (pages are not re-extracted)
+    mtimes = {p: p.stat().st_mtime_ns for p in cached_pages}
+    assert pooled.extract_text_with_tables(str(pdf_path)) == serial
+    assert all(p.stat().st_mtime_ns == mtime for p, mtime in mtimes.items())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
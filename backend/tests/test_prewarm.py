@@ -0,0 +1,107 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.domain_manager import DomainManager
+
+
+def _manager(delay=0.2, failing=()):
+    manager = DomainManager(embedder=MagicMock())
+    for domain_id, domain in manager.domains.items():
+        def read(domain_id=domain_id):
+            time.sleep(delay)
+            if domain_id in failing:
+                raise OSError(f"cannot read {domain_id}")
+            return object(), object()
+        domain._read_indices = read
+        domain.memory_footprint = lambda: {'heap': 0, 'mapped': 0, 'total': 0}
+    return manager
+
+
+def test_resolve_targets():
+    manager = _manager()
+    assert manager.resolve_prewarm_targets('') == []
+    assert manager.resolve_prewarm_targets('all') == list(manager.domains)
+    assert manager.resolve_prewarm_targets('lao_dong, khong_ton_tai,lao_dong') == ['lao_dong']
+
+
+def test_prewarm_parallel_and_readiness():
+    manager = _manager(delay=0.2, failing={'dat_dai'})
+    targets = ['lao_dong', 'dat_dai', 'hon_nhan', 'hinh_su']
+    observed = {}
+
+    async def main():
+        task = asyncio.create_task(manager.prewarm(targets, max_workers=4))
+        await asyncio.sleep(0.05)
+        # Event loop stays responsive while loads run in worker threads
+        observed['during'] = manager.readiness()
+        start = time.time()
+        await task
+        observed['elapsed'] = time.time() - start
+
+    asyncio.run(main())
+
+    assert observed['during']['ready'] is False
+    assert set(observed['during']['in_progress']) == set(targets)
+    assert observed['elapsed'] < 0.6  # 4 × 0.2s loads ran concurrently
+
+    readiness = manager.readiness()
+    assert readiness['ready'] is True
+    assert set(readiness['warm']) == {'lao_dong', 'hon_nhan', 'hinh_su'}
+    assert 'dat_dai' in readiness['failed']
+    assert readiness['domains']['thue_tncn'] == 'lazy'
+
+    # Evicted after prewarm → no longer reported warm
+    manager.domains['lao_dong'].unload()
+    assert manager.readiness()['domains']['lao_dong'] == 'evicted'
+
+
+def test_query_during_prewarm_joins_load():
+    manager = _manager(delay=0.2)
+    domain = manager.domains['lao_dong']
+    calls = []
+    read = domain._read_indices
+    domain._read_indices = lambda: calls.append(1) or read()
+
+    async def main():
+        task = asyncio.create_task(manager.prewarm(['lao_dong'], max_workers=1))
+        await asyncio.sleep(0.05)
+        # A request thread hitting the domain mid-prewarm waits for the same load
+        thread = threading.Thread(target=domain.load_indices)
+        thread.start()
+        await task
+        thread.join()
+
+    asyncio.run(main())
+    assert len(calls) == 1
+
+
+def test_prewarm_parallel_loads_respect_budget():
+    manager = _manager(delay=0.2)
+    for domain in manager.domains.values():
+        domain.memory_footprint = lambda domain=domain: {'total': 100 if domain.is_loaded else 0}
+        domain.estimated_footprint = lambda: 100
+    manager.residency.budget_bytes = 250
+    targets = ['lao_dong', 'dat_dai', 'hon_nhan', 'hinh_su']
+
+    # All four workers start together: loads still in flight count against the budget
+    asyncio.run(manager.prewarm(targets, max_workers=4))
+    statuses = [manager.prewarm_status[domain_id] for domain_id in targets]
+    assert statuses.count('warm') == 3 and statuses.count('skipped') == 1
+
+
+if __name__ == "__main__":
+    test_resolve_targets()
+    test_prewarm_parallel_and_readiness()
+    test_query_during_prewarm_joins_load()
+    test_prewarm_parallel_loads_respect_budget()
+    print("✅ Prewarm tests passed")
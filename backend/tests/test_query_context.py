@@ -0,0 +1,74 @@
+import sys
+import os
+import unicodedata
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.query_context import QueryContext, normalize_query_text
+from core.bm25 import SparseBM25
+from core.domain_manager import DomainManager
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        rng = np.random.default_rng(len(texts[0]))
+        return rng.standard_normal((len(texts), 768)).astype('float32')
+
+
+class CountingTokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return text.lower().split()
+
+
+def test_normalize_query_text():
+    decomposed = 'kết  hôn\n'  # 'kết hôn' with combining marks
+    assert normalize_query_text(decomposed) == 'kết hôn'
+    assert normalize_query_text('  điều   kiện ') == 'điều kiện'
+
+
+def test_context_built_once():
+    embedder, tokenizer = CountingEmbedder(), CountingTokenizer()
+    context = QueryContext.build('  Điều kiện  kết hôn ', tokenizer, embedder)
+    assert context.normalized == 'Điều kiện kết hôn'
+    assert context.tokens == ['điều', 'kiện', 'kết', 'hôn']
+    assert context.query_matrix.shape == (1, 768)
+    assert np.isclose(np.linalg.norm(context.normalized_embedding), 1.0)
+
+    bm25 = SparseBM25.from_corpus([['điều', 'kiện'], ['kết', 'hôn'], ['khác']])
+    terms = context.bm25_terms(bm25)
+    assert context.bm25_terms(bm25) is terms
+    assert {bm25.vocab[t] for t, _ in terms} == {'điều', 'kiện', 'kết', 'hôn'}
+    assert embedder.calls == 1 and tokenizer.calls == 1
+
+
+def test_multi_domain_search_analyzes_once():
+    embedder, tokenizer = CountingEmbedder(), CountingTokenizer()
+    manager = DomainManager(embedder=embedder)
+    manager._global_checked = True  # per-domain path (no global index)
+    if not manager.domains:
+        return
+
+    manager.search_all_domains('quyền và nghĩa vụ của người lao động', tokenizer, top_k=3)
+    assert embedder.calls == 1
+    assert tokenizer.calls == 1
+    manager.unload_all()
+
+
+if __name__ == "__main__":
+    test_normalize_query_text()
+    test_context_built_once()
+    test_multi_domain_search_analyzes_once()
+    print("✅ QueryContext tests passed")
@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+import pickle
+from pathlib import Path
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import core.document_processor as document_processor
+from core.document_processor import iter_van_ban_phap_luat_json, xu_ly_van_ban_phap_luat_json
+from utils.stream_io import PickledListWriter, batched, iter_pickled_list
+
+DOCUMENT = {
+    'du_lieu': [
+        {'dieu_so': 1, 'tieu_de': 'Phạm vi điều chỉnh', 'mo_ta': 'Luật này quy định về "đất đai".'},
+        {'dieu_so': '', 'tieu_de': 'bỏ qua'},
+        {'dieu_so': '2a', 'noi_dung_hien_hanh': 'Giải thích từ ngữ', 'khoan': [
+            {'khoan_so': 1, 'noi_dung': 'Khoản một', 'diem': [{'diem_so': 'a', 'noi_dung': 'Điểm a'}]},
+            {'khoan_so': 2, 'noi_dung': 'Khoản hai', 'nguon_sua_doi': 'Luật 90/2025'},
+        ]},
+        {'dieu_so': 3.5, 'tieu_de': 'Số thực', 'khoan': []},
+    ],
+    'nguon': 'Luật Đất đai 2024',  # after du_lieu: needs the second pass
+    'ghi_chu': [1, {'x': None}, True],
+}
+
+
+def test_streamed_chunks_match_json_load(tmp_path, monkeypatch):
+    path = tmp_path / 'luat_dat_dai_hopnhat.json'
+    path.write_text(json.dumps(DOCUMENT, ensure_ascii=False, indent=1), encoding='utf-8')
+    expected, nguon = xu_ly_van_ban_phap_luat_json(str(path))
+    assert nguon == 'Luật Đất đai 2024' and len(expected) == 4
+
+    # Tiny reads: values and numbers split across buffer refills
+    monkeypatch.setattr(document_processor, 'STREAM_READ_SIZE', 3)
+    assert list(iter_van_ban_phap_luat_json(str(path))) == expected
+
+    # Numbers cut after '.', 'e' or a sign by the read boundary
+    numbers = tmp_path / 'luat_so_hopnhat.json'
+    numbers.write_text(json.dumps({'so': 12.5, 'mu': -1.5e-3, 'nguon': 'L', **DOCUMENT}, ensure_ascii=False),
+                       encoding='utf-8')
+    expected = xu_ly_van_ban_phap_luat_json(str(numbers))[0]
+    for read_size in (1, 2, 5, 10):
+        monkeypatch.setattr(document_processor, 'STREAM_READ_SIZE', read_size)
+        assert list(iter_van_ban_phap_luat_json(str(numbers))) == expected
+
+    # Real consolidated laws (skipped when data is absent)
+    for json_path in sorted(Path(backend_dir).glob('data/domains/*/raw/*.json'))[:2]:
+        assert list(iter_van_ban_phap_luat_json(str(json_path))) == xu_ly_van_ban_phap_luat_json(str(json_path))[0]
+
+
+def test_streamed_chunks_fail_on_bad_files(tmp_path, capsys):
+    import pytest
+    with pytest.raises(FileNotFoundError):
+        list(iter_van_ban_phap_luat_json(str(tmp_path / 'missing.json')))
+
+    # Truncated file: the articles before the error are yielded, then the error propagates
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"nguon": "L", "du_lieu": [{"dieu_so": 1, "mo_ta": "một"}, {"dieu_so": 2,', encoding='utf-8')
+    chunks = []
+    with pytest.raises(json.JSONDecodeError):
+        chunks.extend(iter_van_ban_phap_luat_json(str(broken)))
+    assert [chunk['content'] for chunk in chunks] == ['một']
+    assert 'File khong hop le' in capsys.readouterr().out
+
+
+def test_pickled_list_writer_roundtrip(tmp_path):
+    docs = [['điều', f'{i}', 'luật', 'luật'] for i in range(25)] + [[]]
+    path = tmp_path / 'tokens.pkl'
+    with PickledListWriter(path) as writer:
+        for batch in batched(docs, 4):
+            writer.append(batch)
+    assert writer.count == len(docs)
+
+    # Still a plain pickled list for pickle.load() readers
+    with open(path, 'rb') as f:
+        assert pickle.load(f) == docs
+    assert list(iter_pickled_list(path)) == docs
+
+    # Lists pickled in one go are read too
+    legacy = tmp_path / 'legacy.pkl'
+    with open(legacy, 'wb') as f:
+        pickle.dump(docs, f)
+    assert list(iter_pickled_list(legacy)) == docs
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
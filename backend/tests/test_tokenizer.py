@@ -0,0 +1,56 @@
+import sys
+import os
+import pickle
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from utils.tokenizer import DictionaryTokenizer, clean_text
+
+COUNTS = {
+    'người': 50, 'sử_dụng': 40, 'đất': 30, 'người_sử_dụng': 1, 'quyền_sử_dụng_đất': 5,
+    'quyền': 20, 'nghĩa_vụ': 10, 'nghĩa': 3, 'vụ': 2, 'sử': 1, 'dụng': 1, 'kết_hôn': 8,
+}
+
+
+def test_segmentation_strategies():
+    unigram = DictionaryTokenizer(COUNTS, min_count=2)
+    assert unigram('Quyền sử dụng đất, nghĩa vụ!') == ['quyền_sử_dụng_đất', 'nghĩa_vụ']
+    # 'người_sử_dụng' seen once → below min_count, not a compound
+    assert unigram('người sử dụng đất') == ['người', 'sử_dụng', 'đất']
+    assert unigram('điều kiện kết hôn') == ['điều', 'kiện', 'kết_hôn']
+
+    longest = DictionaryTokenizer(COUNTS, min_count=1, strategy='longest')
+    assert longest('người sử dụng đất') == ['người_sử_dụng', 'đất']
+    assert clean_text('Điều 5.') == 'điều 5 '
+
+
+def test_memo_cache_bounded():
+    tokenizer = DictionaryTokenizer(COUNTS, cache_size=2)
+    first = tokenizer('quyền sử dụng đất')
+    first.append('mutated')  # callers get copies
+    assert tokenizer('quyền sử dụng đất') == ['quyền_sử_dụng_đất']
+    tokenizer('nghĩa vụ')
+    tokenizer('kết hôn')
+    stats = tokenizer.cache_stats()
+    assert stats['size'] == 2 and stats['hits'] == 1 and stats['misses'] == 3
+
+
+def test_dictionary_roundtrip(tmp_path):
+    tokens_path = tmp_path / 'tokens.pkl'
+    with open(tokens_path, 'wb') as f:
+        pickle.dump([['quyền_sử_dụng_đất', 'của', 'người'], ['quyền_sử_dụng_đất', 'kết_hôn', 'kết_hôn']], f)
+    built = DictionaryTokenizer.from_token_files([tokens_path])
+    built.save(tmp_path / 'dict.tsv')
+    loaded = DictionaryTokenizer.load(tmp_path / 'dict.tsv')
+    assert loaded.counts == built.counts
+    assert loaded.compounds == {'quyền_sử_dụng_đất', 'kết_hôn'}
+    assert loaded('kết hôn của người') == ['kết_hôn', 'của', 'người']
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
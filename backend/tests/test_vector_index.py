@@ -0,0 +1,127 @@
+import sys
+import os
+import faiss
+import numpy as np
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from core.vector_index import (
+    read_vector_index, build_vector_index, index_code_bytes, normalize_index_spec,
+    resolve_index_spec, vector_search_params, index_vectors
+)
+from utils.memory import mapped_file_memory
+
+
+def _random_vectors(n, d=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, d)).astype('float32')
+
+
+def test_mmap_matches_heap(tmp_path):
+    vectors = _random_vectors(500)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    index_path = tmp_path / "faiss.index"
+    faiss.write_index(index, str(index_path))
+
+    heap_index = read_vector_index(index_path, mmap=False)
+    mmap_index = read_vector_index(index_path, mmap=True, prefault=True)
+
+    queries = vectors[:10] + 0.01
+    heap_d, heap_i = heap_index.search(queries, 5)
+    mmap_d, mmap_i = mmap_index.search(queries, 5)
+    assert np.array_equal(heap_i, mmap_i)
+    assert np.allclose(heap_d, mmap_d)
+
+
+def test_mapped_file_memory(tmp_path):
+    if mapped_file_memory(__file__) is None and not os.path.exists('/proc/self/smaps'):
+        return  # Not Linux
+
+    vectors = _random_vectors(2000)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    index_path = tmp_path / "faiss.index"
+    faiss.write_index(index, str(index_path))
+
+    assert mapped_file_memory(index_path) is None
+
+    mmap_index = read_vector_index(index_path, mmap=True, prefault=True)
+    usage = mapped_file_memory(index_path)
+    assert usage is not None
+    assert usage['rss'] > 0
+    assert usage['rss'] == usage['shared'] + usage['private']
+    del mmap_index
+
+
+def test_quantized_encodings(tmp_path):
+    vectors = _random_vectors(1000, d=128)
+    queries = vectors[:50] + 0.05
+    exact = build_vector_index(vectors)
+    _, truth = exact.search(queries, 10)
+
+    for encoding, ratio in [('fp16', 2), ('sq8', 4)]:
+        index = build_vector_index(vectors, {'encoding': encoding})
+        assert index_code_bytes(exact) == ratio * index_code_bytes(index)
+
+        index_path = tmp_path / f"{encoding}.index"
+        faiss.write_index(index, str(index_path))
+        loaded = read_vector_index(index_path, mmap=True)
+        _, found = loaded.search(queries, 10)
+        recall = np.mean([len(set(t) & set(f)) / 10 for t, f in zip(truth, found)])
+        assert recall > 0.95, (encoding, recall)
+
+    try:
+        normalize_index_spec({'encoding': 'int4'})
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_approximate_index_types(tmp_path):
+    # Clustered data (like sentence embeddings), where ANN indexes are meant to work
+    rng = np.random.default_rng(5)
+    centers = rng.standard_normal((50, 32)).astype('float32') * 4
+    vectors = (centers[rng.integers(50, size=4000)] + rng.standard_normal((4000, 32))).astype('float32')
+    queries = vectors[:40] + 0.05
+    _, truth = build_vector_index(vectors).search(queries, 10)
+
+    specs = [
+        {'type': 'hnsw', 'M': 16, 'ef_search': 64},
+        {'type': 'ivf_flat', 'nprobe': 16},
+        {'type': 'ivf-pq', 'pq_m': 8, 'nprobe': 16},
+    ]
+    for spec in specs:
+        spec = resolve_index_spec(spec, *vectors.shape)
+        index_path = tmp_path / f"{spec['type']}.index"
+        faiss.write_index(build_vector_index(vectors, spec), str(index_path))
+        index = read_vector_index(index_path, mmap=True)  # IVF falls back to a heap read
+
+        params = vector_search_params(index, spec)
+        assert params is not None
+        _, found = index.search(queries, 10, params=params)
+        recall = np.mean([len(set(t) & set(f)) / 10 for t, f in zip(truth, found)])
+        min_recall = 0.3 if spec['type'] == 'ivf_pq' else 0.9
+        assert recall > min_recall, (spec, recall)
+
+    # Auto nlist stays within k-means training limits; nprobe never exceeds nlist
+    spec = resolve_index_spec({'type': 'ivf_flat', 'nprobe': 64}, 1266, 768)
+    assert spec['nlist'] == 1266 // 39 and spec['nprobe'] == spec['nlist']
+    assert vector_search_params(build_vector_index(vectors[:100])) is None
+
+    # Stored vectors come back in id order for every type
+    ivf = build_vector_index(vectors, {'type': 'ivf_flat'})
+    assert np.allclose(index_vectors(ivf), vectors, atol=1e-5)
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in [test_mmap_matches_heap, test_mapped_file_memory, test_quantized_encodings, test_approximate_index_types]:
+        with tempfile.TemporaryDirectory() as d:
+            test(Path(d))
+            print(f"✅ {test.__name__}")
@@ -0,0 +1,294 @@
+"""
+Build Cache - content-addressed tokens and embeddings for incremental index builds
+"""
+import hashlib
+import os
+import pickle
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+_HASH_DTYPE = 'S40'  # sha1 hex
+_COPY_ROWS = 4096  # rows per copy step when merging vector stores
+LOCK_NAME = '.lock'
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _slug(model_id: str) -> str:
+    return re.sub(r'[^\w.@-]+', '__', model_id)
+
+
+def _gather(blocks: List[np.ndarray], rows: List[int]) -> np.ndarray:
+    """Rows by global index over consecutive blocks (read from memory maps without concatenating)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    out = np.empty((len(rows), blocks[0].shape[1]), dtype=np.float32)
+    start = 0
+    for block in blocks:
+        inside = (rows >= start) & (rows < start + len(block))
+        if inside.any():
+            out[inside] = block[rows[inside] - start]
+        start += len(block)
+    return out
+
+
+def _lock_file(f):
+    """Block until this process holds the exclusive lock on an open file"""
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # gives up after ~10s: retry
+                return
+            except OSError:
+                continue
+    import fcntl
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class BuildCache:
+    """
+    Chunk content hash -> tokens (per tokenizer id) / vector (per embedding model id)
+
+    Shared by all domains under BUILD_CACHE_DIR, so a rebuild after an amendment (or a
+    re-chunking that leaves most chunks unchanged) only tokenizes and encodes new texts.
+    Layout:
+        tokens/{tokenizer_id}.pkl               {hash: [token, ...]}
+        embeddings/{model_id}/keys.npy          (n,) S40 hashes
+        embeddings/{model_id}/vectors.npy       (n, dim) float32, same row order
+        embeddings/{model_id}/pending.{pid}.{n}.npy   vectors encoded since the last save()
+    Stores are loaded on first use and written back by save(), merged with what other
+    processes (parallel domain builds) saved in the meantime. save() only adds entries;
+    prune() drops the ones no current chunk references (run after the domain builds). Loads and the whole
+    load → merge → replace of save() hold an exclusive lock on {root}/.lock, so
+    concurrent builds never interleave their writes of keys.npy / vectors.npy. Vectors are memory-mapped
+    (stored and newly encoded alike), so only the key index is held in memory.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._tokens: Dict[str, Dict[str, List[str]]] = {}
+        self._vectors: Dict[str, Tuple[Dict[str, int], List[np.ndarray]]] = {}
+        self._dirty = set()
+        self._pending: Dict[str, List[Path]] = {}
+        self._lock = None  # open lock file while this instance holds the lock
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive cross-process lock on the cache (re-entrant within this instance)"""
+        if self._lock is not None:
+            yield
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_NAME, 'a+b') as f:
+            _lock_file(f)
+            self._lock = f
+            try:
+                yield
+            finally:
+                self._lock = None
+                _unlock_file(f)
+
+    # ===== Tokens =====
+
+    def _token_store(self, tokenizer_id: str) -> Dict[str, List[str]]:
+        if tokenizer_id not in self._tokens:
+            path = self.root / 'tokens' / f"{_slug(tokenizer_id)}.pkl"
+            store = {}
+            with self._locked():
+                if path.exists():
+                    with open(path, 'rb') as f:
+                        store = pickle.load(f)
+            self._tokens[tokenizer_id] = store
+        return self._tokens[tokenizer_id]
+
+    def tokens(self, texts: List[str], tokenize_fn: Callable[[str], List[str]],
+               tokenizer_id: str) -> Tuple[List[List[str]], int]:
+        """(tokens per text in input order, number of texts actually tokenized)"""
+        store = self._token_store(tokenizer_id)
+        hashes = [content_hash(text) for text in texts]
+        misses = 0
+        for text, key in zip(texts, hashes):
+            if key not in store:
+                store[key] = tokenize_fn(text)
+                misses += 1
+        if misses:
+            self._dirty.add(('tokens', tokenizer_id))
+        return [store[key] for key in hashes], misses
+
+    # ===== Embeddings =====
+
+    def _vector_store(self, model_id: str) -> Tuple[Dict[str, int], List[np.ndarray]]:
+        if model_id not in self._vectors:
+            directory = self.root / 'embeddings' / _slug(model_id)
+            rows, blocks = {}, []
+            with self._locked():
+                if (directory / 'keys.npy').exists() and (directory / 'vectors.npy').exists():
+                    keys = np.load(directory / 'keys.npy')
+                    vectors = np.load(directory / 'vectors.npy', mmap_mode='r')
+                    if len(keys) == len(vectors):
+                        rows = {key.decode('ascii'): i for i, key in enumerate(keys)}
+                        blocks = [vectors]
+            self._vectors[model_id] = (rows, blocks)
+        return self._vectors[model_id]
+
+    def embeddings(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray],
+                   model_id: str) -> Tuple[np.ndarray, int]:
+        """((len(texts), dim) float32 in input order, number of texts actually encoded)"""
+        rows, blocks = self._vector_store(model_id)
+        hashes = [content_hash(text) for text in texts]
+
+        missing = {}
+        for text, key in zip(texts, hashes):
+            if key not in rows and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            offset = sum(len(block) for block in blocks)
+            for i, key in enumerate(missing):
+                rows[key] = offset + i
+            blocks.append(self._spill(model_id, vectors))
+            self._dirty.add(('embeddings', model_id))
+
+        if not blocks:
+            return np.empty((0, 0), dtype=np.float32), 0
+        return _gather(blocks, [rows[key] for key in hashes]), len(missing)
+
+    def _spill(self, model_id: str, vectors: np.ndarray) -> np.ndarray:
+        """Park newly encoded vectors on disk until save() (memory stays flat over a streamed build)"""
+        directory = self.root / 'embeddings' / _slug(model_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = self._pending.setdefault(model_id, [])
+        path = directory / f"pending.{os.getpid()}.{len(paths)}.npy"
+        np.save(path, vectors)
+        paths.append(path)
+        return np.load(path, mmap_mode='r')
+
+    # ===== Persistence =====
+
+    def save(self):
+        """Write back the stores that gained entries (merged with the files on disk under the lock, atomic replace)"""
+        with self._locked():
+            for kind, model_id in sorted(self._dirty):
+                if kind == 'tokens':
+                    mine = self._tokens.pop(model_id)
+                    store = self._token_store(model_id)
+                    store.update(mine)
+                    path = self.root / 'tokens' / f"{_slug(model_id)}.pkl"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+                    with open(tmp, 'wb') as f:
+                        pickle.dump(store, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp, path)
+                else:
+                    rows, blocks = self._vectors.pop(model_id)
+                    disk_rows, disk_blocks = self._vector_store(model_id)
+                    self._vectors.pop(model_id)  # reloaded from the new files on next use
+                    offset = sum(len(block) for block in disk_blocks)
+                    added = [key for key in rows if key not in disk_rows]
+                    for i, key in enumerate(added):
+                        disk_rows[key] = offset + i
+
+                    directory = self.root / 'embeddings' / _slug(model_id)
+                    directory.mkdir(parents=True, exist_ok=True)
+                    keys = np.empty(len(disk_rows), dtype=_HASH_DTYPE)
+                    for key, row in disk_rows.items():
+                        keys[row] = key.encode('ascii')
+                    # Copied into the new file a bounded number of rows at a time
+                    tmp = directory / f"vectors.{os.getpid()}.tmp.npy"
+                    merged = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32,
+                                                       shape=(len(keys), (disk_blocks or blocks)[0].shape[1]))
+                    position = 0
+                    for block in disk_blocks:
+                        for start in range(0, len(block), _COPY_ROWS):
+                            part = block[start:start + _COPY_ROWS]
+                            merged[position:position + len(part)] = part
+                            position += len(part)
+                    for start in range(0, len(added), _COPY_ROWS):
+                        part = added[start:start + _COPY_ROWS]
+                        merged[offset + start:offset + start + len(part)] = _gather(blocks, [rows[key] for key in part])
+                    merged.flush()
+                    # Memory maps are released before their files are replaced (required on Windows);
+                    # vectors before keys: a reader seeing mismatched lengths ignores the store
+                    del merged, blocks, disk_blocks
+                    os.replace(tmp, directory / "vectors.npy")
+                    tmp = directory / f"keys.{os.getpid()}.tmp.npy"
+                    np.save(tmp, keys)
+                    os.replace(tmp, directory / "keys.npy")
+                    for path in self._pending.pop(model_id, []):
+                        path.unlink(missing_ok=True)
+        self._dirty.clear()
+
+    def prune(self, live_hashes: Iterable[str]) -> Dict[str, int]:
+        """
+        Drop entries whose content hash is not in live_hashes, from every store on disk
+
+        live_hashes must cover every domain sharing the cache (not just the ones just built).
+        Returns {'tokens': n, 'embeddings': n} entries removed.
+        """
+        live = set(live_hashes)
+        removed = {'tokens': 0, 'embeddings': 0}
+        with self._locked():
+            self.save()
+            self._tokens.clear()
+            self._vectors.clear()
+
+            for path in sorted((self.root / 'tokens').glob('*.pkl')):
+                with open(path, 'rb') as f:
+                    store = pickle.load(f)
+                kept = {key: tokens for key, tokens in store.items() if key in live}
+                if len(kept) == len(store):
+                    continue
+                removed['tokens'] += len(store) - len(kept)
+                tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+                with open(tmp, 'wb') as f:
+                    pickle.dump(kept, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+
+            live_keys = np.array([key.encode('ascii') for key in live], dtype=_HASH_DTYPE)
+            for directory in sorted((self.root / 'embeddings').glob('*')):
+                if not ((directory / 'keys.npy').exists() and (directory / 'vectors.npy').exists()):
+                    continue
+                keys = np.load(directory / 'keys.npy')
+                vectors = np.load(directory / 'vectors.npy', mmap_mode='r')
+                if len(keys) != len(vectors):
+                    continue
+                rows = np.flatnonzero(np.isin(keys, live_keys))
+                if len(rows) == len(keys):
+                    continue
+                removed['embeddings'] += len(keys) - len(rows)
+                tmp = directory / f"vectors.{os.getpid()}.tmp.npy"
+                pruned = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(len(rows), vectors.shape[1]))
+                for start in range(0, len(rows), _COPY_ROWS):
+                    part = rows[start:start + _COPY_ROWS]
+                    pruned[start:start + len(part)] = vectors[part]
+                pruned.flush()
+                # Same replace order as save(): vectors before keys
+                del pruned, vectors
+                os.replace(tmp, directory / "vectors.npy")
+                tmp = directory / f"keys.{os.getpid()}.tmp.npy"
+                np.save(tmp, keys[rows])
+                os.replace(tmp, directory / "keys.npy")
+        return removed
+
+    def stats(self) -> Dict:
+        return {
+            'tokens': {tid: len(store) for tid, store in self._tokens.items()},
+            'embeddings': {mid: len(rows) for mid, (rows, _) in self._vectors.items()},
+        }
@@ -0,0 +1,168 @@
+"""
+Build Graph - dependency-tracked build stages (rerun only what is stale)
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MANIFEST_NAME = 'build_manifest.json'
+
+
+def file_hash(path: Path) -> str:
+    """sha1 of a file, or of every file under a directory (relative names included)"""
+    path = Path(path)
+    digest = hashlib.sha1()
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    for p in files:
+        if path.is_dir():
+            digest.update(str(p.relative_to(path)).encode('utf-8'))
+        with open(p, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def inputs_hash(inputs: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class Stage:
+    """
+    One build step
+
+    inputs() is evaluated right before the stage is checked (after its dependencies ran) and
+    should name everything the outputs depend on: parameters (model id, versions) and file
+    hashes of upstream outputs via BuildGraph.hash_file. run() may return a JSON-able dict
+    that is kept in the manifest (BuildGraph.info).
+    intermediate: missing outputs alone do not make the stage stale; it is rerun only when a
+    dependent stage has to run (make's .SECONDARY)
+    """
+    name: str
+    inputs: Callable[[], Dict[str, Any]]
+    outputs: List[str]
+    run: Callable[[], Optional[Dict]]
+    deps: List[str] = field(default_factory=list)
+    intermediate: bool = False
+
+
+class BuildGraph:
+    """
+    Stages of one build directory, in dependency order
+
+    {root}/build_manifest.json records, per stage, the hash of its inputs when it last ran.
+    A stage is stale if it never ran, its inputs hash changed, or an output is missing.
+    Downstream stages hash upstream *outputs*, so an upstream rerun that writes identical
+    files does not invalidate them.
+    """
+
+    def __init__(self, root: Path, stages: List[Stage]):
+        self.root = Path(root)
+        self.stages = stages
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.manifest: Dict[str, Dict] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        self._hashes: Dict[Tuple[str, float, int], str] = {}
+
+    def hash_file(self, relative: str) -> Optional[str]:
+        """
+        Hash of an artifact under root (memoized per mtime/size); a deleted intermediate output
+        keeps the hash it had when recorded, None if missing otherwise
+        """
+        path = self.root / relative
+        if not path.exists():
+            for record in self.manifest.values():
+                if relative in record.get('output_hashes', {}):
+                    return record['output_hashes'][relative]
+            return None
+        if path.is_dir():
+            return file_hash(path)
+        stat = path.stat()
+        key = (relative, stat.st_mtime, stat.st_size)
+        if key not in self._hashes:
+            self._hashes[key] = file_hash(path)
+        return self._hashes[key]
+
+    def info(self, stage_name: str) -> Dict:
+        return self.manifest.get(stage_name, {}).get('info', {})
+
+    def _stale_reason(self, stage: Stage, digest: str) -> Optional[str]:
+        record = self.manifest.get(stage.name)
+        if record is None:
+            return 'never built'
+        if record.get('inputs') != digest:
+            return 'inputs changed'
+        missing = self._missing(stage)
+        if missing and not stage.intermediate:
+            return f"missing {', '.join(missing)}"
+        return None
+
+    def _missing(self, stage: Stage) -> List[str]:
+        return [out for out in stage.outputs if not (self.root / out).exists()]
+
+    def _needed_intermediates(self, stage: Stage, done) -> List[Stage]:
+        """Intermediate dependencies whose outputs must be recreated before stage can run"""
+        by_name = {s.name: s for s in self.stages}
+        return [by_name[dep] for dep in stage.deps
+                if dep in by_name and dep not in done and by_name[dep].intermediate and self._missing(by_name[dep])]
+
+    def plan(self, force: bool = False) -> List[Tuple[str, str]]:
+        """[(stage, reason)] that run() would execute, without running anything"""
+        planned: List[Tuple[str, str]] = []
+        for stage in self.stages:
+            upstream = [dep for dep in stage.deps if dep in dict(planned)]
+            if force:
+                reason = 'forced'
+            elif upstream:
+                reason = f"after {', '.join(upstream)}"
+            else:
+                reason = self._stale_reason(stage, inputs_hash(stage.inputs()))
+            if reason:
+                for dep in self._needed_intermediates(stage, dict(planned)):
+                    planned.append((dep.name, f"needed by {stage.name}"))
+                planned.append((stage.name, reason))
+        order = [stage.name for stage in self.stages]
+        return sorted(planned, key=lambda item: order.index(item[0]))
+
+    def run(self, force: bool = False) -> Dict[str, Optional[Dict]]:
+        """Run stale stages in order; {stage: run() result} for the stages that ran"""
+        ran: Dict[str, Optional[Dict]] = {}
+        for stage in self.stages:
+            digest = inputs_hash(stage.inputs())
+            reason = 'forced' if force else self._stale_reason(stage, digest)
+            if reason is None:
+                print(f"  ⏭️  {stage.name}: up to date", flush=True)
+                continue
+            for dep in self._needed_intermediates(stage, ran):
+                self._run_stage(dep, f"needed by {stage.name}", ran)
+            self._run_stage(stage, reason, ran)
+        return ran
+
+    def _run_stage(self, stage: Stage, reason: str, ran: Dict):
+        print(f"\n▶️  {stage.name} ({reason})", flush=True)
+        result = stage.run()
+        ran[stage.name] = result
+        # Inputs are re-read after the run (a stage may write files its inputs read, e.g. metadata.json)
+        self.record(stage, inputs_hash(stage.inputs()), result)
+
+    def record(self, stage: Stage, digest: str, info: Optional[Dict] = None):
+        record = {'inputs': digest, 'outputs': stage.outputs, 'info': info or {}}
+        if stage.intermediate:
+            self.manifest.pop(stage.name, None)
+            record['output_hashes'] = {out: self.hash_file(out) for out in stage.outputs}
+        self.manifest[stage.name] = record
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def adopt(self):
+        """Record the current inputs of every stage as built (artifacts from before the manifest existed)"""
+        for stage in self.stages:
+            self.record(stage, inputs_hash(stage.inputs()), self.info(stage.name))
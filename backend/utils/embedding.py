@@ -1,23 +1,200 @@
+"""
+Embedding Model Loading - SentenceTransformer on torch fp32 / torch dynamic-int8 / ONNX Runtime (fp32 or int8)
+"""
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
 from sentence_transformers import SentenceTransformer, models
 from config import EMBEDDING_MODEL
 
-def load_embedding_model():
+EMBEDDING_BACKENDS = ('torch', 'torch_int8', 'onnx', 'onnx_int8')
+
+
+def load_sentence_transformer(model_name: str = EMBEDDING_MODEL) -> SentenceTransformer:
     """
     Load the embedding model explicitly to avoid warnings about missing configuration.
     Uses Mean Pooling by default for VoVanPhuc/sup-SimCSE-VietNamese-phobert-base.
     """
-    print(f"[INFO] Loading embedding model: {EMBEDDING_MODEL}...", flush=True)
+    print(f"[INFO] Loading embedding model: {model_name}...", flush=True)
     try:
         # Try loading normally first
         # If it's the specific model that causes warnings, we construct it explicitly
-        if 'VoVanPhuc/sup-SimCSE-VietNamese-phobert-base' in EMBEDDING_MODEL:
-            word_embedding_model = models.Transformer(EMBEDDING_MODEL)
+        if 'VoVanPhuc/sup-SimCSE-VietNamese-phobert-base' in model_name:
+            word_embedding_model = models.Transformer(model_name)
             pooling_model = models.Pooling(word_embedding_model.get_word_embedding_dimension(), pooling_mode='mean')
             model = SentenceTransformer(modules=[word_embedding_model, pooling_model])
         else:
-            model = SentenceTransformer(EMBEDDING_MODEL)
-            
+            model = SentenceTransformer(model_name)
+
         return model
     except Exception as e:
         print(f"[WARN] Failed to load explicitly, falling back to default: {e}", flush=True)
-        return SentenceTransformer(EMBEDDING_MODEL)
+        return SentenceTransformer(model_name)
+
+
+def load_embedding_model(backend: Optional[str] = None, model_name: str = EMBEDDING_MODEL):
+    """
+    Load the query/document embedder on the configured CPU backend (EMBEDDING_BACKEND)
+
+    - torch:      float32 SentenceTransformer (reference)
+    - torch_int8: nn.Linear layers dynamically quantized to int8 (same SentenceTransformer object)
+    - onnx:       transformer exported to ONNX, run by ONNX Runtime (mean/cls pooling in numpy)
+    - onnx_int8:  same graph with int8 weights (onnxruntime.quantization.quantize_dynamic)
+
+    All return an object with SentenceTransformer's encode() interface.
+    See scripts/bench_embedding_backends.py for accuracy vs fp32 and latency.
+    """
+    from config import EMBEDDING_BACKEND
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+    model = load_sentence_transformer(model_name)
+    if backend == 'torch':
+        return model
+    if backend == 'torch_int8':
+        return quantize_torch_int8(model)
+    return OnnxEmbedder.from_sentence_transformer(model, model_name, quantize=(backend == 'onnx_int8'))
+
+
+def quantize_torch_int8(model: SentenceTransformer) -> SentenceTransformer:
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations quantized per batch)"""
+    import torch
+    print("[INFO] Quantizing embedder Linear layers to int8 (torch dynamic)", flush=True)
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def backend_model_id(model_name: str = EMBEDDING_MODEL, backend: Optional[str] = None) -> str:
+    """Cache key for vectors from a model + backend (int8 / ONNX vectors differ slightly from fp32)"""
+    from config import EMBEDDING_BACKEND
+    backend = backend or EMBEDDING_BACKEND
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+
+class OnnxEmbedder:
+    """
+    ONNX Runtime version of a SentenceTransformer (Transformer + Pooling [+ Normalize])
+
+    The Transformer module is exported once to {EMBEDDING_ONNX_DIR}/{model}/model.onnx
+    (model.int8.onnx when quantized) and reused on later starts.
+    """
+
+    def __init__(self, onnx_path: Path, tokenizer, pooling_mode: str = 'mean',
+                 max_seq_length: int = 256, normalize: bool = False, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.onnx_path = Path(onnx_path)
+        self.tokenizer = tokenizer
+        self.pooling_mode = pooling_mode
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+
+    @classmethod
+    def from_sentence_transformer(cls, model: SentenceTransformer, model_name: str,
+                                  quantize: bool = False, onnx_dir: Optional[Path] = None) -> 'OnnxEmbedder':
+        from config import EMBEDDING_ONNX_DIR
+        transformer, pooling = model[0], model[1]
+        pooling_mode = 'cls' if getattr(pooling, 'pooling_mode_cls_token', False) else 'mean'
+        normalize = any(isinstance(module, models.Normalize) for module in model)
+
+        out_dir = Path(onnx_dir or EMBEDDING_ONNX_DIR) / model_name.replace('/', '__')
+        fp32_path = out_dir / 'model.onnx'
+        if not fp32_path.exists():
+            export_onnx(transformer, fp32_path)
+        onnx_path = fp32_path
+        if quantize:
+            onnx_path = out_dir / 'model.int8.onnx'
+            if not onnx_path.exists():
+                quantize_onnx_int8(fp32_path, onnx_path)
+
+        print(f"[INFO] ONNX Runtime embedder: {onnx_path}", flush=True)
+        return cls(onnx_path, transformer.tokenizer, pooling_mode, transformer.max_seq_length, normalize)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.session.get_outputs()[0].shape[-1])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(texts, padding=True, truncation=True,
+                                  max_length=self.max_seq_length, return_tensors='np')
+        feed = {name: features[name].astype(np.int64) for name in self.input_names if name in features}
+        token_embeddings = self.session.run(None, feed)[0]
+
+        if self.pooling_mode == 'cls':
+            return token_embeddings[:, 0]
+        mask = features['attention_mask'][..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """SentenceTransformer.encode-compatible (numpy output only)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Length-sorted batches pad less; results are put back in input order
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        embeddings = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[i] for i in positions])
+
+        if normalize_embeddings or self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx(transformer: models.Transformer, onnx_path: Path, opset: int = 17):
+    """Export the HF encoder (input_ids, attention_mask → last_hidden_state) with dynamic batch/sequence axes"""
+    import torch
+
+    onnx_path = Path(onnx_path)
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    auto_model = transformer.auto_model.eval()
+    dummy = transformer.tokenizer(["xin chào", "điều kiện kết hôn theo luật"], padding=True, return_tensors='pt')
+
+    class EncoderOutput(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    print(f"[INFO] Exporting embedder to ONNX: {onnx_path}", flush=True)
+    tmp_path = onnx_path.with_suffix('.onnx.tmp')
+    with torch.no_grad():
+        torch.onnx.export(
+            EncoderOutput(auto_model),
+            (dummy['input_ids'], dummy['attention_mask']),
+            str(tmp_path),
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+    os.replace(tmp_path, onnx_path)
+
+
+def quantize_onnx_int8(fp32_path: Path, int8_path: Path):
+    """Dynamic int8 weight quantization of an exported graph"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"[INFO] Quantizing ONNX embedder to int8: {int8_path}", flush=True)
+    tmp_path = Path(int8_path).with_suffix('.onnx.tmp')
+    quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QInt8)
+    os.replace(tmp_path, int8_path)
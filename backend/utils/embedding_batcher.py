@@ -0,0 +1,154 @@
+"""
+Embedding Batcher - in-process micro-batching of concurrent encode() calls
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatchEmbedder:
+    """
+    Queues single-text encode requests from any thread (or coroutine) and runs them through
+    the wrapped embedder as one batch once max_batch_size texts are waiting or the oldest
+    request has waited max_wait_ms. Each caller gets its own Future.
+
+    encode() keeps SentenceTransformer's interface (blocking), so it can sit behind the
+    embedding cache; large calls (>= max_batch_size texts, e.g. index builds) bypass the queue.
+    Other attributes pass through to the wrapped embedder.
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}
+        self._requests = 0
+        self._wait_seconds = 0.0
+        self._max_queue_depth = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    # ===== Submission =====
+
+    def submit(self, text: str, normalize_embeddings: bool = False) -> Future:
+        """Queue one text; the Future resolves to its 1-D float32 vector"""
+        future: Future = Future()
+        self._queue.put((text, bool(normalize_embeddings), future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            with self._stats_lock:
+                self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    async def encode_async(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False) -> np.ndarray:
+        """encode() for async handlers: awaits the batch without blocking the event loop"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = await asyncio.gather(*[
+            asyncio.wrap_future(self.submit(text, normalize_embeddings)) for text in texts
+        ])
+        return vectors[0] if single else self._stack(vectors)
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        """SentenceTransformer.encode-compatible; blocks until this call's texts are encoded"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if kwargs.get('convert_to_tensor') or not convert_to_numpy or len(texts) >= self.max_batch_size:
+            return self.embedder.encode(sentences, convert_to_numpy=convert_to_numpy,
+                                        normalize_embeddings=normalize_embeddings, **kwargs)
+
+        futures = [self.submit(text, normalize_embeddings) for text in texts]
+        vectors = [future.result() for future in futures]
+        return vectors[0] if single else self._stack(vectors)
+
+    @staticmethod
+    def _stack(vectors: List[np.ndarray]) -> np.ndarray:
+        return np.stack(vectors).astype(np.float32, copy=False) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    # ===== Worker =====
+
+    def _collect(self, first) -> List:
+        """First request + whatever arrives until the batch is full or its wait budget is spent"""
+        batch = [first]
+        deadline = first[3] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [entry for entry in self._collect(item) if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            # One model call per normalize flag present in the batch
+            for normalize in {entry[1] for entry in batch}:
+                group = [entry for entry in batch if entry[1] == normalize]
+                try:
+                    vectors = self.embedder.encode([entry[0] for entry in group], convert_to_numpy=True,
+                                                   normalize_embeddings=normalize)
+                    for entry, vector in zip(group, vectors):
+                        entry[2].set_result(np.asarray(vector, dtype=np.float32))
+                except Exception as e:
+                    for entry in group:
+                        entry[2].set_exception(e)
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                self._requests += len(batch)
+                self._wait_seconds += sum(started - entry[3] for entry in batch)
+
+    def close(self):
+        """Stop the worker after the queued requests are served"""
+        self._queue.put(_STOP)
+        self._worker.join(timeout=5)
+
+    # ===== Stats =====
+
+    def batch_stats(self) -> Dict:
+        """Queue depth, batch-size histogram (size -> batches) and mean queueing delay"""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'requests': self._requests,
+                'batches': batches,
+                'mean_batch_size': self._requests / batches if batches else 0.0,
+                'mean_wait_ms': self._wait_seconds / self._requests * 1000 if self._requests else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+            }
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+
+def with_micro_batching(embedder):
+    """Wrap an embedder with the configured batcher (no-op if already wrapped or disabled)"""
+    from config import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS
+    if isinstance(embedder, MicroBatchEmbedder) or EMBEDDING_BATCH_MAX_SIZE <= 1:
+        return embedder
+    return MicroBatchEmbedder(embedder, EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS)
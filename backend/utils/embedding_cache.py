@@ -0,0 +1,125 @@
+"""
+Embedding Cache - bounded LRU (+ optional TTL) cache in front of the sentence embedder
+"""
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+from utils.text import normalize_query_text
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of embedding vectors with hit/miss/eviction counters"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds  # 0 = entries never expire
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (vector, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)  # own copy, read-only
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class CachedEmbedder:
+    """
+    Wraps a SentenceTransformer-like embedder: encode() looks each text up by
+    (model id, normalized text, normalize flag) and sends only the misses to the model, in one batch.
+    Other attributes pass through to the wrapped embedder.
+    """
+
+    def __init__(self, embedder, model_id: str, cache: Optional[EmbeddingCache] = None):
+        self.embedder = embedder
+        self.model_id = model_id
+        self.cache = cache or EmbeddingCache()
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        # Tensor outputs are not cached (callers in this repo always ask for numpy)
+        if kwargs.get('convert_to_tensor') or not convert_to_numpy:
+            return self.embedder.encode(sentences, convert_to_numpy=convert_to_numpy,
+                                        normalize_embeddings=normalize_embeddings, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts: List[str] = [normalize_query_text(t) for t in ([sentences] if single else sentences)]
+        keys = [(self.model_id, text, bool(normalize_embeddings)) for text in texts]
+
+        vectors: List[Optional[np.ndarray]] = [self.cache.get(key) for key in keys]
+        missing = {}  # text -> positions (duplicates in one batch are encoded once)
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+
+        if missing:
+            miss_texts = list(missing)
+            encoded = self.embedder.encode(miss_texts, convert_to_numpy=True,
+                                           normalize_embeddings=normalize_embeddings, **kwargs)
+            for text, vector in zip(miss_texts, encoded):
+                self.cache.put((self.model_id, text, bool(normalize_embeddings)), vector)
+                for i in missing[text]:
+                    vectors[i] = vector
+
+        result = np.stack(vectors).astype(np.float32, copy=False) if vectors else np.empty((0, 0), dtype=np.float32)
+        return result[0] if single else result
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+
+def with_embedding_cache(embedder, model_id: Optional[str] = None):
+    """Wrap an embedder with the configured cache (no-op if already wrapped or disabled)"""
+    from config import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL_SECONDS
+    from utils.embedding import backend_model_id
+    if isinstance(embedder, CachedEmbedder) or EMBEDDING_CACHE_SIZE <= 0:
+        return embedder
+    return CachedEmbedder(
+        embedder,
+        model_id=model_id or backend_model_id(),
+        cache=EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL_SECONDS)
+    )
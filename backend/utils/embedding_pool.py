@@ -0,0 +1,151 @@
+"""
+Embedding Pool - corpus encoding for index builds (length-bucketed batches, multi-process CPU workers)
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from config import EMBEDDING_MODEL
+
+_worker_embedder = None
+
+
+def syllable_length(text: str) -> int:
+    """Cheap token-length proxy: PhoBERT's BPE pieces track Vietnamese syllables closely"""
+    return len(text.split())
+
+
+def length_buckets(lengths: List[int], batch_size: int) -> List[np.ndarray]:
+    """Positions sorted by length and cut into batches, so each batch pads to a similar length"""
+    order = np.argsort(np.asarray(lengths, dtype=np.int64), kind='stable')
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def padding_ratio(lengths: List[int], batches: List[np.ndarray]) -> float:
+    """Share of padded positions when every batch pads to its longest text"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    padded = sum(int(lengths[batch].max()) * len(batch) for batch in batches if len(batch))
+    return 1.0 - lengths.sum() / padded if padded else 0.0
+
+
+def _init_worker(backend: Optional[str], model_name: str, threads: int):
+    """Runs once per worker process: split the CPU between workers, load the model"""
+    global _worker_embedder
+    import torch
+    torch.set_num_threads(threads)
+    from utils.embedding import load_embedding_model
+    _worker_embedder = load_embedding_model(backend, model_name)
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_embedder.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+
+
+class CorpusEncoder:
+    """
+    Encodes whole corpora for index builds; one instance is meant to serve every domain of a build
+
+    - Texts are sorted by length and cut into batch_size buckets (less padding per batch).
+    - workers > 1: buckets are spread over a process pool (spawned once, each worker loads the
+      model once and gets cpu_count // workers torch threads); longest buckets are scheduled first.
+    - workers <= 1: buckets are encoded in-process by one lazily loaded embedder.
+    Vectors always come back in input order.
+    """
+
+    def __init__(self, workers: int = 1, batch_size: int = 32, backend: Optional[str] = None,
+                 model_name: str = EMBEDDING_MODEL, embedder=None,
+                 length_fn: Callable[[str], int] = syllable_length, buckets_per_task: int = 4):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.backend = backend
+        self.model_name = model_name
+        self.length_fn = length_fn
+        self.buckets_per_task = max(1, buckets_per_task)
+        self._embedder = embedder
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.last_stats: Dict = {}
+
+    @property
+    def embedder(self):
+        """In-process embedder (loaded on first use)"""
+        if self._embedder is None:
+            from utils.embedding import load_embedding_model
+            self._embedder = load_embedding_model(self.backend, self.model_name)
+        return self._embedder
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            print(f"  🧵 Starting {self.workers} encoder processes ({threads} threads each)...", flush=True)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),  # torch/OpenMP state is not fork-safe
+                initializer=_init_worker,
+                initargs=(self.backend, self.model_name, threads),
+            )
+        return self._pool
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """float32 (len(texts), dim) matrix in input order; stats of the call land in last_stats"""
+        started = time.perf_counter()
+        lengths = [self.length_fn(text) for text in texts]
+        buckets = length_buckets(lengths, self.batch_size)
+
+        results = []  # (positions, vectors)
+        if self.workers > 1 and len(buckets) > 1:
+            # A task is a run of consecutive buckets (same length range); longest first
+            tasks = [np.concatenate(buckets[i:i + self.buckets_per_task])
+                     for i in range(0, len(buckets), self.buckets_per_task)][::-1]
+            executor = self._executor()
+            futures = {
+                executor.submit(_encode_in_worker, [texts[i] for i in positions], self.batch_size): positions
+                for positions in tasks
+            }
+            for future in as_completed(futures):
+                results.append((futures[future], future.result()))
+        else:
+            for positions in buckets:
+                vectors = self.embedder.encode([texts[i] for i in positions], batch_size=self.batch_size,
+                                               convert_to_numpy=True)
+                results.append((positions, np.asarray(vectors, dtype=np.float32)))
+
+        dimension = results[0][1].shape[1] if results else 0
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        for positions, vectors in results:
+            embeddings[positions] = vectors
+
+        elapsed = time.perf_counter() - started
+        self.last_stats = {
+            'chunks': len(texts),
+            'seconds': elapsed,
+            'chunks_per_sec': len(texts) / elapsed if elapsed > 0 else 0.0,
+            'workers': self.workers,
+            'batches': len(buckets),
+            'padding_ratio': padding_ratio(lengths, buckets),
+            'unsorted_padding_ratio': padding_ratio(
+                lengths, [np.arange(s, min(s + self.batch_size, len(texts))) for s in range(0, len(texts), self.batch_size)]
+            ),
+        }
+        return embeddings
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> 'CorpusEncoder':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_encoder(embedder=None) -> CorpusEncoder:
+    """CorpusEncoder from BUILD_ENCODE_WORKERS / BUILD_ENCODE_BATCH_SIZE / BUILD_EMBEDDING_BACKEND (0 workers = one per CPU)"""
+    from config import BUILD_ENCODE_WORKERS, BUILD_ENCODE_BATCH_SIZE, BUILD_EMBEDDING_BACKEND
+    workers = BUILD_ENCODE_WORKERS or os.cpu_count() or 1
+    return CorpusEncoder(workers=workers, batch_size=BUILD_ENCODE_BATCH_SIZE, backend=BUILD_EMBEDDING_BACKEND,
+                         embedder=embedder)
@@ -0,0 +1,61 @@
+"""
+Process Memory Inspection Module
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+SMAPS_PATH = '/proc/self/smaps'
+
+# smaps field -> report key (values in kB)
+_SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared',
+    'Shared_Dirty': 'shared',
+    'Private_Clean': 'private',
+    'Private_Dirty': 'private',
+}
+
+
+def mapped_file_memory(path) -> Optional[Dict[str, int]]:
+    """
+    Resident memory of all mappings of a file in this process (Linux only)
+
+    Args:
+        path: File that may be mmap'd (e.g. faiss.index)
+
+    Returns:
+        {'rss', 'pss', 'shared', 'private'} in bytes, or None if the file
+        is not mapped or /proc is unavailable
+    """
+    if not os.path.exists(SMAPS_PATH):
+        return None
+
+    target = str(Path(path).resolve())
+    usage = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    in_target = False
+    found = False
+
+    try:
+        with open(SMAPS_PATH, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+
+                # Mapping header: "addr-addr perms offset dev inode [path]"
+                if '-' in parts[0] and not parts[0].endswith(':'):
+                    in_target = len(parts) >= 6 and parts[5] == target
+                    found = found or in_target
+                    continue
+
+                if in_target:
+                    key = _SMAPS_FIELDS.get(parts[0].rstrip(':'))
+                    if key:
+                        usage[key] += int(parts[1]) * 1024
+    except OSError:
+        return None
+
+    return usage if found else None
@@ -0,0 +1,87 @@
+"""
+Stream IO - bounded-batch writers/readers for build artifacts (chunks.jsonl, tokens.pkl)
+"""
+import itertools
+import json
+import pickle
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+# tokens.pkl stays one protocol 2 pickle of a list, written batch by batch:
+#   PROTO 2, EMPTY_LIST, then per batch  BININT <segment length> POP  <appends of the batch>,  STOP
+# pickle.load() reads it as a plain list; iter_pickled_list() jumps from segment to segment.
+_HEADER = b'\x80\x02]'
+_BATCH_PREFIX = _HEADER + b'q\x00'  # pickle.dumps(list, protocol=2) up to the first item: memo put of the list
+_SEGMENT = b'J'
+_STOP = b'.'
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Consecutive lists of at most batch_size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class PickledListWriter:
+    """Write a pickled list incrementally (append batches, close to finish)"""
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER)
+        self.count = 0
+
+    def append(self, items: List):
+        if not items:
+            return
+        # The batch pickled as a list, minus the list itself: its APPEND(S) then extend the outer list.
+        # Memo indices restart per batch and are only referenced within it.
+        data = pickle.dumps(list(items), protocol=2)
+        if not data.startswith(_BATCH_PREFIX):
+            raise pickle.PicklingError("Unexpected list pickle prefix")
+        segment = data[len(_BATCH_PREFIX):-1]
+        self._file.write(_SEGMENT + struct.pack('<i', len(segment)) + b'0' + segment)
+        self.count += len(items)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write(_STOP)
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def iter_pickled_list(path: Path) -> Iterator:
+    """Items of a pickled list, one written batch in memory at a time (whole-list pickles are loaded)"""
+    with open(path, 'rb') as f:
+        if f.read(len(_HEADER)) != _HEADER or f.peek(1)[:1] not in (_SEGMENT, _STOP):
+            f.seek(0)
+            yield from pickle.load(f)
+            return
+        while True:
+            opcode = f.read(1)
+            if opcode == _STOP:
+                return
+            if opcode != _SEGMENT:
+                raise pickle.UnpicklingError(f"{path}: unexpected opcode {opcode!r}")
+            length, = struct.unpack('<i', f.read(4))
+            f.read(1)  # POP
+            yield from pickle.loads(_HEADER + f.read(length) + _STOP)
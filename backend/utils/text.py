@@ -0,0 +1,18 @@
+"""
+Text Normalization Module
+"""
+
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Canonical form of a query string (shared by query analysis and embedding cache keys)
+    
+    - Unicode NFC: composed Vietnamese diacritics (keyboards/IMEs may send combining marks)
+    - Whitespace runs collapsed, ends stripped
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
@@ -2,32 +2,214 @@
 Vietnamese Tokenization Module
 """
 
+import math
 import re
-from typing import List
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 from underthesea import word_tokenize
 
+from utils.stream_io import iter_pickled_list
 
-def tokenize_vi(text: str) -> List[str]:
+_CLEAN_RE = re.compile(r'[^\w\sàáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]')
+
+
+def clean_text(text: str) -> str:
+    """Lowercase, remove special characters but keep Vietnamese marks"""
+    return _CLEAN_RE.sub(' ', text.lower())
+
+
+def tokenize_underthesea(text: str) -> List[str]:
     """
-    Tokenize Vietnamese text using underthesea
-    
+    Tokenize Vietnamese text using underthesea (CRF word segmentation)
+
     Args:
         text: Input Vietnamese text
-    
+
     Returns:
         List of tokens
     """
     try:
-        # Lowercase
-        text = text.lower()
-        
-        # Remove special characters but keep Vietnamese marks
-        text = re.sub(r'[^\w\sàáạảãâầấậẩẫăằắặẳẵèéẹẻẽêềếệểễìíịỉĩòóọỏõôồốộổỗơờớợởỡùúụủũưừứựửữỳýỵỷỹđ]', ' ', text)
-        
-        # Tokenize with underthesea
-        tokens = word_tokenize(text, format="text").split()
-        
-        return tokens
+        return word_tokenize(clean_text(text), format="text").split()
     except Exception as e:
         print(f'[WARN] Tokenization error: {e}, fallback to split()')
         return text.lower().split()
+
+
+def underthesea_tokenizer_id() -> str:
+    """Identifies tokens.pkl contents (segmentation can change between underthesea releases)"""
+    from importlib.metadata import version
+    return f"underthesea-{version('underthesea')}"
+
+
+class DictionaryTokenizer:
+    """
+    Dictionary word segmentation over syllables (no model at query time)
+
+    The dictionary is the corpus vocabulary as underthesea segmented it (tokens.pkl):
+    compound words are "syllable_syllable" entries with their corpus counts.
+    - strategy 'unigram': most probable split (dynamic programming over unigram counts)
+    - strategy 'longest': greedy forward longest-match
+    Results are memoized in a bounded LRU (queries and sub-questions repeat a lot).
+    """
+
+    def __init__(self, counts: Dict[str, int], min_count: int = 2, max_syllables: int = 6,
+                 strategy: str = 'unigram', cache_size: int = 4096):
+        if strategy not in ('unigram', 'longest'):
+            raise ValueError(f"Unknown segmentation strategy '{strategy}'")
+        self.counts = counts
+        # Rare compounds are mostly segmentation noise; single syllables always stay
+        self.compounds = {
+            word for word, count in counts.items()
+            if '_' in word and count >= min_count and word.count('_') < max_syllables
+        }
+        self.max_syllables = max((word.count('_') + 1 for word in self.compounds), default=1)
+        self.strategy = strategy
+        self._log_total = math.log(sum(counts.values()) + 1)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ===== Dictionary =====
+
+    @classmethod
+    def from_token_files(cls, token_paths: Iterable[Path], **kwargs) -> 'DictionaryTokenizer':
+        """Count every token of the given tokens.pkl files"""
+        counts = Counter()
+        for path in token_paths:
+            for doc_tokens in iter_pickled_list(path):
+                counts.update(doc_tokens)
+        return cls(dict(counts), **kwargs)
+
+    @classmethod
+    def from_domains(cls, domains_root: Path = Path("data/domains"), **kwargs) -> 'DictionaryTokenizer':
+        return cls.from_token_files(sorted(Path(domains_root).glob("*/tokens.pkl")), **kwargs)
+
+    def save(self, path: Path):
+        """word<TAB>count per line, most frequent first"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for word, count in sorted(self.counts.items(), key=lambda x: (-x[1], x[0])):
+                f.write(f"{word}\t{count}\n")
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> 'DictionaryTokenizer':
+        counts = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                word, _, count = line.rstrip('\n').partition('\t')
+                if word:
+                    counts[word] = int(count or 1)
+        return cls(counts, **kwargs)
+
+    # ===== Segmentation =====
+
+    def segment(self, syllables: List[str]) -> List[str]:
+        if self.strategy == 'longest':
+            return self._longest_match(syllables)
+        return self._most_probable(syllables)
+
+    def _longest_match(self, syllables: List[str]) -> List[str]:
+        tokens, i, n = [], 0, len(syllables)
+        while i < n:
+            for length in range(min(self.max_syllables, n - i), 1, -1):
+                word = '_'.join(syllables[i:i + length])
+                if word in self.compounds:
+                    tokens.append(word)
+                    i += length
+                    break
+            else:
+                tokens.append(syllables[i])
+                i += 1
+        return tokens
+
+    def _most_probable(self, syllables: List[str]) -> List[str]:
+        """best[j] = max log-probability of syllables[:j]; unseen syllables get a 0.5 pseudo-count"""
+        n = len(syllables)
+        best = [0.0] + [-math.inf] * n
+        back = [0] * (n + 1)
+        for j in range(1, n + 1):
+            for length in range(1, min(self.max_syllables, j) + 1):
+                if length == 1:
+                    word = syllables[j - 1]
+                else:
+                    word = '_'.join(syllables[j - length:j])
+                    if word not in self.compounds:
+                        continue
+                score = best[j - length] + math.log(self.counts.get(word, 0) + 0.5) - self._log_total
+                if score > best[j]:
+                    best[j], back[j] = score, length
+
+        tokens, j = [], n
+        while j > 0:
+            tokens.append('_'.join(syllables[j - back[j]:j]))
+            j -= back[j]
+        return tokens[::-1]
+
+    def __call__(self, text: str) -> List[str]:
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return list(cached)
+            self.misses += 1
+
+        tokens = tuple(self.segment(clean_text(text).split()))
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[text] = tokens
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(tokens)
+
+    def cache_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_fast_tokenizer: Optional[DictionaryTokenizer] = None
+_fast_lock = threading.Lock()
+
+
+def get_fast_tokenizer() -> DictionaryTokenizer:
+    """Shared dictionary tokenizer (TOKENIZER_DICT_PATH, else built from the domains' tokens.pkl)"""
+    global _fast_tokenizer
+    if _fast_tokenizer is None:
+        with _fast_lock:
+            if _fast_tokenizer is None:
+                from config import TOKENIZER_DICT_PATH, TOKENIZER_CACHE_SIZE
+                if Path(TOKENIZER_DICT_PATH).exists():
+                    _fast_tokenizer = DictionaryTokenizer.load(TOKENIZER_DICT_PATH, cache_size=TOKENIZER_CACHE_SIZE)
+                else:
+                    print(f"⚠️ {TOKENIZER_DICT_PATH} not found, building the word dictionary from tokens.pkl", flush=True)
+                    _fast_tokenizer = DictionaryTokenizer.from_domains(cache_size=TOKENIZER_CACHE_SIZE)
+                print(f"✅ Fast tokenizer: {len(_fast_tokenizer.compounds)} compound words", flush=True)
+    return _fast_tokenizer
+
+
+def tokenize_vi(text: str) -> List[str]:
+    """
+    Tokenize Vietnamese text (TOKENIZER_MODE: 'underthesea' CRF, or 'fast' dictionary segmentation)
+
+    Args:
+        text: Input Vietnamese text
+
+    Returns:
+        List of tokens
+    """
+    from config import TOKENIZER_MODE
+    if TOKENIZER_MODE == 'fast':
+        return get_fast_tokenizer()(text)
+    return tokenize_underthesea(text)